@@ -0,0 +1,235 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from dotenv import load_dotenv
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, default))
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+
+def _env_set(name: str) -> frozenset:
+    """Comma-separated, lower-cased names; empty when unset."""
+    return frozenset(item.strip().lower() for item in os.getenv(name, "").split(",") if item.strip())
+
+
+def _env_rates(name: str, default: str) -> dict:
+    """"logger=rate,logger=rate" pairs, e.g. "app.hot=0.01"."""
+    rates = {}
+    for pair in os.getenv(name, default).split(","):
+        if "=" in pair:
+            logger_name, rate = pair.split("=", 1)
+            rates[logger_name.strip()] = float(rate)
+    return rates
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Database
+    mongo_uri: str
+    mongo_read_uri: str
+    db_name: str
+    mongo_max_pool_size: int
+    mongo_read_max_pool_size: int
+    mongo_min_pool_size: int
+    mongo_max_idle_time_ms: int
+    mongo_wait_queue_timeout_ms: int
+    mongo_server_selection_timeout_ms: int
+    mongo_connect_timeout_ms: int
+    mongo_socket_timeout_ms: int
+    mongo_public_max_staleness_seconds: int
+
+    # AI providers
+    gemini_api_key: Optional[str]
+    gemini_model: str
+    stability_api_key: Optional[str]
+    stability_api_host: str
+
+    # Cloudinary
+    cloudinary_cloud_name: Optional[str]
+    cloudinary_api_key: Optional[str]
+    cloudinary_api_secret: Optional[str]
+
+    # SMTP
+    smtp_host: Optional[str]
+    smtp_port: int
+    smtp_user: Optional[str]
+    smtp_pass: Optional[str]
+    smtp_from_name: str
+
+    # Auth
+    jwt_secret_key: str
+    jwt_algorithm: str
+    access_token_expire_minutes: int
+    refresh_token_expire_hours: int
+
+    # Menu image preprocessing
+    menu_image_max_edge: int
+    menu_image_quality: int
+    menu_image_tile_aspect: float
+    image_workers: int
+
+    # Menu extraction batching (pages packed into one Gemini call)
+    menu_extraction_batch_pages: int
+    menu_extraction_batch_bytes: int
+
+    # Image storage (content-addressed, deduplicated)
+    image_storage_backend: str
+    image_storage_dir: str
+    image_storage_base_url: str
+    asset_orphan_grace_hours: float
+
+    # Static menu export
+    menu_export_backend: str
+    menu_export_dir: str
+    menu_export_base_url: str
+    menu_export_html: bool
+
+    # Soft-delete archival
+    archive_retention_days: int
+    archive_batch_size: int
+    archive_batch_pause_ms: int
+    archive_interval_seconds: int
+
+    # Outbound provider calls (Gemini, Stability, Cloudinary)
+    gemini_concurrency: int
+    gemini_timeout_seconds: float
+    stability_concurrency: int
+    stability_timeout_seconds: float
+    cloudinary_concurrency: int
+    cloudinary_timeout_seconds: float
+    outbound_max_retries: int
+    outbound_breaker_failures: int
+    outbound_breaker_reset_seconds: float
+
+    # Provider simulators (offline load tests): "gemini", "stability", "cloudinary", "smtp" or "all"
+    simulate_providers: frozenset
+    simulator_latency_median_ms: float
+    simulator_latency_p95_ms: float
+    simulator_error_rate: float
+    simulator_dishes_per_page: int
+    simulator_image_bytes: int
+
+    # Logging
+    log_level: str
+    log_format: str
+    log_queue_size: int
+    log_sample_rates: dict
+
+    # Live menu push (SSE): capped event log size, heartbeat and per-viewer buffer
+    menu_events_cap_mb: int
+    menu_events_heartbeat_seconds: float
+    menu_events_queue_size: int
+
+    # Unique-visitor sketches: fingerprint hash key and how often workers persist them
+    visitor_hash_key: str
+    visitor_sketch_flush_seconds: float
+
+    # Admin/business config: how long a worker serves its cached effective config
+    config_cache_seconds: float
+
+    # Profiling
+    profiling_token: Optional[str]
+    profiling_sample_rate: float
+    profiling_interval_ms: float
+    profiling_buffer_size: int
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            mongo_uri=os.getenv("MONGO_URI", "mongodb://localhost:27017"),
+            mongo_read_uri=os.getenv("MONGO_READ_URI") or os.getenv("MONGO_URI", "mongodb://localhost:27017"),
+            db_name=os.getenv("DB_NAME", "menu_management_system"),
+            mongo_max_pool_size=_env_int("MONGO_MAX_POOL_SIZE", 50),
+            mongo_read_max_pool_size=_env_int("MONGO_READ_MAX_POOL_SIZE", 100),
+            mongo_min_pool_size=_env_int("MONGO_MIN_POOL_SIZE", 0),
+            mongo_max_idle_time_ms=_env_int("MONGO_MAX_IDLE_TIME_MS", 60000),
+            mongo_wait_queue_timeout_ms=_env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000),
+            mongo_server_selection_timeout_ms=_env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+            mongo_connect_timeout_ms=_env_int("MONGO_CONNECT_TIMEOUT_MS", 5000),
+            mongo_socket_timeout_ms=_env_int("MONGO_SOCKET_TIMEOUT_MS", 0),
+            # MongoDB rejects maxStalenessSeconds below 90
+            mongo_public_max_staleness_seconds=max(90, _env_int("MONGO_PUBLIC_MAX_STALENESS_SECONDS", 90)),
+            gemini_api_key=os.getenv("GEMINI_API_KEY"),
+            gemini_model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+            stability_api_key=os.getenv("STABILITY_API_KEY"),
+            stability_api_host=os.getenv("API_HOST", "https://api.stability.ai"),
+            cloudinary_cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+            cloudinary_api_key=os.getenv("CLOUDINARY_API_KEY"),
+            cloudinary_api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+            smtp_host=os.getenv("SMTP_HOST"),
+            smtp_port=_env_int("SMTP_PORT", 587),
+            smtp_user=os.getenv("EMAIL_USER"),
+            smtp_pass=os.getenv("EMAIL_PASS"),
+            smtp_from_name=os.getenv("SMTP_FROM_NAME", "Menu Management"),
+            jwt_secret_key=os.getenv("JWT_SECRET_KEY", "9a3f7e2d1c6b5a8e4d3c2b1a0f9e8d7c6b5a4s3d2f1g"),
+            jwt_algorithm=os.getenv("ALGORITHM", "HS256"),
+            access_token_expire_minutes=_env_int("ACCESS_TOKEN_EXPIRE_MINUTES", 30),
+            refresh_token_expire_hours=_env_int("REFRESH_TOKEN_EXPIRE_HOURS", 24),
+            menu_image_max_edge=_env_int("MENU_IMAGE_MAX_EDGE", 2048),
+            menu_image_quality=_env_int("MENU_IMAGE_QUALITY", 85),
+            menu_image_tile_aspect=_env_float("MENU_IMAGE_TILE_ASPECT", 2.5),
+            image_workers=_env_int("IMAGE_WORKERS", 2),
+            menu_extraction_batch_pages=_env_int("MENU_EXTRACTION_BATCH_PAGES", 4),
+            menu_extraction_batch_bytes=_env_int("MENU_EXTRACTION_BATCH_BYTES", 12 * 1024 * 1024),
+            image_storage_backend=os.getenv("IMAGE_STORAGE_BACKEND", "cloudinary").lower(),
+            image_storage_dir=os.getenv("IMAGE_STORAGE_DIR", "static_images"),
+            image_storage_base_url=os.getenv("IMAGE_STORAGE_BASE_URL", "/static-images"),
+            asset_orphan_grace_hours=_env_float("ASSET_ORPHAN_GRACE_HOURS", 24),
+            menu_export_backend=os.getenv("MENU_EXPORT_BACKEND", "none").lower(),
+            menu_export_dir=os.getenv("MENU_EXPORT_DIR", "static_menus"),
+            menu_export_base_url=os.getenv("MENU_EXPORT_BASE_URL", "/static-menus"),
+            menu_export_html=_env_bool("MENU_EXPORT_HTML", False),
+            archive_retention_days=_env_int("ARCHIVE_RETENTION_DAYS", 30),
+            archive_batch_size=_env_int("ARCHIVE_BATCH_SIZE", 500),
+            archive_batch_pause_ms=_env_int("ARCHIVE_BATCH_PAUSE_MS", 200),
+            archive_interval_seconds=_env_int("ARCHIVE_INTERVAL_SECONDS", 3600),
+            gemini_concurrency=_env_int("GEMINI_CONCURRENCY", 4),
+            gemini_timeout_seconds=_env_float("GEMINI_TIMEOUT_SECONDS", 120),
+            stability_concurrency=_env_int("STABILITY_CONCURRENCY", 2),
+            stability_timeout_seconds=_env_float("STABILITY_TIMEOUT_SECONDS", 60),
+            cloudinary_concurrency=_env_int("CLOUDINARY_CONCURRENCY", 8),
+            cloudinary_timeout_seconds=_env_float("CLOUDINARY_TIMEOUT_SECONDS", 30),
+            outbound_max_retries=_env_int("OUTBOUND_MAX_RETRIES", 2),
+            outbound_breaker_failures=_env_int("OUTBOUND_BREAKER_FAILURES", 5),
+            outbound_breaker_reset_seconds=_env_float("OUTBOUND_BREAKER_RESET_SECONDS", 30),
+            simulate_providers=_env_set("SIMULATE_PROVIDERS"),
+            simulator_latency_median_ms=_env_float("SIMULATOR_LATENCY_MEDIAN_MS", 800),
+            simulator_latency_p95_ms=_env_float("SIMULATOR_LATENCY_P95_MS", 3000),
+            simulator_error_rate=_env_float("SIMULATOR_ERROR_RATE", 0),
+            simulator_dishes_per_page=_env_int("SIMULATOR_DISHES_PER_PAGE", 25),
+            simulator_image_bytes=_env_int("SIMULATOR_IMAGE_BYTES", 1_500_000),
+            log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+            log_format=os.getenv("LOG_FORMAT", "json").lower(),
+            log_queue_size=_env_int("LOG_QUEUE_SIZE", 10000),
+            log_sample_rates=_env_rates("LOG_SAMPLE_RATES", "app.hot=0.01"),
+            menu_events_cap_mb=_env_int("MENU_EVENTS_CAP_MB", 16),
+            menu_events_heartbeat_seconds=_env_float("MENU_EVENTS_HEARTBEAT_SECONDS", 25),
+            menu_events_queue_size=_env_int("MENU_EVENTS_QUEUE_SIZE", 32),
+            visitor_hash_key=os.getenv("VISITOR_HASH_KEY") or os.getenv("JWT_SECRET_KEY", "visitor-sketches"),
+            visitor_sketch_flush_seconds=_env_float("VISITOR_SKETCH_FLUSH_SECONDS", 60),
+            config_cache_seconds=_env_float("CONFIG_CACHE_SECONDS", 30),
+            profiling_token=os.getenv("PROFILING_TOKEN"),
+            profiling_sample_rate=_env_float("PROFILING_SAMPLE_RATE", 0),
+            profiling_interval_ms=_env_float("PROFILING_INTERVAL_MS", 5),
+            profiling_buffer_size=_env_int("PROFILING_BUFFER_SIZE", 50),
+        )
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Loads .env once and returns the process-wide settings.
+    """
+    load_dotenv()
+    return Settings.from_env()
@@ -1,38 +1,325 @@
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
-from dotenv import load_dotenv
+import threading
+import time
+from functools import lru_cache
+from pymongo import monitoring
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from app import metrics
+from app.config import get_settings
 
-load_dotenv()
+# Connection pools. "primary" serves writes and read-your-writes paths; "reads"
+# serves read-heavy traffic and can be pointed at dedicated nodes via MONGO_READ_URI.
+POOLS = ("primary", "reads")
 
-MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
-DB_NAME = os.getenv("DB_NAME", "menu_management_system")
+# Read classes: which pool an endpoint class uses and with what read preference.
+#   primary    → admin/owner paths that must see their own writes
+#   public     → customer-facing menu reads, may lag by a bounded amount
+#   analytics  → aggregations, happy to run on any secondary
+READ_CLASSES = {
+    "primary": "primary",
+    "public": "reads",
+    "analytics": "reads",
+}
+
+
+def _read_preference(read_class: str):
+    if read_class == "public":
+        return SecondaryPreferred(max_staleness=get_settings().mongo_public_max_staleness_seconds)
+    if read_class == "analytics":
+        return SecondaryPreferred()
+    return Primary()
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Tracks per-pool connection usage so pool sizes can be tuned against the
+    number of uvicorn workers (each worker owns its own pools).
+    """
+
+    def __init__(self, pool: str, max_size: int):
+        self.pool = pool
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._open = 0
+        self._checked_out = 0
+        self._waiting = 0
+        self._wait_started = {}
+
+    def _publish(self):
+        metrics.set_value("mongo_pool_open_connections", self._open, pool=self.pool)
+        metrics.set_value("mongo_pool_checked_out", self._checked_out, pool=self.pool)
+        metrics.set_value("mongo_pool_waiting", self._waiting, pool=self.pool)
+        metrics.set_value("mongo_pool_utilization", self._checked_out / self.max_size if self.max_size else 0, pool=self.pool)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool": self.pool,
+                "maxPoolSize": self.max_size,
+                "openConnections": self._open,
+                "checkedOut": self._checked_out,
+                "waiting": self._waiting,
+                "utilization": round(self._checked_out / self.max_size, 3) if self.max_size else 0,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        metrics.inc("mongo_pool_cleared", pool=self.pool)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self._open += 1
+            self._publish()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._open = max(0, self._open - 1)
+            self._publish()
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._waiting += 1
+            self._wait_started[threading.get_ident()] = time.perf_counter()
+            self._publish()
+
+    def _end_wait(self):
+        self._waiting = max(0, self._waiting - 1)
+        started = self._wait_started.pop(threading.get_ident(), None)
+        if started is not None:
+            metrics.observe("mongo_pool_checkout_wait_ms", (time.perf_counter() - started) * 1000, pool=self.pool)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._end_wait()
+            self._publish()
+        metrics.inc("mongo_pool_checkout_failures", pool=self.pool, reason=event.reason)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self._end_wait()
+            self._checked_out += 1
+            self._publish()
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._checked_out = max(0, self._checked_out - 1)
+            self._publish()
+
+
+_pool_metrics = {}
+
+
+def get_client(pool: str = "primary"):
+    # One client per pool: get_client() and get_client("primary") must share it
+    return _client("reads" if pool == "reads" else "primary")
+
+
+@lru_cache(maxsize=None)
+def _client(pool: str):
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    settings = get_settings()
+    if pool == "reads":
+        uri, max_size = settings.mongo_read_uri, settings.mongo_read_max_pool_size
+    else:
+        uri, max_size = settings.mongo_uri, settings.mongo_max_pool_size
+
+    listener = PoolMetrics(pool, max_size)
+    _pool_metrics[pool] = listener
+    return AsyncIOMotorClient(
+        uri,
+        maxPoolSize=max_size,
+        minPoolSize=settings.mongo_min_pool_size,
+        maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+        waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+        serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+        connectTimeoutMS=settings.mongo_connect_timeout_ms,
+        socketTimeoutMS=settings.mongo_socket_timeout_ms or None,
+        event_listeners=[listener],
+        appname=f"menu-management-{pool}",
+    )
+
+
+def get_db(pool: str = "primary"):
+    return get_client(pool)[get_settings().db_name]
+
+
+def pool_stats() -> list:
+    """Utilization of every pool opened so far in this worker."""
+    return [listener.stats() for listener in _pool_metrics.values()]
+
+
+class LazyCollection:
+    """
+    Stands in for a Motor collection until first use, so importing this module
+    (and every router that imports a collection from it) never builds the client.
+    """
+
+    def __init__(self, name: str, read_class: str = "primary"):
+        self._name = name
+        self._read_class = read_class
+        self._collection = None
+        self._readers = {}
+
+    def _resolve(self):
+        if self._collection is None:
+            collection = get_db(READ_CLASSES[self._read_class])[self._name]
+            if self._read_class != "primary":
+                collection = collection.with_options(read_preference=_read_preference(self._read_class))
+            self._collection = collection
+        return self._collection
+
+    def reads(self, read_class: str) -> "LazyCollection":
+        """
+        The same collection routed for a read class ("public", "analytics").
+        Only use it for reads; writes always go through the primary collection.
+        """
+        if read_class == self._read_class:
+            return self
+        if read_class not in self._readers:
+            self._readers[read_class] = LazyCollection(self._name, read_class)
+        return self._readers[read_class]
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
 
-client = AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
 
 # Collections
-contacts_collection = db["contacts"]
-outlet_profiles_collection = db["outlet_profiles"]
-requests_collection = db["requests"]
-dishes_collection = db["dishes"]
-categories_collection = db["categories"]
-businesses_collection = db["businesses"]
-otps_collection = db["otps"]
-admin_config_collection = db["admin_config"]
-business_types_collection = db["business_types"]
-business_config_collection = db["business_configuration"]
-scans_collection = db["scans"]
+contacts_collection = LazyCollection("contacts")
+outlet_profiles_collection = LazyCollection("outlet_profiles")
+requests_collection = LazyCollection("requests")
+dishes_collection = LazyCollection("dishes")
+categories_collection = LazyCollection("categories")
+businesses_collection = LazyCollection("businesses")
+otps_collection = LazyCollection("otps")
+admin_config_collection = LazyCollection("admin_config")
+business_types_collection = LazyCollection("business_types")
+business_config_collection = LazyCollection("business_configuration")
+scans_collection = LazyCollection("scans")
+published_menus_collection = LazyCollection("published_menus")
+assets_collection = LazyCollection("assets")
+dish_search_collection = LazyCollection("dish_search")
+ai_usage_collection = LazyCollection("ai_usage")
+visitor_sketches_collection = LazyCollection("visitor_sketches")
+menu_events_collection = LazyCollection("menu_events")  # capped, see ensure_capped_collections
+
+
+# Partial indexes only hold live documents: soft-deleted rows cost no index
+# space, and every live read filters on "isDeleted": False so the planner can use them.
+LIVE = {"isDeleted": False}
+
+
+async def ensure_indexes():
+    """Creates the indexes hot paths rely on (no-op when they already exist)."""
+    try:
+        await published_menus_collection.create_index("storeUid", unique=True)
+        await outlet_profiles_collection.create_index("storeUid")
+        await outlet_profiles_collection.create_index(
+            [("contactId", 1), ("createdAt", -1)], partialFilterExpression=LIVE, name="live_contactId_createdAt")
+        await outlet_profiles_collection.create_index(
+            [("location", "2dsphere"), ("isActive", 1)], partialFilterExpression=LIVE, name="live_location_isActive")
+        await categories_collection.create_index("categoryId")
+        await categories_collection.create_index([("storeUid", 1), ("rank", 1)])
+        await categories_collection.create_index(
+            [("storeUid", 1), ("isPublished", 1), ("rank", 1), ("order", 1)],
+            partialFilterExpression=LIVE, name="live_storeUid_isPublished_rank")
+        await dishes_collection.create_index("dishId")
+        await dishes_collection.create_index("requestId")
+        await dishes_collection.create_index(
+            [("categoryId", 1)], partialFilterExpression=LIVE, name="live_categoryId")
+        await dishes_collection.create_index([("storeUid", 1), ("rank", 1)])
+        await dishes_collection.create_index(
+            [("storeUid", 1), ("isPublished", 1), ("rank", 1), ("order", 1)],
+            partialFilterExpression=LIVE, name="live_storeUid_isPublished_rank")
+        await dishes_collection.create_index(
+            [("storeUid", 1), ("categoryId", 1), ("rank", 1)],
+            partialFilterExpression=LIVE, name="live_storeUid_categoryId_rank")
+        await assets_collection.create_index("url")
+        await assets_collection.create_index(
+            [("lastReleasedAt", 1)], partialFilterExpression={"refCount": {"$lte": 0}}, name="orphan_lastReleasedAt")
+        # Cross-outlet discovery (dish_search is a projection of published menus)
+        await dish_search_collection.create_index(
+            [("name", "text"), ("categoryName", "text"), ("description", "text")],
+            weights={"name": 10, "categoryName": 3, "description": 1}, name="text_name_category_description")
+        await dish_search_collection.create_index([("storeUid", 1)])
+        await dish_search_collection.create_index([("businessId", 1), ("isActive", 1), ("minPrice", 1)])
+        await dish_search_collection.create_index([("categoryName", 1), ("isActive", 1), ("minPrice", 1)])
+        await business_config_collection.create_index("businessId")
+        await ai_usage_collection.create_index(
+            [("businessId", 1), ("kind", 1), ("period", 1)], unique=True, name="businessId_kind_period")
+        await visitor_sketches_collection.create_index([("storeUid", 1), ("day", 1)])
+        await menu_events_collection.create_index([("storeUid", 1), ("_id", 1)])
+        # Archival job scans for expired soft deletes
+        for collection in (dishes_collection, categories_collection, outlet_profiles_collection):
+            await collection.create_index(
+                [("deletedAt", 1)], partialFilterExpression={"isDeleted": True}, name="deleted_deletedAt")
+    except Exception as e:
+        print(f"⚠️ Warning: Index creation failed: {str(e)}")
+
+
+async def backfill_soft_delete_flags():
+    """
+    Older documents have no isDeleted field; give them an explicit False so they
+    match the live filter and the partial indexes.
+    """
+    try:
+        for collection in (dishes_collection, categories_collection, outlet_profiles_collection):
+            await collection.update_many({"isDeleted": {"$exists": False}}, {"$set": {"isDeleted": False}})
+    except Exception as e:
+        print(f"⚠️ Warning: isDeleted backfill failed: {str(e)}")
+
+
+async def backfill_outlet_locations():
+    """
+    Builds the GeoJSON location of outlets that only have latitude/longitude
+    fields (skipping out-of-range pairs, which the 2dsphere index would reject).
+    """
+    try:
+        await outlet_profiles_collection.update_many(
+            {
+                "location": None,
+                "latitude": {"$type": "number", "$gte": -90, "$lte": 90},
+                "longitude": {"$type": "number", "$gte": -180, "$lte": 180},
+            },
+            [{"$set": {"location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}]
+        )
+    except Exception as e:
+        print(f"⚠️ Warning: Outlet location backfill failed: {str(e)}")
+
+
+async def ensure_capped_collections():
+    """
+    Creates menu_events as a capped collection: live menu diffs are tailed from
+    it by every worker and only the newest MENU_EVENTS_CAP_MB are kept.
+    """
+    try:
+        db = get_db()
+        if "menu_events" not in await db.list_collection_names(filter={"name": "menu_events"}):
+            await db.create_collection("menu_events", capped=True, size=get_settings().menu_events_cap_mb * 1024 * 1024)
+    except Exception as e:
+        print(f"⚠️ Warning: Capped collection creation failed: {str(e)}")
 
 
 async def rename_legacy_collections():
     """Rename store_profiles → outlet_profiles if the old collection still exists."""
+    db_name = get_settings().db_name
     try:
-        existing = await db.list_collection_names()
+        existing = await get_db().list_collection_names()
         if "store_profiles" in existing and "outlet_profiles" not in existing:
             # The renameCollection command must be run against the 'admin' database.
-            await client.admin.command("renameCollection",
-                                f"{DB_NAME}.store_profiles",
-                                to=f"{DB_NAME}.outlet_profiles")
+            await get_client().admin.command("renameCollection",
+                                f"{db_name}.store_profiles",
+                                to=f"{db_name}.outlet_profiles")
             print("✅ Renamed MongoDB collection: store_profiles → outlet_profiles")
     except Exception as e:
         print(f"⚠️ Warning: Auto-migration failed: {str(e)}")
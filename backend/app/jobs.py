@@ -0,0 +1,55 @@
+import asyncio
+from typing import Awaitable, Callable, List
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Periodic jobs run inside every worker. Each must be safe to run concurrently
+# across workers (idempotent or claim-based).
+_tasks: List[asyncio.Task] = []
+
+
+async def _run_periodically(name: str, interval_seconds: float, job: Callable[[], Awaitable]):
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Background job {name} failed: {e}")
+        await asyncio.sleep(interval_seconds)
+
+
+async def _run_once(name: str, job: Callable[[], Awaitable]):
+    try:
+        await job()
+    except Exception as e:
+        logger.error(f"Background job {name} failed: {e}")
+
+
+def start_background_jobs():
+    from app.config import get_settings
+    from app.services.archival import run_archival_job
+    from app.services.ranking import run_rebalance_job
+    from app.services.asset_storage import cleanup_orphans
+    from app.services.dish_search import backfill_if_empty
+    from app.services.visitors import flush_sketches
+
+    jobs = [
+        ("rank_rebalance", 30, run_rebalance_job),
+        ("soft_delete_archival", get_settings().archive_interval_seconds, run_archival_job),
+        ("asset_orphan_cleanup", 3600, cleanup_orphans),
+        ("visitor_sketch_flush", get_settings().visitor_sketch_flush_seconds, flush_sketches),
+    ]
+    for name, interval, job in jobs:
+        _tasks.append(asyncio.create_task(_run_periodically(name, interval, job), name=name))
+    # One-shot: populate the discovery projection on first deploy
+    _tasks.append(asyncio.create_task(_run_once("dish_search_backfill", backfill_if_empty), name="dish_search_backfill"))
+
+
+async def stop_background_jobs():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
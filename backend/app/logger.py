@@ -1,23 +1,168 @@
+import atexit
+import contextvars
+import json
 import logging
+import queue
+import random
 import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Request ID of the request being handled, set by RequestIdMiddleware
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Loggers under this prefix carry hot-path messages and are sampled (LOG_SAMPLE_RATES)
+HOT = "app.hot"
+
+_queue_handler = None
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["requestId"] = request_id
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+    def format(self, record):
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{line} [{request_id}]" if request_id else line
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Hands records to the background writer without ever blocking the caller:
+    when the queue is full the record is dropped and counted.
+    """
+
+    def prepare(self, record):
+        # Only the cheap, context-bound work happens on the caller: merge args and
+        # capture the request ID and traceback text. Formatting is the writer's job.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        record.request_id = request_id_var.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            from app import metrics
+            metrics.inc("log_records_dropped", logger=record.name)
+
+
+class SamplingFilter(logging.Filter):
+    """Passes a `rate` fraction of records below WARNING; warnings and errors always pass."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def _get_queue_handler():
+    global _queue_handler, _listener
+    if _queue_handler is None:
+        from app.config import get_settings
+
+        settings = get_settings()
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JsonFormatter() if settings.log_format == "json" else TextFormatter())
+
+        log_queue = queue.Queue(maxsize=settings.log_queue_size)
+        _queue_handler = DroppingQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=False)
+        _listener.start()
+        atexit.register(stop_logging)
+    return _queue_handler
+
+
+def stop_logging():
+    """Flushes queued records and stops the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _sample_rate(name: str, rates: dict):
+    # Most specific configured prefix wins
+    matches = [prefix for prefix in rates if name == prefix or name.startswith(prefix + ".")]
+    return rates[max(matches, key=len)] if matches else None
+
 
 def get_logger(name: str):
     logger = logging.getLogger(name)
-    
+
     if not logger.handlers:
-        logger.setLevel(logging.INFO)
-        
-        # Console Handler
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)
-        
-        # Formatter
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        
-        console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
-        
+        from app.config import get_settings
+
+        settings = get_settings()
+        logger.setLevel(settings.log_level)
+        logger.addHandler(_get_queue_handler())
+        logger.propagate = False
+
+        rate = _sample_rate(name, settings.log_sample_rates)
+        if rate is not None and rate < 1:
+            logger.addFilter(SamplingFilter(rate))
+
     return logger
+
+
+class RequestIdMiddleware:
+    """
+    Tags every log line of a request with its ID: taken from an incoming
+    X-Request-ID header (so IDs follow a request across services) or generated,
+    and echoed back on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.encode(), request_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
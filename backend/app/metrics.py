@@ -0,0 +1,46 @@
+import threading
+from collections import defaultdict
+
+# In-process metrics registry. Values are per worker; scrape every worker
+# (or aggregate in the log pipeline) for fleet-wide numbers.
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_observations = {}
+
+
+def _key(name: str, labels: dict) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in sorted(labels.items())) + "}"
+
+
+def inc(name: str, value: float = 1, **labels):
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def set_value(name: str, value: float, **labels):
+    with _lock:
+        _counters[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels):
+    """Records a sample into a count/sum/min/max summary."""
+    key = _key(name, labels)
+    with _lock:
+        stats = _observations.get(key)
+        if stats is None:
+            _observations[key] = {"count": 1, "sum": value, "min": value, "max": value}
+        else:
+            stats["count"] += 1
+            stats["sum"] += value
+            stats["min"] = min(stats["min"], value)
+            stats["max"] = max(stats["max"], value)
+
+
+def snapshot() -> dict:
+    with _lock:
+        summaries = {
+            k: {**v, "avg": v["sum"] / v["count"]} for k, v in _observations.items()
+        }
+        return {"counters": dict(_counters), "summaries": summaries}
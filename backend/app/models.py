@@ -56,8 +56,10 @@ class OutletDB(OutletBase):
     currency: str = "₹"
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    location: Optional[dict] = None  # GeoJSON Point, kept in sync with latitude/longitude
     isActive: bool = True
     isDeleted: bool = False
+    deletedAt: Optional[datetime] = None
     qrScanCount: int = 0
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
@@ -95,6 +97,9 @@ class CategoryDB(BaseModel):
     name: str
     isPublished: bool = False
     order: int = 0
+    rank: Optional[str] = None  # fractional order key, see services/ranking.py
+    isDeleted: bool = False
+    deletedAt: Optional[datetime] = None
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
 
@@ -123,9 +128,15 @@ class DishDB(BaseModel):
     imageIndex: int
     isPublished: bool = False
     order: int = 0
+    rank: Optional[str] = None
+    isDeleted: bool = False
+    deletedAt: Optional[datetime] = None
     variants: List[Variant] = []
     addons: List[Addon] = []
     generationCount: int = 0
+    imagePrompt: Optional[str] = None  # cached visual description, see services/image_prompts.py
+    imagePromptAttemptedAt: Optional[datetime] = None
+    draftImageUrl: Optional[str] = None  # latest draft preview, never published
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
 
@@ -160,10 +171,13 @@ class AdminConfigDB(BaseModel):
     maxOtpResends: int = 3
     otpBlockDurationMinutes: int = 10
     otpResendWaitSeconds: int = 30
-    imageGenerationLimit: int = 50
+    imageGenerationLimit: int = 50  # per business and calendar month, see services/quota.py
     imageGenerationLimitPerDish: int = 1
     maxImagesPerUpload: int = 5
     processCreationLimit: int = 3
+    menuExtractionLimit: int = 200  # menu pages per business and calendar month
+    imageDraftLimit: int = 500  # draft previews per business and calendar month
+    imageGenerationProfile: str = Field("final", pattern="^(draft|final)$")  # default profile, see services/stability_service.py
 
 # --- Business Config Models ---
 class BusinessConfigDB(AdminConfigDB):
@@ -177,6 +191,9 @@ class BusinessConfigUpdate(BaseModel):
     imageGenerationLimitPerDish: Optional[int] = None
     maxImagesPerUpload: Optional[int] = None
     processCreationLimit: Optional[int] = None
+    menuExtractionLimit: Optional[int] = None
+    imageDraftLimit: Optional[int] = None
+    imageGenerationProfile: Optional[str] = Field(None, pattern="^(draft|final)$")
 
 # --- OTP Models ---
 class OTPRecord(BaseModel):
@@ -186,9 +203,12 @@ class OTPRecord(BaseModel):
     requestCount: int = 1
     blockedUntil: Optional[datetime] = None
 
+class DishResponse(DishDB):
+    imageVariants: Optional[dict] = None  # thumb/card/full URLs + srcset, see image_variants
+
 class DishPaginationResponse(BaseModel):
     page: int
     totalPages: int
-    dish: Optional[DishDB]
+    dish: Optional[DishResponse]
     generationLimit: int = 1
     storeCurrency: str = "₹"
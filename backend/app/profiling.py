@@ -0,0 +1,228 @@
+import asyncio
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime
+from typing import Optional
+
+from app.config import get_settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+_settings = get_settings()
+PROFILING_TOKEN = _settings.profiling_token
+PROFILING_SAMPLE_RATE = _settings.profiling_sample_rate
+PROFILING_INTERVAL_MS = _settings.profiling_interval_ms
+PROFILING_BUFFER_SIZE = _settings.profiling_buffer_size
+
+PROFILE_HEADER = "x-profile-token"
+
+# Finished profiles, oldest dropped first
+_profiles: deque = deque(maxlen=PROFILING_BUFFER_SIZE)
+_profiles_lock = threading.Lock()
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """Checks a profiling token against PROFILING_TOKEN (disabled when unset)."""
+    if not PROFILING_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token, PROFILING_TOKEN)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+def _thread_stack(frame) -> tuple:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def _await_stack(coro) -> tuple:
+    """Walks the cr_await chain of a suspended coroutine down to the awaited leaf."""
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            stack.append(f"<{type(coro).__name__}>")
+            break
+        stack.append(_frame_label(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return tuple(stack)
+
+
+def _is_loop_idle(frame) -> bool:
+    # The event loop blocks inside selectors.select() while waiting on sockets
+    return frame is not None and os.path.basename(frame.f_code.co_filename) == "selectors.py"
+
+
+class ProfileSession:
+    """
+    Statistical profile of a single request.
+
+    A daemon thread samples the event loop thread every PROFILING_INTERVAL_MS and
+    classifies each sample as:
+      - cpu:  the request task is executing Python code
+      - await: the task is suspended and the loop is idle waiting on IO
+      - loop_busy: the task is ready/suspended while the loop runs other work
+    """
+
+    def __init__(self, method: str, path: str, trigger: str):
+        self.profile_id = f"prof_{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.thread_id = threading.get_ident()
+        self.task = asyncio.current_task()
+        self.interval = PROFILING_INTERVAL_MS / 1000
+        self.cpu_stacks: Counter = Counter()
+        self.await_stacks: Counter = Counter()
+        self.counts = Counter()
+        self.status_code: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"profiler-{self.profile_id}", daemon=True)
+
+    def start(self):
+        self.started_at = datetime.utcnow()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self._thread.start()
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self.wall_ms = (time.perf_counter() - self._wall_start) * 1000
+        # thread_time covers the whole loop thread, so it includes concurrent requests
+        self.loop_cpu_ms = (time.thread_time() - self._cpu_start) * 1000
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        coro = self.task.get_coro() if self.task else None
+        if coro is not None and getattr(coro, "cr_running", False):
+            self.counts["cpu"] += 1
+            self.cpu_stacks[_thread_stack(frame)] += 1
+            return
+        kind = "await" if _is_loop_idle(frame) else "loop_busy"
+        self.counts[kind] += 1
+        if coro is not None:
+            self.await_stacks[_await_stack(coro)] += 1
+
+    def breakdown_ms(self) -> dict:
+        total = sum(self.counts.values())
+        if not total:
+            return {"cpu": 0.0, "await": 0.0, "loop_busy": 0.0}
+        return {
+            kind: round(self.wall_ms * self.counts[kind] / total, 2)
+            for kind in ("cpu", "await", "loop_busy")
+        }
+
+    def summary_header(self) -> str:
+        parts = [f"id={self.profile_id}", f"wall={self.wall_ms:.1f}ms"]
+        parts += [f"{k}={v:.1f}ms" for k, v in self.breakdown_ms().items()]
+        parts.append(f"samples={sum(self.counts.values())}")
+        return ";".join(parts)
+
+    def summary(self) -> dict:
+        return {
+            "profileId": self.profile_id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "statusCode": self.status_code,
+            "startedAt": self.started_at,
+            "wallMs": round(self.wall_ms, 2),
+            "loopCpuMs": round(self.loop_cpu_ms, 2),
+            "breakdownMs": self.breakdown_ms(),
+            "samples": sum(self.counts.values()),
+        }
+
+    def to_dict(self) -> dict:
+        data = self.summary()
+        data["intervalMs"] = PROFILING_INTERVAL_MS
+        data["cpuStacks"] = {";".join(k): v for k, v in self.cpu_stacks.most_common()}
+        data["awaitStacks"] = {";".join(k): v for k, v in self.await_stacks.most_common()}
+        return data
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed stack format, ready for flamegraph.pl / speedscope."""
+        lines = [f"cpu;{';'.join(k)} {v}" for k, v in self.cpu_stacks.items()]
+        lines += [f"await;{';'.join(k)} {v}" for k, v in self.await_stacks.items()]
+        return "\n".join(lines) + "\n"
+
+
+def list_profiles() -> list:
+    with _profiles_lock:
+        return [p.summary() for p in reversed(_profiles)]
+
+
+def get_profile(profile_id: str) -> Optional[ProfileSession]:
+    with _profiles_lock:
+        for p in _profiles:
+            if p.profile_id == profile_id:
+                return p
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in per-request profiler.
+
+    A request is profiled when it carries a valid X-Profile-Token header, or when
+    it is picked by PROFILING_SAMPLE_RATE. Implemented as plain ASGI (not
+    BaseHTTPMiddleware) so the endpoint runs in the same task being sampled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _trigger(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER.encode() and is_authorized(value.decode()):
+                return "header"
+        if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trigger = self._trigger(scope)
+        if not trigger:
+            return await self.app(scope, receive, send)
+
+        session = ProfileSession(scope["method"], scope["path"], trigger)
+        session.start()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                session.stop()
+                session.status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-summary", session.summary_header().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session.stop()
+            with _profiles_lock:
+                _profiles.append(session)
+            logger.info(f"Profiled {session.method} {session.path}: {session.summary_header()}")
@@ -1,54 +1,52 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from app.database import admin_config_collection, business_types_collection, business_config_collection
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import PlainTextResponse
+from typing import List, Optional
+from app.database import business_types_collection, pool_stats
 from app.models import AdminConfigDB, BusinessConfigDB, BusinessConfigUpdate
+from app import metrics
+from app.services.menu_export import export_outlet_menu
+from app.services import archival, config_service
+from app.services.outbound import provider_stats
+from app.services.menu_service import menu_changed
+from app.profiling import is_authorized, list_profiles, get_profile
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 @router.get("/config", response_model=AdminConfigDB)
 async def get_admin_config():
-    config = await admin_config_collection.find_one({}, {"_id": 0})
-    if not config:
-        # Return default config if none exists in DB
-        return AdminConfigDB()
-    return AdminConfigDB(**config)
+    return await config_service.get_global_config()
 
 @router.post("/config", response_model=AdminConfigDB)
 async def update_admin_config(config: AdminConfigDB):
-    config_dict = config.dict()
-    await admin_config_collection.update_one({}, {"$set": config_dict}, upsert=True)
+    # One write: businesses only store their overrides, so every business without
+    # one picks the new values up
+    await config_service.set_global_config(config)
     return config
 
 @router.get("/business-configs", response_model=List[BusinessConfigDB])
 async def get_all_business_configs():
-    cursor = business_config_collection.find({}, {"_id": 0})
-    return await cursor.to_list(length=1000)
+    return await config_service.list_business_configs(limit=1000)
 
 @router.get("/business-config/{business_id}", response_model=BusinessConfigDB)
 async def get_business_config(business_id: str):
-    config = await business_config_collection.find_one({"businessId": business_id}, {"_id": 0})
-    if not config:
-        # Fallback to general admin config if not specifically set
-        admin_config = await admin_config_collection.find_one({}, {"_id": 0})
-        if not admin_config:
-            admin_config = AdminConfigDB().dict()
-        return BusinessConfigDB(**admin_config, businessId=business_id)
-    return BusinessConfigDB(**config)
+    config = await config_service.get_business_config(business_id)
+    return BusinessConfigDB(**config.dict(), businessId=business_id)
+
+@router.get("/business-config/{business_id}/sources")
+async def get_business_config_sources(business_id: str):
+    """Effective value of every setting and whether it comes from the business, global config or defaults."""
+    return {"businessId": business_id, "config": await config_service.get_config_sources(business_id)}
 
 @router.put("/business-config/{business_id}", response_model=BusinessConfigDB)
 async def update_business_config(business_id: str, update: BusinessConfigUpdate):
+    # Fields sent as null drop the override and fall back to the global value
     update_dict = update.dict(exclude_unset=True)
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields to update")
-    
-    await business_config_collection.update_one(
-        {"businessId": business_id},
-        {"$set": update_dict},
-        upsert=True
-    )
-    
-    updated_config = await business_config_collection.find_one({"businessId": business_id}, {"_id": 0})
-    return BusinessConfigDB(**updated_config)
+
+    await config_service.set_business_overrides(business_id, update_dict)
+    config = await config_service.get_business_config(business_id)
+    return BusinessConfigDB(**config.dict(), businessId=business_id)
 
 @router.get("/business-types", response_model=List[str])
 async def get_business_types():
@@ -61,3 +59,67 @@ async def get_business_types():
         return ["Restaurant", "Cafe", "Bar", "Hotel", "Cloud Kitchen", "Bakery", "Other"]
         
     return [t["name"] for t in types]
+
+
+def _require_profiling_token(token: Optional[str]):
+    if not is_authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+@router.get("/profiles")
+async def get_profiles(x_profile_token: Optional[str] = Header(None)):
+    _require_profiling_token(x_profile_token)
+    return list_profiles()
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, format: str = "json", x_profile_token: Optional[str] = Header(None)):
+    _require_profiling_token(x_profile_token)
+    profile = get_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    return profile.to_dict()
+
+@router.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+@router.get("/db-pools")
+async def get_db_pools():
+    return pool_stats()
+
+@router.get("/outbound")
+async def get_outbound_providers():
+    """Concurrency, in-flight calls and circuit state per AI/media provider."""
+    return provider_stats()
+
+@router.post("/menu-exports")
+async def export_all_menus():
+    """Re-exports every outlet's static menu (backfill after enabling MENU_EXPORT_BACKEND)."""
+    from app.database import outlet_profiles_collection
+    exported = 0
+    async for outlet in outlet_profiles_collection.find({}, {"storeUid": 1}):
+        if await export_outlet_menu(outlet["storeUid"]):
+            exported += 1
+    return {"exported": exported}
+
+@router.post("/dish-search/rebuild")
+async def rebuild_dish_search_projection():
+    """Rewrites the cross-outlet discovery projection from every published menu."""
+    from app.services.dish_search import rebuild_dish_search
+    return {"outlets": await rebuild_dish_search()}
+
+@router.post("/archive/run")
+async def run_archival():
+    """Archives expired soft deletes now instead of waiting for the background job."""
+    return {kind: await archival.archive_expired(kind) for kind in archival.ARCHIVES}
+
+@router.post("/archive/{kind}/{item_id}/restore")
+async def restore_archived(kind: str, item_id: str):
+    if kind not in archival.ARCHIVES:
+        raise HTTPException(status_code=400, detail=f"Unknown kind: {kind}")
+    restored = await archival.restore(kind, item_id)
+    if not restored:
+        raise HTTPException(status_code=404, detail="Nothing to restore")
+    await menu_changed(restored.get("storeUid"))
+    return restored
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, status, Body
-from app.models import BusinessDB, OTPRecord, BusinessCreate, AdminConfigDB, BusinessUpdate, BusinessConfigDB
-from app.database import businesses_collection, otps_collection, outlet_profiles_collection, admin_config_collection, business_config_collection
+from app.models import BusinessDB, OTPRecord, BusinessCreate, BusinessUpdate
+from app.database import businesses_collection, otps_collection, outlet_profiles_collection
 from app.services.email_service import send_otp_email
-from app.services.cloudinary_service import upload_image
+from app.services.asset_storage import store_image, replace_image, release
 from app.services.auth_service import create_access_token, create_refresh_token, verify_token
+from app.services.config_service import get_business_config
+from app.services.quota import get_usage
 import random
 import uuid
 from datetime import datetime, timedelta
@@ -31,37 +33,15 @@ async def check_email(email: str = Body(..., embed=True)):
 
 @router.get("/config")
 async def get_config(businessId: Optional[str] = None):
-    # Try fetching business-specific config if businessId is provided
-    config = None
-    if businessId:
-        config = await business_config_collection.find_one({"businessId": businessId})
-    
-    # Fallback to global admin config if no business config found or provided
-    if not config:
-        config = await admin_config_collection.find_one({})
-        if not config:
-            config_obj = AdminConfigDB()
-            config = config_obj.dict()
-            await admin_config_collection.insert_one(config)
-    
-    config.pop("_id", None)
-    return config
+    # Business overrides merged over the global config (global only without businessId)
+    config = await get_business_config(businessId)
+    return config.dict()
 
 @router.post("/send-otp")
 async def send_otp(email: str = Body(..., embed=True), name: Optional[str] = Body(None, embed=True)):
     # 1. Get Config
     business = await businesses_collection.find_one({"email": email})
-    config_dict = None
-    if business:
-        config_dict = await business_config_collection.find_one({"businessId": business["businessId"]})
-    
-    if not config_dict:
-        config_dict = await admin_config_collection.find_one({})
-        if not config_dict:
-            config_dict = AdminConfigDB().dict()
-            await admin_config_collection.insert_one(config_dict)
-            
-    config = AdminConfigDB(**config_dict)
+    config = await get_business_config(business["businessId"] if business else None)
     
     # 2. Check existing OTP record for rate limiting
     record = await otps_collection.find_one({"email": email})
@@ -135,7 +115,7 @@ async def verify_otp(
         logo_url = None
         if logoData:
             try:
-                logo_url = upload_image(logoData, "business_logos", f"{business_id}_logo")
+                logo_url = await store_image(logoData)
             except Exception as e:
                 print(f"Failed to upload business logo: {e}")
 
@@ -161,24 +141,9 @@ async def verify_otp(
         {"businessId": business["businessId"]},
         {"$set": {"refreshToken": refresh_token}}
     )
-    
-    # 5. Initialize Business Configuration if not exists
-    biz_config = await business_config_collection.find_one({"businessId": business["businessId"]})
-    if not biz_config:
-        # Fetch current admin config
-        admin_config_dict = await admin_config_collection.find_one({})
-        if not admin_config_dict:
-            admin_config_dict = AdminConfigDB().dict()
-            await admin_config_collection.insert_one(admin_config_dict)
-        
-        # Create business-specific config
-        new_biz_config = BusinessConfigDB(
-            **admin_config_dict,
-            businessId=business["businessId"]
-        )
-        # Remove _id if it exists in admin_config_dict to avoid conflict
-        config_to_insert = new_biz_config.dict()
-        await business_config_collection.insert_one(config_to_insert)
+
+    # Business configuration is read as global config + sparse overrides
+    # (services/config_service.py); nothing to initialize per business
     
     return {
         "businessId": business["businessId"],
@@ -236,6 +201,14 @@ async def get_me(business_id: str):
         raise HTTPException(status_code=404, detail="Business not found")
     return business
 
+@router.get("/me/{business_id}/usage")
+async def get_my_usage(business_id: str):
+    """AI credits used this month against the business's limits."""
+    business = await businesses_collection.find_one({"businessId": business_id}, {"_id": 1})
+    if not business:
+        raise HTTPException(status_code=404, detail="Business not found")
+    return await get_usage(business_id, await get_business_config(business_id))
+
 @router.put("/me/{business_id}")
 async def update_business(
     business_id: str,
@@ -246,15 +219,17 @@ async def update_business(
     # Handle Logo Upload if present
     if "logoData" in update_dict:
         logo_data = update_dict.pop("logoData")
+        current = await businesses_collection.find_one({"businessId": business_id}, {"logoUrl": 1}) or {}
         if logo_data:
             try:
-                logo_url = upload_image(logo_data, "business_logos", f"{business_id}_logo")
+                logo_url = await replace_image(current.get("logoUrl"), logo_data)
                 update_dict["logoUrl"] = logo_url
             except Exception as e:
                 print(f"Failed to upload business logo: {e}")
         else:
             # If logoData is explicitly null/empty, remove the logo
             update_dict["logoUrl"] = None
+            await release(current.get("logoUrl"))
 
     if not update_dict:
         raise HTTPException(status_code=400, detail="No fields to update")
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, status, Query
 from typing import Optional
 from app.database import categories_collection, dishes_collection
 from app.models import CategoryDB
+from app.services.menu_service import menu_changed, category_renamed
 import uuid
 from datetime import datetime
 
@@ -15,28 +16,44 @@ async def update_category(category_id: str, name: str, isPublished: Optional[boo
     if isPublished is not None:
         update_data["isPublished"] = isPublished
         
-    result = await categories_collection.update_one(
+    category = await categories_collection.find_one_and_update(
         {"categoryId": category_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"storeUid": 1}
     )
-    if result.matched_count == 0:
+    if not category:
         raise HTTPException(status_code=404, detail="Category not found")
+
+    # Keep the denormalized name on dishes in step with the category
+    await dishes_collection.update_many(
+        {"categoryId": category_id},
+        {"$set": {"categoryName": name}}
+    )
+    if isPublished is not None:
+        await menu_changed(category.get("storeUid"))
+    else:
+        await category_renamed(category.get("storeUid"), category_id, name)
     return {"status": "success"}
 
 @router.delete("/categories/{category_id}")
 async def delete_category(category_id: str):
+    # Same timestamp on the category and its dishes so a restore can cascade
+    deleted_at = datetime.utcnow()
+
     # Soft delete dishes in this category
     await dishes_collection.update_many(
-        {"categoryId": category_id},
-        {"$set": {"isDeleted": True}}
+        {"categoryId": category_id, "isDeleted": False},
+        {"$set": {"isDeleted": True, "deletedAt": deleted_at}}
     )
     
     # Soft delete category
-    result = await categories_collection.update_one(
+    category = await categories_collection.find_one_and_update(
         {"categoryId": category_id},
-        {"$set": {"isDeleted": True}}
+        {"$set": {"isDeleted": True, "deletedAt": deleted_at}},
+        projection={"storeUid": 1}
     )
     
-    if result.matched_count == 0:
+    if not category:
         raise HTTPException(status_code=404, detail="Category not found")
+    await menu_changed(category.get("storeUid"))
     return {"status": "deleted"}
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from app.services.dish_search import discover_dishes
+
+router = APIRouter(prefix="/discovery", tags=["Discovery"])
+
+@router.get("/dishes")
+async def discover(
+    q: Optional[str] = Query(None, max_length=100),
+    businessId: Optional[str] = None,
+    storeUid: Optional[List[str]] = Query(None),
+    category: Optional[str] = None,
+    minPrice: Optional[float] = Query(None, ge=0),
+    maxPrice: Optional[float] = Query(None, ge=0),
+    page: int = Query(1, ge=1, le=100),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Published dishes across outlets, e.g. "biryani within this chain under 200".
+    Returns the page of dishes plus category, price-range and outlet facet counts.
+    """
+    if minPrice is not None and maxPrice is not None and minPrice > maxPrice:
+        raise HTTPException(status_code=400, detail="minPrice is greater than maxPrice")
+    return await discover_dishes(
+        q=q, business_id=businessId, store_uids=storeUid, category=category,
+        min_price=minPrice, max_price=maxPrice, page=page, limit=limit
+    )
@@ -1,9 +1,16 @@
 from fastapi import APIRouter, HTTPException, Query, UploadFile, File, Body
 from typing import Optional
 from app.database import dishes_collection, requests_collection
-from app.services.stability_service import generate_image_stability
-from app.services.cloudinary_service import upload_image
+from app.services.stability_service import DRAFT, FINAL, generate_image_stability
+from app.services.asset_storage import release, replace_image
+from app.services.outbound import ProviderUnavailable
+from app.services.config_service import get_business_config
+from app.services import quota
+from app.services.image_prompts import prompt_for_dish
 from app.models import DishPaginationResponse, DishDB
+from app.services.menu_service import menu_changed, dish_changed
+from app.services.ranking import next_ranks
+from app.services.image_variants import image_variants, with_variants
 from app.logger import get_logger
 import math
 
@@ -22,7 +29,7 @@ async def get_dishes(
 ):
     skip = (page - 1) * limit
     
-    query = {"requestId": request_id, "isDeleted": {"$ne": True}}
+    query = {"requestId": request_id, "isDeleted": False}
     total_count = await dishes_collection.count_documents(query)
     cursor = dishes_collection.find(query).skip(skip).limit(limit)
     
@@ -38,19 +45,20 @@ async def get_dishes(
         if cat:
             category_name = cat.get("name", "General")
 
-    from app.database import admin_config_collection, outlet_profiles_collection
-    config = await admin_config_collection.find_one() or {}
-    gen_limit = config.get("imageGenerationLimitPerDish", 1)
-
+    from app.database import outlet_profiles_collection
     req = await requests_collection.find_one({"requestId": request_id})
     outlet_currency = "₹"
+    business_id = None
     if req:
         store = await outlet_profiles_collection.find_one({"storeUid": req.get("storeUid")})
         if store:
             outlet_currency = store.get("currency", "₹")
+            business_id = store.get("contactId")
+    gen_limit = (await get_business_config(business_id)).imageGenerationLimitPerDish
 
     if dish_obj:
         dish_obj["categoryName"] = category_name
+        with_variants(dish_obj)
 
     return {
         "page": page,
@@ -61,56 +69,100 @@ async def get_dishes(
     }
 
 @router.post("/requests/{request_id}/generate-image/{dish_id}")
-async def generate_dish_image_route(request_id: str, dish_id: str):
-    dish = await dishes_collection.find_one({"dishId": dish_id, "requestId": request_id})
+async def generate_dish_image_route(
+    request_id: str,
+    dish_id: str,
+    profile: Optional[str] = Query(None, pattern="^(draft|final)$")
+):
+    dish = await dishes_collection.find_one({"dishId": dish_id, "requestId": request_id}, {"storeUid": 1})
     if not dish:
         raise HTTPException(status_code=404, detail="Dish not found")
 
-    from app.database import admin_config_collection
-    config = await admin_config_collection.find_one() or {}
-    limit = config.get("imageGenerationLimitPerDish", 1)
+    from app.database import outlet_profiles_collection
+    outlet = await outlet_profiles_collection.find_one({"storeUid": dish.get("storeUid")}, {"contactId": 1}) or {}
+    business_id = outlet.get("contactId")
+    config = await get_business_config(business_id)
 
-    if dish.get("generationCount", 0) >= limit:
-        raise HTTPException(status_code=400, detail="Generation limit reached for this dish")
+    # The business default only applies when the caller leaves the profile open
+    profile = profile or config.imageGenerationProfile
+    if profile == DRAFT:
+        return await _generate_draft(dish_id, business_id, config)
 
-    # Update status to generating
-    await dishes_collection.update_one(
-        {"dishId": dish_id},
-        {"$set": {"imageStatus": "generating"}}
-    )
+    # Both limits are checked and counted in single conditional updates, so
+    # concurrent clicks can't overspend either of them
+    dish = await quota.reserve_dish_generation(dish_id, request_id, config.imageGenerationLimitPerDish)
+    if not dish:
+        raise HTTPException(status_code=400, detail="Generation limit reached for this dish")
+    try:
+        reservation = await quota.reserve(business_id, quota.IMAGE_GENERATION, 1, config)
+    except quota.QuotaExceeded as e:
+        await quota.refund_dish_generation(dish_id, dish.get("imageStatus", "pending"))
+        raise HTTPException(status_code=429, detail=e.message)
 
     try:
-        # Generate Image
-        prompt = f"Professional high quality food photography of {dish['name']}, restaurant style, 4k, delicious"
-        image_bytes = generate_image_stability(prompt)
+        # Generate Image (cached per-dish prompt; no LLM call once the request is enriched)
+        prompt = await prompt_for_dish(dish)
+        image_bytes = await generate_image_stability(prompt, FINAL)
 
         if not image_bytes:
             raise Exception("No image generated")
 
-        # Upload to Cloudinary
-        image_url = upload_image(image_bytes, "generated_dishes", f"{dish_id}_gen")
+        # Store (deduplicated by content), releasing the image it replaces
+        image_url = await replace_image(dish.get("imageUrl"), image_bytes)
 
-        # Update DB
+        # Update DB (the final render supersedes any draft preview)
         await dishes_collection.update_one(
             {"dishId": dish_id},
-            {"$set": {
-                "imageUrl": image_url, 
-                "imageStatus": "ready"
-            }, "$inc": {"generationCount": 1}}
+            {"$set": {"imageUrl": image_url, "imageStatus": "ready"}, "$unset": {"draftImageUrl": ""}}
         )
+        await release(dish.get("draftImageUrl"))
+        await dish_changed({**dish, "imageUrl": image_url, "imageStatus": "ready"})
         
         # Check if ALL dishes are ready to update Request status?
         # (Optional optimization, or handled by separate check)
         
-        return {"imageUrl": image_url, "imageStatus": "ready"}
+        return {"imageUrl": image_url, "imageVariants": image_variants(image_url), "imageStatus": "ready", "imageProfile": FINAL}
 
+    except ProviderUnavailable as e:
+        await quota.refund_dish_generation(dish_id)
+        await reservation.refund()
+        raise HTTPException(status_code=503, detail=f"Image generation is temporarily unavailable ({e.reason}), please retry shortly")
     except Exception as e:
         logger.error(f"CRITICAL ERROR in generate_dish_image_route: {str(e)}") # <--- ADDED LOG
-        await dishes_collection.update_one(
-            {"dishId": dish_id},
-            {"$set": {"imageStatus": "failed"}}
-        )
+        await quota.refund_dish_generation(dish_id)
+        await reservation.refund()
         raise HTTPException(status_code=500, detail=str(e))
+
+async def _generate_draft(dish_id: str, business_id: str, config) -> dict:
+    """
+    Cheap preview render, kept in draftImageUrl: it never replaces the dish's
+    image, isn't published and doesn't use up the dish's final renders. Drafts
+    draw on their own monthly allowance.
+    """
+    try:
+        reservation = await quota.reserve(business_id, quota.IMAGE_DRAFT, 1, config)
+    except quota.QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=e.message)
+
+    try:
+        dish = await dishes_collection.find_one({"dishId": dish_id})
+        prompt = await prompt_for_dish(dish)
+        image_bytes = await generate_image_stability(prompt, DRAFT)
+        if not image_bytes:
+            raise Exception("No image generated")
+
+        draft_url = await replace_image(dish.get("draftImageUrl"), image_bytes)
+        await dishes_collection.update_one({"dishId": dish_id}, {"$set": {"draftImageUrl": draft_url}})
+        return {"draftImageUrl": draft_url, "draftImageVariants": image_variants(draft_url), "imageProfile": DRAFT}
+
+    except ProviderUnavailable as e:
+        await reservation.refund()
+        raise HTTPException(status_code=503, detail=f"Image generation is temporarily unavailable ({e.reason}), please retry shortly")
+    except Exception as e:
+        logger.error(f"Draft generation failed for {dish_id}: {str(e)}")
+        await reservation.refund()
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.put("/dishes/{dish_id}")
 async def update_dish(dish_id: str, update_data: dict = Body(...)):
     # Determine what fields to update
@@ -119,6 +171,7 @@ async def update_dish(dish_id: str, update_data: dict = Body(...)):
     update_fields = {"updatedAt": datetime.utcnow()}
     if "name" in update_data:
         update_fields["name"] = update_data["name"]
+        update_fields["imagePrompt"] = None  # describes the old dish; rewritten on next enrichment
     if "price" in update_data:
         try:
             val = update_data["price"]
@@ -129,6 +182,7 @@ async def update_dish(dish_id: str, update_data: dict = Body(...)):
         update_fields["weight"] = update_data["weight"]
     if "description" in update_data:
         update_fields["description"] = update_data["description"]
+        update_fields["imagePrompt"] = None
     if "isPublished" in update_data:
         update_fields["isPublished"] = bool(update_data["isPublished"])
     
@@ -147,7 +201,7 @@ async def update_dish(dish_id: str, update_data: dict = Body(...)):
             cat_name = update_data["categoryName"]
             from app.database import categories_collection
             
-            cat = await categories_collection.find_one({"storeUid": store_uid, "name": cat_name, "isDeleted": {"$ne": True}})
+            cat = await categories_collection.find_one({"storeUid": store_uid, "name": cat_name, "isDeleted": False})
             if not cat:
                 cat_id = f"cat_{(uuid.uuid4().hex)[:8]}"
                 await categories_collection.insert_one({
@@ -156,6 +210,8 @@ async def update_dish(dish_id: str, update_data: dict = Body(...)):
                     "requestId": dish.get("requestId", "manual"),
                     "name": cat_name,
                     "isPublished": True,
+                    "rank": (await next_ranks("categories", store_uid))[0],
+                    "isDeleted": False,
                     "createdAt": datetime.utcnow(),
                     "updatedAt": datetime.utcnow()
                 })
@@ -177,6 +233,7 @@ async def update_dish(dish_id: str, update_data: dict = Body(...)):
         
     # Return the full updated document to allow perfect frontend sync
     updated_dish = await dishes_collection.find_one({"dishId": dish_id}, {"_id": 0})
+    await dish_changed(updated_dish)
     return updated_dish
 
 
@@ -198,12 +255,15 @@ async def create_manual_dish(outlet_uid: str, dish_data: dict = Body(...)):
         "imageStatus": "pending",
         "imageIndex": 0,
         "isPublished": True,
+        "rank": (await next_ranks("dishes", outlet_uid))[0],
+        "isDeleted": False,
         "variants": dish_data.get("variants", []),
         "addons": dish_data.get("addons", []),
         "createdAt": datetime.utcnow()
     }
     
     await dishes_collection.insert_one(new_dish)
+    await menu_changed(outlet_uid)
     return new_dish
 
 @router.post("/dishes/{dish_id}/upload-image")
@@ -214,8 +274,8 @@ async def upload_dish_image_manual(dish_id: str, file: UploadFile = File(...)):
 
     try:
         content = await file.read()
-        # Upload to Cloudinary
-        image_url = upload_image(content, "manual_dishes", f"{dish_id}_manual")
+        # Store (deduplicated by content), releasing the image it replaces
+        image_url = await replace_image(dish.get("imageUrl"), content)
         
         # Update DB
         await dishes_collection.update_one(
@@ -225,17 +285,20 @@ async def upload_dish_image_manual(dish_id: str, file: UploadFile = File(...)):
                 "imageStatus": "ready"
             }}
         )
-        return {"imageUrl": image_url, "imageStatus": "ready"}
+        await dish_changed({**dish, "imageUrl": image_url, "imageStatus": "ready"})
+        return {"imageUrl": image_url, "imageVariants": image_variants(image_url), "imageStatus": "ready"}
     except Exception as e:
         logger.error(f"Error in upload_dish_image_manual: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.delete("/dishes/{dish_id}")
 async def delete_dish(dish_id: str):
-    result = await dishes_collection.update_one(
+    dish = await dishes_collection.find_one_and_update(
         {"dishId": dish_id},
-        {"$set": {"isDeleted": True}}
+        {"$set": {"isDeleted": True, "deletedAt": datetime.utcnow()}},
+        projection={"storeUid": 1}
     )
-    if result.matched_count == 0:
+    if not dish:
         raise HTTPException(status_code=404, detail="Dish not found")
+    await menu_changed(dish.get("storeUid"))
     return {"status": "deleted"}
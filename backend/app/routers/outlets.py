@@ -1,17 +1,38 @@
-from fastapi import APIRouter, Form, UploadFile, File, HTTPException, status, Query
+from fastapi import APIRouter, Form, UploadFile, File, HTTPException, status, Query, Header, Body, Request
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from pydantic import BaseModel
-from app.database import businesses_collection, outlet_profiles_collection, scans_collection, admin_config_collection, business_config_collection
-from app.services.cloudinary_service import upload_image
-from app.models import OutletDB, OutletUpdate, AdminConfigDB
+from app.database import businesses_collection, outlet_profiles_collection, scans_collection
+from app.services.config_service import get_business_config
+from app.services.asset_storage import store_image, replace_image
+from app.models import OutletDB, OutletUpdate
+from app.services.menu_service import get_published_menu, menu_changed, outlet_changed
+from app.services.ranking import RANK_SORT, next_ranks, ranks_between, move
+from app.services.menu_clone import clone_menu
+from app.services import menu_events, visitors
+from app.services.menu_transfer import FORMATS, import_menu, export_menu
+from app.services.image_variants import with_variants
+from app.services.geo import geo_point, nearby_outlets
+from app.logger import get_logger, HOT
 import uuid
 from datetime import datetime
 import shutil
 
+# Per-request lines on public read paths; sampled via LOG_SAMPLE_RATES
+hot_logger = get_logger(f"{HOT}.outlet_dishes")
+
 class ReorderItem(BaseModel):
     id: str
     order: int
 
+class CloneRequest(BaseModel):
+    targetUids: List[str]
+
+class MoveItem(BaseModel):
+    id: str
+    prevId: Optional[str] = None  # item that should end up directly above
+    nextId: Optional[str] = None  # item that should end up directly below
+
 router = APIRouter(tags=["Outlets"])
 
 @router.post("/businesses/{business_id}/outlets", response_model=dict)
@@ -33,17 +54,11 @@ async def create_outlet(
         raise HTTPException(status_code=404, detail="Business not found")
 
     # Check processCreationLimit
-    config_dict = await business_config_collection.find_one({"businessId": business_id})
-    if not config_dict:
-        config_dict = await admin_config_collection.find_one({})
-        if not config_dict:
-            config_dict = AdminConfigDB().dict()
-    
-    config = AdminConfigDB(**config_dict)
+    config = await get_business_config(business_id)
     
     existing_outlets_count = await outlet_profiles_collection.count_documents({
         "contactId": business_id, 
-        "isDeleted": {"$ne": True}
+        "isDeleted": False
     })
     
     if existing_outlets_count >= config.processCreationLimit:
@@ -52,6 +67,11 @@ async def create_outlet(
             detail=f"Maximum limit of {config.processCreationLimit} outlets reached for your business."
         )
 
+    try:
+        location = geo_point(latitude, longitude)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     outlet_uid = f"store_{uuid.uuid4().hex[:8]}"  # prefix kept for existing data compat
 
     # Upload Logo if provided
@@ -59,7 +79,7 @@ async def create_outlet(
     if logo:
         try:
             content = await logo.read()
-            logo_url = upload_image(content, "store_logos", f"{outlet_uid}_logo")
+            logo_url = await store_image(content)
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Logo upload failed: {str(e)}")
 
@@ -69,7 +89,7 @@ async def create_outlet(
         for i, img in enumerate(store_images):
             try:
                 content = await img.read()
-                url = upload_image(content, "store_photos", f"{outlet_uid}_photo_{i}")
+                url = await store_image(content)
                 store_image_urls.append(url)
             except Exception as e:
                 print(f"Failed to upload outlet image {i}: {e}")
@@ -85,7 +105,8 @@ async def create_outlet(
         storeImages=store_image_urls,
         currency=currency,
         latitude=latitude,
-        longitude=longitude
+        longitude=longitude,
+        location=location
     )
 
     # Save Outlet
@@ -100,6 +121,19 @@ async def create_outlet(
     return {"storeUid": outlet_uid}
 
 
+@router.get("/outlets/nearby")
+async def get_nearby_outlets(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radiusKm: float = Query(5, gt=0, le=100),
+    activeOnly: bool = Query(True),
+    page: int = Query(1, ge=1, le=50),
+    limit: int = Query(20, ge=1, le=50)
+):
+    """Outlets within radiusKm of a point, nearest first, with distanceMeters."""
+    return await nearby_outlets(lat, lng, radiusKm, page, limit, active_only=activeOnly)
+
+
 @router.get("/businesses/{business_id}/outlets")
 async def get_business_outlets(
     business_id: str, 
@@ -107,7 +141,7 @@ async def get_business_outlets(
     page: int = 1,
     limit: int = 10
 ):
-    query = {"contactId": business_id, "isDeleted": {"$ne": True}}
+    query = {"contactId": business_id, "isDeleted": False}
     if search:
         query["storeName"] = {"$regex": search, "$options": "i"}
     
@@ -135,12 +169,24 @@ async def update_outlet(outlet_uid: str, outlet_data: OutletUpdate):
         return {"status": "no_changes"}
     update_data["updatedAt"] = datetime.utcnow()
 
+    # Keep the GeoJSON point in step with the coordinate fields
+    if "latitude" in update_data or "longitude" in update_data:
+        current = await outlet_profiles_collection.find_one({"storeUid": outlet_uid}, {"latitude": 1, "longitude": 1}) or {}
+        try:
+            update_data["location"] = geo_point(
+                update_data.get("latitude", current.get("latitude")),
+                update_data.get("longitude", current.get("longitude")),
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
     result = await outlet_profiles_collection.update_one(
         {"storeUid": outlet_uid},
         {"$set": update_data}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Outlet not found")
+    await outlet_changed(outlet_uid)
     return {"status": "success"}
 
 
@@ -152,11 +198,12 @@ async def update_outlet_logo(outlet_uid: str, logo: UploadFile = File(...)):
 
     try:
         content = await logo.read()
-        logo_url = upload_image(content, "store_logos", f"{outlet_uid}_logo")
+        logo_url = await replace_image(outlet.get("logoUrl"), content)
         await outlet_profiles_collection.update_one(
             {"storeUid": outlet_uid},
             {"$set": {"logoUrl": logo_url, "updatedAt": datetime.utcnow()}}
         )
+        await outlet_changed(outlet_uid)
         return {"logoUrl": logo_url}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Logo upload failed: {str(e)}")
@@ -166,55 +213,89 @@ async def update_outlet_logo(outlet_uid: str, logo: UploadFile = File(...)):
 async def delete_outlet(outlet_uid: str):
     result = await outlet_profiles_collection.update_one(
         {"storeUid": outlet_uid},
-        {"$set": {"isDeleted": True, "updatedAt": datetime.utcnow()}}
+        {"$set": {"isDeleted": True, "deletedAt": datetime.utcnow(), "updatedAt": datetime.utcnow()}}
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Outlet not found")
+    await menu_changed(outlet_uid)
     return {"status": "deleted"}
 
 
 @router.get("/outlets/{outlet_uid}/menu")
 async def get_outlet_menu(outlet_uid: str):
-    outlet = await outlet_profiles_collection.find_one({"storeUid": outlet_uid}, {"_id": 0})
-    if not outlet:
+    published = await get_published_menu(outlet_uid, read_class="public")
+    if not published:
         raise HTTPException(status_code=404, detail="Outlet not found")
 
-    # Get Categories
-    from app.database import categories_collection, dishes_collection
-    categories = await categories_collection.find({"storeUid": outlet_uid, "isPublished": True}, {"_id": 0}).sort("order", 1).to_list(length=100)
+    config = await get_business_config(published["outlet"].get("contactId"))
+
+    return {
+        "outlet": published["outlet"],
+        "menu": published["menu"],
+        "generationLimit": config.imageGenerationLimitPerDish
+    }
 
-    # Get Dishes
-    dishes = await dishes_collection.find({"storeUid": outlet_uid, "isPublished": True}, {"_id": 0}).sort("order", 1).to_list(length=1000)
 
-    # Group dishes by category
-    menu_data = []
+@router.get("/outlets/{outlet_uid}/menu/events")
+async def outlet_menu_events(outlet_uid: str, last_event_id: Optional[str] = Header(None)):
+    """
+    Live menu updates as server-sent events: compact diffs (see services/menu_events.py)
+    to apply to the menu from GET /outlets/{uid}/menu instead of polling it.
+    """
+    outlet = await outlet_profiles_collection.reads("public").find_one({"storeUid": outlet_uid, "isDeleted": False}, {"_id": 1})
+    if not outlet:
+        raise HTTPException(status_code=404, detail="Outlet not found")
+    return StreamingResponse(
+        menu_events.stream(outlet_uid, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    # 1. Process defined categories
-    for cat in categories:
-        cat_dishes = [d for d in dishes if d.get("categoryId") == cat["categoryId"]]
-        menu_data.append({
-            "categoryId": cat["categoryId"],
-            "categoryName": cat["name"],
-            "dishes": cat_dishes
-        })
 
-    # 2. Process uncategorized dishes
-    uncategorized = [d for d in dishes if not d.get("categoryId")]
-    if uncategorized:
-        menu_data.append({
-            "categoryName": "General",
-            "dishes": uncategorized
-        })
+@router.post("/outlets/{outlet_uid}/clone")
+async def clone_outlet_menu(outlet_uid: str, body: CloneRequest):
+    """Copies this outlet's published menu into other outlets of the same business."""
+    if not body.targetUids:
+        raise HTTPException(status_code=400, detail="No target outlets given")
+    try:
+        results = await clone_menu(outlet_uid, body.targetUids)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"results": results}
 
-    from app.database import admin_config_collection
-    config = await admin_config_collection.find_one() or {}
-    gen_limit = config.get("imageGenerationLimitPerDish", 1)
 
-    return {
-        "outlet": outlet,
-        "menu": menu_data,
-        "generationLimit": gen_limit
-    }
+@router.post("/outlets/{outlet_uid}/menu/import")
+async def import_outlet_menu(
+    outlet_uid: str,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson; taken from the file extension if omitted"),
+    mode: str = Query("append", pattern="^(append|replace)$")
+):
+    """
+    Imports dishes from a CSV/NDJSON file (see GET /outlets/{uid}/menu/export for
+    the layout). Rows that fail validation are reported and skipped.
+    """
+    fmt = format or ("csv" if (file.filename or "").lower().endswith(".csv") else "ndjson")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'")
+    try:
+        return await import_menu(outlet_uid, file, fmt, mode)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get("/outlets/{outlet_uid}/menu/export")
+async def export_outlet_menu(outlet_uid: str, format: str = Query("csv", pattern="^(csv|ndjson)$")):
+    """Streams the published menu as CSV or NDJSON, ready to edit and re-import."""
+    outlet = await outlet_profiles_collection.find_one({"storeUid": outlet_uid, "isDeleted": False}, {"_id": 1})
+    if not outlet:
+        raise HTTPException(status_code=404, detail="Outlet not found")
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_menu(outlet_uid, format),
+        media_type=f"{media_type}; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="menu-{outlet_uid}.{format}"'}
+    )
 
 
 @router.get("/outlets/{outlet_uid}/categories")
@@ -225,8 +306,10 @@ async def get_outlet_categories(
     limit: int = Query(10, ge=-1)
 ):
     from app.database import categories_collection, dishes_collection
+    categories_collection = categories_collection.reads("public")
+    dishes_collection = dishes_collection.reads("public")
     
-    query = {"storeUid": outlet_uid, "isPublished": True, "isDeleted": {"$ne": True}}
+    query = {"storeUid": outlet_uid, "isPublished": True, "isDeleted": False}
     if search:
         query["name"] = {"$regex": search, "$options": "i"}
         
@@ -235,13 +318,13 @@ async def get_outlet_categories(
     
     # Check if we want all categories (unpaginated for reorder view)
     if limit == -1:
-        cursor = categories_collection.find(query, {"_id": 0}).sort([("order", 1), ("createdAt", -1)])
+        cursor = categories_collection.find(query, {"_id": 0}).sort(RANK_SORT)
     else:
-        cursor = categories_collection.find(query, {"_id": 0}).sort([("order", 1), ("createdAt", -1)]).skip(skip).limit(limit)
+        cursor = categories_collection.find(query, {"_id": 0}).sort(RANK_SORT).skip(skip).limit(limit)
         
     categories = []
     async for cat in cursor:
-        dish_count = await dishes_collection.count_documents({"categoryId": cat["categoryId"], "isDeleted": {"$ne": True}})
+        dish_count = await dishes_collection.count_documents({"categoryId": cat["categoryId"], "isDeleted": False})
         cat["dishCount"] = dish_count
         categories.append(cat)
         
@@ -265,11 +348,14 @@ async def create_outlet_category(outlet_uid: str, name: str, isPublished: bool =
         "requestId": "manual",
         "name": name,
         "isPublished": isPublished,
+        "rank": (await next_ranks("categories", outlet_uid))[0],
+        "isDeleted": False,
         "createdAt": datetime.utcnow(),
         "updatedAt": datetime.utcnow()
     }
     
     await categories_collection.insert_one(new_cat)
+    await menu_changed(outlet_uid)
     return {"categoryId": category_id, "name": name, "isPublished": isPublished}
 
 
@@ -282,12 +368,8 @@ async def get_outlet_dishes(
     limit: int = Query(10, ge=-1)
 ):
     from app.database import dishes_collection
-    import logging
-    logger = logging.getLogger("uvicorn")
-    
-    logger.info(f"FETCH DISHES: outlet={outlet_uid}, cat={categoryId}, page={page}, limit={limit}")
-    
-    query = {"storeUid": outlet_uid, "isDeleted": {"$ne": True}}
+    dishes_collection = dishes_collection.reads("public")
+    query = {"storeUid": outlet_uid, "isDeleted": False}
     if categoryId:
         query["categoryId"] = categoryId
     if search:
@@ -295,17 +377,17 @@ async def get_outlet_dishes(
         
     total = await dishes_collection.count_documents(query)
     skip = (int(page) - 1) * int(limit)
-    
-    logger.info(f"QUERY EXEC: total={total}, skip={skip}, limit={limit}")
-    
+
     if limit == -1:
-        cursor = dishes_collection.find(query, {"_id": 0}).sort([("order", 1), ("createdAt", -1)])
+        cursor = dishes_collection.find(query, {"_id": 0}).sort(RANK_SORT)
         dishes = await cursor.to_list(length=None)
     else:
-        cursor = dishes_collection.find(query, {"_id": 0}).sort([("order", 1), ("createdAt", -1)]).skip(skip).limit(limit)
+        cursor = dishes_collection.find(query, {"_id": 0}).sort(RANK_SORT).skip(skip).limit(limit)
         dishes = await cursor.to_list(length=limit)
-    
-    logger.info(f"RESULTS: count={len(dishes)}")
+    for dish in dishes:
+        with_variants(dish)
+
+    hot_logger.info(f"Outlet dishes: outlet={outlet_uid}, cat={categoryId}, page={page}, limit={limit}, total={total}, count={len(dishes)}")
     
     return {
         "dishes": dishes,
@@ -317,18 +399,25 @@ async def get_outlet_dishes(
 
 
 @router.post("/outlets/{outlet_uid}/scan")
-async def record_scan(outlet_uid: str):
+async def record_scan(outlet_uid: str, request: Request, visitorId: Optional[str] = Body(None, embed=True)):
+    # Increment persistent scan counter on outlet profile; it doubles as the
+    # existence check, so made-up UIDs never get a scan or a visitor sketch
+    counted = await outlet_profiles_collection.update_one(
+        {"storeUid": outlet_uid, "isDeleted": False},
+        {"$inc": {"qrScanCount": 1}}
+    )
+    if not counted.matched_count:
+        raise HTTPException(status_code=404, detail="Outlet not found")
+
+    forwarded = request.headers.get("x-forwarded-for")
+    client_ip = forwarded.split(",")[0].strip() if forwarded else (request.client.host if request.client else None)
+    visitors.record_visit(outlet_uid, visitors.fingerprint_hash(visitorId, client_ip, request.headers.get("user-agent")))
+
     await scans_collection.insert_one({
         "outletUid": outlet_uid,
         "timestamp": datetime.utcnow()
     })
     
-    # Increment persistent scan counter on outlet profile
-    await outlet_profiles_collection.update_one(
-        {"storeUid": outlet_uid},
-        {"$inc": {"qrScanCount": 1}}
-    )
-    
     return {"status": "recorded"}
 
 
@@ -352,9 +441,11 @@ async def get_outlet_analytics(outlet_uid: str):
         {"$sort": {"_id": 1}}
     ]
     
-    cursor = scans_collection.aggregate(pipeline)
+    cursor = scans_collection.reads("analytics").aggregate(pipeline)
     results = await cursor.to_list(length=100)
     
+    uniques = (await visitors.unique_visitors(outlet_uid, days=8, now=end_date))["daily"]
+
     # Fill in zeros for days with no scans
     analytics_data = []
     day_map = {r["_id"]: r["count"] for r in results}
@@ -363,15 +454,25 @@ async def get_outlet_analytics(outlet_uid: str):
         current_day = (start_date + timedelta(days=i)).strftime("%Y-%m-%d")
         analytics_data.append({
             "date": current_day,
-            "count": day_map.get(current_day, 0)
+            "count": day_map.get(current_day, 0),
+            "uniqueVisitors": uniques.get(current_day, 0)
         })
         
     return analytics_data
 
 
+@router.get("/outlets/{outlet_uid}/analytics/visitors")
+async def get_outlet_visitors(outlet_uid: str, days: int = Query(8, ge=1, le=90)):
+    """Estimated unique visitors per day and de-duplicated over the last 7 and 30 days (within a few percent)."""
+    return await visitors.unique_visitors(outlet_uid, days=days)
+
+
 @router.get("/businesses/{business_id}/stats")
 async def get_business_stats(business_id: str):
     from app.database import outlet_profiles_collection, categories_collection, dishes_collection
+    outlet_profiles_collection = outlet_profiles_collection.reads("analytics")
+    categories_collection = categories_collection.reads("analytics")
+    dishes_collection = dishes_collection.reads("analytics")
     
     # Check business exists
     business = await businesses_collection.find_one({"businessId": business_id})
@@ -381,29 +482,29 @@ async def get_business_stats(business_id: str):
     # 1. Total Outlets (Active only)
     total_outlets = await outlet_profiles_collection.count_documents({
         "contactId": business_id, 
-        "isDeleted": {"$ne": True},
+        "isDeleted": False,
         "isActive": True
     })
     
     # 2. Get all outlet UIDs for this business to filter categories/dishes
     outlet_cursor = outlet_profiles_collection.find({
         "contactId": business_id, 
-        "isDeleted": {"$ne": True},
+        "isDeleted": False,
         "isActive": True
     }, {"storeUid": 1})
     outlet_uids = [o["storeUid"] async for o in outlet_cursor]
     
     # 3. Total Categories
-    total_categories = await categories_collection.count_documents({"storeUid": {"$in": outlet_uids}, "isDeleted": {"$ne": True}})
+    total_categories = await categories_collection.count_documents({"storeUid": {"$in": outlet_uids}, "isDeleted": False})
     
     # 4. Total Dishes
-    total_dishes = await dishes_collection.count_documents({"storeUid": {"$in": outlet_uids}, "isDeleted": {"$ne": True}})
+    total_dishes = await dishes_collection.count_documents({"storeUid": {"$in": outlet_uids}, "isDeleted": False})
     
     # 5. Total Scans (Sum of qrScanCount)
     total_scans = 0
     scans_cursor = outlet_profiles_collection.find({
         "contactId": business_id, 
-        "isDeleted": {"$ne": True},
+        "isDeleted": False,
         "isActive": True
     }, {"qrScanCount": 1})
     async for outlet in scans_cursor:
@@ -416,26 +517,54 @@ async def get_business_stats(business_id: str):
         "totalScans": total_scans
     }
 
+async def _apply_moves(kind: str, outlet_uid: str, moves: List[MoveItem]):
+    for item in moves:
+        try:
+            key = await move(kind, outlet_uid, item.id, item.prevId, item.nextId)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        if key is None:
+            raise HTTPException(status_code=404, detail=f"{item.id} not found")
+    await menu_changed(outlet_uid)
+    return {"status": "success"}
+
+@router.put("/outlets/{outlet_uid}/categories/moves")
+async def move_categories(outlet_uid: str, moves: List[MoveItem]):
+    """Applies drag-and-drop moves in order; each move rewrites only the moved category."""
+    return await _apply_moves("categories", outlet_uid, moves)
+
+@router.put("/outlets/{outlet_uid}/dishes/moves")
+async def move_dishes(outlet_uid: str, moves: List[MoveItem]):
+    """Applies drag-and-drop moves in order; each move rewrites only the moved dish."""
+    return await _apply_moves("dishes", outlet_uid, moves)
+
+def _reorder_writes(items: List[ReorderItem], id_field: str, outlet_uid: str):
+    # Legacy full-list reorder: respace the listed items in their given order
+    from pymongo import UpdateOne
+
+    ordered = sorted(items, key=lambda item: item.order)
+    keys = ranks_between(None, None, len(ordered))
+    return [
+        UpdateOne({id_field: item.id, "storeUid": outlet_uid}, {"$set": {"order": item.order, "rank": key}})
+        for item, key in zip(ordered, keys)
+    ]
+
 @router.put("/outlets/{outlet_uid}/categories/reorder")
 async def reorder_categories(outlet_uid: str, items: List[ReorderItem]):
     from app.database import categories_collection
-    from pymongo import UpdateOne
     
-    requests = []
-    for item in items:
-        requests.append(UpdateOne({"categoryId": item.id, "storeUid": outlet_uid}, {"$set": {"order": item.order}}))
+    requests = _reorder_writes(items, "categoryId", outlet_uid)
     if requests:
         await categories_collection.bulk_write(requests)
+    await menu_changed(outlet_uid)
     return {"status": "success"}
 
 @router.put("/outlets/{outlet_uid}/dishes/reorder")
 async def reorder_dishes(outlet_uid: str, items: List[ReorderItem]):
     from app.database import dishes_collection
-    from pymongo import UpdateOne
     
-    requests = []
-    for item in items:
-        requests.append(UpdateOne({"dishId": item.id, "storeUid": outlet_uid}, {"$set": {"order": item.order}}))
+    requests = _reorder_writes(items, "dishId", outlet_uid)
     if requests:
         await dishes_collection.bulk_write(requests)
+    await menu_changed(outlet_uid)
     return {"status": "success"}
@@ -1,10 +1,19 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
 from typing import List
-from app.database import requests_collection, dishes_collection, outlet_profiles_collection, categories_collection, admin_config_collection, business_config_collection
-from app.models import RequestDB, DishDB, CategoryDB, AdminConfigDB
-from app.services.gemini_service import extract_menu_data
-from app.services.cloudinary_service import upload_image
+from app.database import requests_collection, dishes_collection, outlet_profiles_collection, categories_collection
+from app.models import RequestDB, DishDB, CategoryDB
+from app.services.config_service import get_business_config
+from app.services.gemini_service import extract_menu_pages
+from app.services.asset_storage import delete_with_images, release, release_many, store_image
+from app.services.image_preprocess import preprocess_menu_image
+from app.services.menu_normalizer import normalize_extraction, normalize_name
+from app.services.outbound import ProviderUnavailable
+from app.services import quota
+from app.services.image_prompts import enrich_request, enrich_request_quietly
+from app.services.menu_service import menu_changed
+from app.services.ranking import next_ranks
 from app.logger import get_logger
+import asyncio
 import uuid
 
 logger = get_logger(__name__)
@@ -22,12 +31,7 @@ async def create_request(store_uid: str):
 
     # Fetch configuration
     business_id = store.get("contactId")
-    config_dict = await business_config_collection.find_one({"businessId": business_id})
-    if not config_dict:
-        config_dict = await admin_config_collection.find_one({})
-        if not config_dict:
-            config_dict = AdminConfigDB().dict()
-    config = AdminConfigDB(**config_dict)
+    config = await get_business_config(business_id)
     
     # Check concurrent process limit for this store
     active_requests_count = await requests_collection.count_documents({
@@ -64,12 +68,7 @@ async def upload_menu_images(request_id: str, images: List[UploadFile] = File(..
     # Fetch configuration
     store = await outlet_profiles_collection.find_one({"storeUid": req["storeUid"]})
     business_id = store.get("contactId")
-    config_dict = await business_config_collection.find_one({"businessId": business_id})
-    if not config_dict:
-        config_dict = await admin_config_collection.find_one({})
-        if not config_dict:
-            config_dict = AdminConfigDB().dict()
-    config = AdminConfigDB(**config_dict)
+    config = await get_business_config(business_id)
     
     if len(images) > config.maxImagesPerUpload:
         raise HTTPException(
@@ -77,85 +76,102 @@ async def upload_menu_images(request_id: str, images: List[UploadFile] = File(..
             detail=f"Maximum {config.maxImagesPerUpload} images allowed per upload."
         )
 
-    extracted_dishes = []
-    
-    for idx, img in enumerate(images):
-        logger.info(f"Processing image {idx+1}/{len(images)}: {img.filename}")
-        img_bytes = await img.read()
-        
-        # Upload to Cloudinary
-        folder_path = f"requests/{request_id}/menu_images"
-        public_id = f"img_{uuid.uuid4().hex[:8]}"
-        cloudinary_url = upload_image(img_bytes, folder=folder_path, public_id=public_id)
+    # One extraction credit per page, taken before any upload work; pages that
+    # come back empty are refunded
+    try:
+        reservation = await quota.reserve(business_id, quota.MENU_EXTRACTION, len(images), config)
+    except quota.QuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=e.message)
 
-        # Call Gemini
-        data = await extract_menu_data(img_bytes)
-        
-        if data and "categories" in data:
-            for cat in data["categories"]:
-                cat_name = cat.get("name", "General")
-                cat_id = f"cat_{uuid.uuid4().hex[:8]}"
-                
-                # Create Category
-                new_cat = CategoryDB(
-                    categoryId=cat_id,
-                    storeUid=req["storeUid"],
-                    requestId=request_id,
-                    name=cat_name
-                )
-                await categories_collection.insert_one(new_cat.dict())
-
-                # Create Dishes in this Category
-                for item in cat.get("items", []):
-                    parent_dish_id = f"dish_{uuid.uuid4().hex[:8]}"
-                    
-                    # Sanitize price helper
-                    def sanitize_price(p):
-                        if isinstance(p, str):
-                            try:
-                                return float(p.replace("$", "").replace(",", "")) 
-                            except:
-                                return 0.0
-                        return float(p) if p is not None else 0.0
-
-                    base_price = sanitize_price(item.get("price"))
-                    
-                    # Prepare Variants & Addons
-                    extracted_variants = []
-                    for var in item.get("variants", []):
-                        extracted_variants.append({
-                            "variantType": var.get("variantType"),
-                            "label": var.get("label", "Variant"),
-                            "price": sanitize_price(var.get("price"))
-                        })
-
-                    extracted_addons = []
-                    for ad in item.get("addons", []):
-                        extracted_addons.append({
-                            "name": ad.get("name", "Extra"),
-                            "price": sanitize_price(ad.get("price"))
-                        })
-
-                    # Create Parent Dish
-                    new_dish = DishDB(
-                        dishId=parent_dish_id,
-                        requestId=request_id,
-                        storeUid=req["storeUid"],
-                        categoryId=cat_id,
-                        name=item.get("name", "Unknown Dish"),
-                        price=base_price,
-                        weight=item.get("weight"),
-                        description=item.get("description"),
-                        imageUrl=None, 
-                        imageStatus="pending",
-                        imageIndex=idx,
-                        variants=extracted_variants,
-                        addons=extracted_addons
-                    )
-                    extracted_dishes.append(new_dish.dict())
+    pages = []
+    try:
+        for idx, img in enumerate(images):
+            logger.info(f"Processing image {idx+1}/{len(images)}: {img.filename}")
+            img_bytes = await img.read()
+
+            # Orient, downscale and recompress before upload/extraction
+            prepared = await preprocess_menu_image(img_bytes)
+
+            # Store the page (re-uploads of the same photo are deduplicated)
+            image_url = await store_image(prepared.data)
+            added = await requests_collection.update_one(
+                {"requestId": request_id, "menuImageUrls": {"$ne": image_url}},
+                {"$push": {"menuImageUrls": image_url}}
+            )
+            if not added.modified_count:
+                # Page already on the request: it holds a single reference
+                await release(image_url)
+            pages.append(prepared.parts)
+    except Exception:
+        await reservation.refund()
+        raise
+
+    # Call Gemini: pages are packed into as few calls as the batch budget allows
+    try:
+        results = await extract_menu_pages(pages)
+    except ProviderUnavailable as e:
+        await reservation.refund()
+        raise HTTPException(status_code=503, detail=f"Menu extraction is temporarily unavailable ({e.reason}), please retry shortly")
+    except Exception:
+        await reservation.refund()
+        raise
+    await reservation.refund(sum(1 for result in results if result is None))
+
+    # Merge categories/dishes repeated across pages, parse prices
+    normalized = normalize_extraction(results)
+    store_uid = req["storeUid"]
+
+    # Categories already created for this request by an earlier upload are reused
+    existing = {
+        normalize_name(cat["name"]): cat["categoryId"]
+        async for cat in categories_collection.find(
+            {"requestId": request_id, "isDeleted": False}, {"name": 1, "categoryId": 1}
+        )
+    }
+    new_categories = [cat for cat in normalized["categories"] if cat["key"] not in existing]
+    category_ranks = await next_ranks("categories", store_uid, len(new_categories)) if new_categories else []
+    category_docs = []
+    for cat, rank in zip(new_categories, category_ranks):
+        existing[cat["key"]] = f"cat_{uuid.uuid4().hex[:8]}"
+        category_docs.append(CategoryDB(
+            categoryId=existing[cat["key"]],
+            storeUid=store_uid,
+            requestId=request_id,
+            name=cat["name"],
+            rank=rank
+        ).dict())
 
+    extracted_dishes = [
+        DishDB(
+            dishId=f"dish_{uuid.uuid4().hex[:8]}",
+            requestId=request_id,
+            storeUid=store_uid,
+            categoryId=existing[cat["key"]],
+            imageUrl=None,
+            imageStatus="pending",
+            **dish
+        ).dict()
+        for cat in normalized["categories"]
+        for dish in cat["dishes"]
+    ]
+    if extracted_dishes:
+        ranks = await next_ranks("dishes", store_uid, len(extracted_dishes))
+        for dish, rank in zip(extracted_dishes, ranks):
+            dish["rank"] = rank
+
+    if category_docs:
+        await categories_collection.insert_many(category_docs)
     if extracted_dishes:
         await dishes_collection.insert_many(extracted_dishes)
+    logger.info(
+        f"Extracted {len(extracted_dishes)} dishes in {len(normalized['categories'])} categories for {request_id}"
+        f" ({normalized['mergedCategories']} category and {normalized['mergedDishes']} dish duplicates merged)"
+    )
+
+    # Visual prompts for all new dishes in one Gemini call, ready before the
+    # user reaches image generation (which falls back to waiting for it)
+    if extracted_dishes:
+        asyncio.create_task(enrich_request_quietly(request_id, store_uid))
 
     # Update Request Step
     await requests_collection.update_one(
@@ -165,6 +181,18 @@ async def upload_menu_images(request_id: str, images: List[UploadFile] = File(..
 
     return {"currentStep": 3, "totalDishes": len(extracted_dishes)}
 
+@router.post("/requests/{request_id}/image-prompts", response_model=dict)
+async def enrich_image_prompts(request_id: str):
+    """Writes visual image prompts for the request's dishes that have none (one Gemini call)."""
+    req = await requests_collection.find_one({"requestId": request_id}, {"storeUid": 1})
+    if not req:
+        raise HTTPException(status_code=404, detail="Request not found")
+    try:
+        enriched = await enrich_request(request_id, req["storeUid"])
+    except ProviderUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Prompt enrichment is temporarily unavailable ({e.reason}), please retry shortly")
+    return {"enriched": enriched}
+
 @router.get("/outlets/{store_uid}/requests/active", response_model=dict)
 async def get_active_request(store_uid: str):
     req = await requests_collection.find_one(
@@ -190,7 +218,7 @@ async def publish_request(request_id: str):
     
     # 1. Archive/Delete old published ones (For safety let's just delete them entirely for this store)
     await categories_collection.delete_many({"storeUid": store_uid, "isPublished": True, "requestId": {"$ne": request_id}})
-    await dishes_collection.delete_many({"storeUid": store_uid, "isPublished": True, "requestId": {"$ne": request_id}})
+    await delete_with_images(dishes_collection, {"storeUid": store_uid, "isPublished": True, "requestId": {"$ne": request_id}})
     
     # 2. Publish new ones
     await categories_collection.update_many(
@@ -207,6 +235,8 @@ async def publish_request(request_id: str):
         {"requestId": request_id},
         {"$set": {"status": "completed", "currentStep": 4}}
     )
+
+    await menu_changed(store_uid)
     
     return {"status": "success", "message": "Menu successfully generated and published"}
 
@@ -219,14 +249,17 @@ async def delete_request(request_id: str):
     if not req:
         raise HTTPException(status_code=404, detail="Request not found")
     
-    # 2. Mark request as cancelled (Soft Delete)
-    await requests_collection.update_one(
+    # 2. Mark request as cancelled (Soft Delete), dropping its menu page images
+    before = await requests_collection.find_one_and_update(
         {"requestId": request_id},
-        {"$set": {"status": "cancelled", "currentStep": 0}}
+        {"$set": {"status": "cancelled", "currentStep": 0}, "$unset": {"menuImageUrls": ""}},
+        projection={"menuImageUrls": 1}
     )
+    await release_many((before or {}).get("menuImageUrls") or [])
     
     # 3. Hard delete associated dishes/categories (to keep UI clean)
-    await dishes_collection.delete_many({"requestId": request_id})
+    await delete_with_images(dishes_collection, {"requestId": request_id})
     await categories_collection.delete_many({"requestId": request_id})
+    await menu_changed(req["storeUid"])
     
     return {"status": "success", "message": f"Process {request_id} cancelled and cleaned up"}
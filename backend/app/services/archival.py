@@ -0,0 +1,106 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReplaceOne
+
+from app import metrics
+from app.config import get_settings
+from app.database import get_db
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# kind → (hot collection, archive collection, id field)
+ARCHIVES = {
+    "dishes": ("dishes", "dishes_archive", "dishId"),
+    "categories": ("categories", "categories_archive", "categoryId"),
+    "outlets": ("outlet_profiles", "outlet_profiles_archive", "storeUid"),
+}
+
+
+async def archive_expired(kind: str) -> int:
+    """
+    Moves documents soft-deleted longer than ARCHIVE_RETENTION_DAYS into the
+    archive collection, one throttled batch at a time. Returns documents moved.
+    """
+    settings = get_settings()
+    hot_name, archive_name, _ = ARCHIVES[kind]
+    db = get_db()
+    hot, archive = db[hot_name], db[archive_name]
+    now = datetime.utcnow()
+
+    # Soft deletes from before deletedAt existed start their retention window now
+    await hot.update_many({"isDeleted": True, "deletedAt": None}, {"$set": {"deletedAt": now}})
+
+    cutoff = now - timedelta(days=settings.archive_retention_days)
+    moved = 0
+    while True:
+        batch = await hot.find(
+            {"isDeleted": True, "deletedAt": {"$lt": cutoff}}
+        ).sort("deletedAt", 1).limit(settings.archive_batch_size).to_list(length=settings.archive_batch_size)
+        if not batch:
+            break
+
+        # Upsert by _id so a batch interrupted between copy and delete is safe to redo
+        await archive.bulk_write(
+            [ReplaceOne({"_id": doc["_id"]}, {**doc, "archivedAt": now}, upsert=True) for doc in batch],
+            ordered=False
+        )
+        await hot.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}, "isDeleted": True})
+        moved += len(batch)
+        metrics.inc("archived_documents", len(batch), kind=kind)
+
+        # Throttle so archival never competes with live traffic for the primary
+        await asyncio.sleep(settings.archive_batch_pause_ms / 1000)
+
+    if moved:
+        logger.info(f"Archived {moved} soft-deleted {kind}")
+    return moved
+
+
+async def run_archival_job():
+    for kind in ARCHIVES:
+        await archive_expired(kind)
+
+
+async def restore(kind: str, item_id: str) -> Optional[dict]:
+    """
+    Brings a soft-deleted or archived document back to life. Restoring a
+    category also restores the dishes that were deleted along with it.
+    Returns the restored document, or None if nothing matched.
+    """
+    hot_name, archive_name, id_field = ARCHIVES[kind]
+    db = get_db()
+    hot, archive = db[hot_name], db[archive_name]
+
+    archived = await archive.find_one({id_field: item_id})
+    if archived:
+        archived.pop("archivedAt", None)
+        await hot.replace_one({"_id": archived["_id"]}, archived, upsert=True)
+        await archive.delete_one({"_id": archived["_id"]})
+
+    doc = await hot.find_one({id_field: item_id})
+    if not doc:
+        return None
+    deleted_at = doc.get("deletedAt")
+    await hot.update_one(
+        {"_id": doc["_id"]},
+        {"$set": {"isDeleted": False, "deletedAt": None, "updatedAt": datetime.utcnow()}}
+    )
+
+    if kind == "categories" and deleted_at:
+        cascade = {"categoryId": item_id, "deletedAt": deleted_at}
+        dishes_hot, dishes_archive = db["dishes"], db["dishes_archive"]
+        async for dish in dishes_archive.find(cascade):
+            dish.pop("archivedAt", None)
+            await dishes_hot.replace_one({"_id": dish["_id"]}, dish, upsert=True)
+            await dishes_archive.delete_one({"_id": dish["_id"]})
+        await dishes_hot.update_many(
+            {**cascade, "isDeleted": True},
+            {"$set": {"isDeleted": False, "deletedAt": None}}
+        )
+
+    doc.pop("_id", None)
+    doc.update(isDeleted=False, deletedAt=None)
+    return doc
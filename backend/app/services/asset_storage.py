@@ -0,0 +1,272 @@
+import asyncio
+import base64
+import hashlib
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Iterable, Optional, Union
+
+from pymongo import UpdateOne
+
+from app import metrics
+from app.config import get_settings
+from app.database import assets_collection
+from app.logger import get_logger
+from app.services.image_preprocess import resize_variants, sniff_mime_type
+from app.services.image_variants import VARIANT_WIDTHS, local_variant_key
+
+logger = get_logger(__name__)
+
+# Every stored image lives at a key derived from its SHA-256, so identical bytes
+# (a re-saved logo, the same photo uploaded twice) are stored once. The assets
+# collection maps hash → URL and counts the documents referencing it:
+#   {_id: sha256, url, key, backend, size, mimeType, refCount, createdAt, lastReleasedAt, deletingAt}
+ASSET_PREFIX = "assets"
+
+# cleanup_orphans() marks an asset (deletingAt) before removing its file; a
+# store_image() of the same bytes waits for the removal, then uploads again
+DELETE_WAIT_SECONDS = 0.5
+DELETE_WAIT_ATTEMPTS = 60
+# A mark older than this was left by a crashed cleanup and is taken over
+DELETE_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+class LocalAssetStorage:
+    """Writes images under a directory served as static files (on-prem and tests)."""
+
+    name = "local"
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def _write(self, key: str, data: bytes):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _delete(self, key: str):
+        for path in [key] + [local_variant_key(key, name) for name in VARIANT_WIDTHS]:
+            try:
+                os.remove(self._path(path))
+            except FileNotFoundError:
+                pass
+
+    async def put(self, key: str, data: bytes, mime_type: str) -> str:
+        await asyncio.to_thread(self._write, key, data)
+        return f"{self.base_url}/{key}"
+
+    async def put_variants(self, key: str, data: bytes):
+        """Pre-renders the display sizes image_variants() points at."""
+        try:
+            variants = await resize_variants(data, VARIANT_WIDTHS)
+        except Exception as e:
+            logger.error(f"Could not render variants for {key}: {e}")
+            return
+        for name, content in variants.items():
+            await asyncio.to_thread(self._write, local_variant_key(key, name), content)
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._delete, key)
+
+
+class CloudinaryAssetStorage:
+    """Uploads images to Cloudinary under their content key."""
+
+    name = "cloudinary"
+
+    async def put(self, key: str, data: bytes, mime_type: str) -> str:
+        from app.services import outbound
+        from app.services.cloudinary_service import get_uploader
+
+        response = await outbound.call(
+            "cloudinary",
+            get_uploader().upload,
+            data,
+            public_id=key,
+            resource_type="image",
+            overwrite=False,  # same key ⇒ same bytes
+            timeout=get_settings().cloudinary_timeout_seconds,
+        )
+        return response.get("secure_url")
+
+    async def put_variants(self, key: str, data: bytes):
+        pass  # derived on request via transformation URLs
+
+    async def delete(self, key: str):
+        from app.services import outbound
+        from app.services.cloudinary_service import get_uploader
+
+        await outbound.call("cloudinary", get_uploader().destroy, key, resource_type="image", invalidate=True)
+
+
+@lru_cache(maxsize=None)
+def get_asset_storage():
+    settings = get_settings()
+    if settings.image_storage_backend == "local":
+        return LocalAssetStorage(settings.image_storage_dir, settings.image_storage_base_url)
+    return CloudinaryAssetStorage()
+
+
+def _to_bytes(data: Union[bytes, str]) -> bytes:
+    """Accepts raw bytes or a base64 data URL (business logos arrive that way)."""
+    if isinstance(data, str):
+        payload = data.split(",", 1)[1] if data.startswith("data:") else data
+        return base64.b64decode(payload)
+    return data
+
+
+async def store_image(data: Union[bytes, str]) -> str:
+    """
+    Stores an image once per distinct content and takes a reference on it.
+    Returns its URL; pair every call with release() when the reference goes away.
+    """
+    data = _to_bytes(data)
+    digest = hashlib.sha256(data).hexdigest()
+
+    for _ in range(DELETE_WAIT_ATTEMPTS):
+        existing = await assets_collection.find_one_and_update(
+            {"_id": digest, "deletingAt": None},
+            {"$inc": {"refCount": 1}},
+            projection={"url": 1}
+        )
+        if existing:
+            metrics.inc("asset_dedup_hits")
+            metrics.inc("asset_dedup_bytes_saved", len(data))
+            return existing["url"]
+        if not await assets_collection.find_one({"_id": digest}, {"_id": 1}):
+            break
+        # The cleanup job is removing this very file: upload it again once it's gone
+        await asyncio.sleep(DELETE_WAIT_SECONDS)
+    else:
+        raise Exception(f"Asset {digest} is still being deleted")
+
+    storage = get_asset_storage()
+    mime_type = sniff_mime_type(data)
+    key = f"{ASSET_PREFIX}/{digest[:2]}/{digest}"
+    url = await storage.put(key, data, mime_type)
+    await storage.put_variants(key, data)
+    now = datetime.utcnow()
+    # Two concurrent first uploads of the same bytes both land here; the upsert
+    # keeps one document and counts both references
+    await assets_collection.update_one(
+        {"_id": digest},
+        {
+            "$setOnInsert": {
+                "url": url, "key": key, "backend": storage.name, "size": len(data),
+                "mimeType": mime_type, "createdAt": now,
+            },
+            "$inc": {"refCount": 1},
+        },
+        upsert=True
+    )
+    metrics.inc("asset_uploads")
+    return url
+
+
+async def retain(urls: Iterable[Optional[str]]):
+    """Takes one more reference per occurrence (e.g. dishes cloned with their images)."""
+    counts = Counter(url for url in urls if url)
+    if counts:
+        await assets_collection.bulk_write(
+            [UpdateOne({"url": url}, {"$inc": {"refCount": n}}) for url, n in counts.items()],
+            ordered=False
+        )
+
+
+async def release_many(urls: Iterable[Optional[str]]):
+    """Drops one reference per occurrence, in one bulk write (documents being deleted)."""
+    counts = Counter(url for url in urls if url)
+    if not counts:
+        return
+    now = datetime.utcnow()
+    await assets_collection.bulk_write(
+        [
+            UpdateOne(
+                {"url": url, "refCount": {"$gt": 0}},
+                [{"$set": {"refCount": {"$max": [0, {"$subtract": ["$refCount", n]}]}, "lastReleasedAt": now}}]
+            )
+            for url, n in counts.items()
+        ],
+        ordered=False
+    )
+
+
+async def delete_with_images(collection, query: dict) -> int:
+    """delete_many() that releases the images (and draft previews) of every document it removes."""
+    docs = await collection.find(query, {"imageUrl": 1, "draftImageUrl": 1}).to_list(length=None)
+    if not docs:
+        return 0
+    result = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+    await release_many(url for doc in docs for url in (doc.get("imageUrl"), doc.get("draftImageUrl")))
+    return result.deleted_count
+
+
+async def release(url: Optional[str]):
+    """
+    Drops one reference. Unreferenced assets are deleted by the cleanup job after
+    a grace period. URLs stored before assets were tracked are ignored.
+    """
+    if not url:
+        return
+    await assets_collection.update_one(
+        {"url": url, "refCount": {"$gt": 0}},
+        {"$inc": {"refCount": -1}, "$set": {"lastReleasedAt": datetime.utcnow()}}
+    )
+
+
+async def replace_image(old_url: Optional[str], data: Union[bytes, str]) -> str:
+    """
+    Stores the new image, then releases the one it replaces (re-saving the same
+    content nets out to a single reference).
+    """
+    url = await store_image(data)
+    await release(old_url)
+    return url
+
+
+async def cleanup_orphans() -> int:
+    """
+    Deletes assets that have had no references for ASSET_ORPHAN_GRACE_HOURS.
+    Returns the number removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=get_settings().asset_orphan_grace_hours)
+    storage = get_asset_storage()
+    removed = 0
+    async for asset in assets_collection.find(
+        {"refCount": {"$lte": 0}, "lastReleasedAt": {"$lt": cutoff}, "backend": storage.name}
+    ):
+        # Mark it first: from here on store_image() won't re-reference it, so the
+        # file can go before the document does
+        now = datetime.utcnow()
+        claimed = await assets_collection.update_one(
+            {
+                "_id": asset["_id"],
+                "refCount": {"$lte": 0},
+                "$or": [{"deletingAt": None}, {"deletingAt": {"$lt": now - DELETE_CLAIM_TIMEOUT}}],
+            },
+            {"$set": {"deletingAt": now}}
+        )
+        if not claimed.modified_count:
+            continue
+        try:
+            await storage.delete(asset["key"])
+        except Exception as e:
+            logger.error(f"Failed to delete orphaned asset {asset['key']}: {e}")
+            await assets_collection.update_one({"_id": asset["_id"]}, {"$unset": {"deletingAt": ""}})
+            continue
+        await assets_collection.delete_one({"_id": asset["_id"], "deletingAt": now})
+        removed += 1
+    if removed:
+        metrics.inc("asset_orphans_deleted", removed)
+        logger.info(f"Deleted {removed} orphaned assets")
+    return removed
@@ -1,29 +1,23 @@
-import cloudinary
-import cloudinary.uploader
-import os
-from dotenv import load_dotenv
+from functools import lru_cache
+from app.config import get_settings
 
-load_dotenv()
 
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-)
-
-def upload_image(file_content, folder: str, public_id: str):
+@lru_cache(maxsize=None)
+def get_uploader():
     """
-    Uploads an image to Cloudinary.
+    Configures Cloudinary on first use and returns its uploader module.
     """
-    try:
-        response = cloudinary.uploader.upload(
-            file_content,
-            folder=folder,
-            public_id=public_id,
-            resource_type="image",
-            overwrite=True
-        )
-        return response.get("secure_url")
-    except Exception as e:
-        print(f"Cloudinary Upload Error: {e}")
-        raise e
+    from app.services import simulators
+    if simulators.enabled("cloudinary"):
+        return simulators.SimulatedUploader()
+
+    import cloudinary
+    import cloudinary.uploader
+
+    settings = get_settings()
+    cloudinary.config(
+        cloud_name=settings.cloudinary_cloud_name,
+        api_key=settings.cloudinary_api_key,
+        api_secret=settings.cloudinary_api_secret,
+    )
+    return cloudinary.uploader
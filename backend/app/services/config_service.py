@@ -0,0 +1,140 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.config import get_settings
+from app.database import admin_config_collection, business_config_collection
+from app.logger import get_logger
+from app.models import AdminConfigDB
+
+logger = get_logger(__name__)
+
+# Effective config = model defaults ← global admin_config ← business overrides.
+# business_configuration documents hold only the fields a business explicitly
+# overrides ({businessId, <field>: value, ...}), so a global change is one write.
+DEFAULTS = AdminConfigDB().dict()
+FIELDS = list(DEFAULTS)
+
+# Documents written as overrides carry `sparse: true`. Before that, first login
+# copied the whole admin config; such legacy copies hold at least these fields
+LEGACY_COPY_FIELDS = [
+    "maxOtpResends", "otpBlockDurationMinutes", "otpResendWaitSeconds", "imageGenerationLimit",
+    "imageGenerationLimitPerDish", "maxImagesPerUpload", "processCreationLimit",
+]
+
+# Per-worker cache of the global document and of effective business configs;
+# writes invalidate it locally, other workers catch up within CONFIG_CACHE_SECONDS
+_global_cache: Optional[Tuple[float, dict]] = None
+_business_cache: Dict[str, Tuple[float, AdminConfigDB]] = {}
+
+
+def invalidate(business_id: Optional[str] = None):
+    """Drops one business's cached config, or everything when no ID is given."""
+    global _global_cache
+    if business_id is None:
+        _global_cache = None
+        _business_cache.clear()
+    else:
+        _business_cache.pop(business_id, None)
+
+
+def _fields(doc: Optional[dict]) -> dict:
+    return {field: doc[field] for field in FIELDS if doc and doc.get(field) is not None}
+
+
+async def _global_fields() -> dict:
+    global _global_cache
+    now = time.monotonic()
+    if _global_cache is None or _global_cache[0] <= now:
+        doc = await admin_config_collection.find_one({}, {"_id": 0})
+        _global_cache = (now + get_settings().config_cache_seconds, _fields(doc))
+    return _global_cache[1]
+
+
+async def get_global_config() -> AdminConfigDB:
+    return AdminConfigDB(**{**DEFAULTS, **await _global_fields()})
+
+
+async def get_business_overrides(business_id: str) -> dict:
+    doc = await business_config_collection.find_one({"businessId": business_id}, {"_id": 0})
+    return _fields(doc)
+
+
+async def get_business_config(business_id: Optional[str]) -> AdminConfigDB:
+    """Effective configuration of a business (the global config when there is none)."""
+    if not business_id:
+        return await get_global_config()
+    now = time.monotonic()
+    cached = _business_cache.get(business_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    config = AdminConfigDB(**{
+        **DEFAULTS,
+        **await _global_fields(),
+        **await get_business_overrides(business_id),
+    })
+    _business_cache[business_id] = (now + get_settings().config_cache_seconds, config)
+    return config
+
+
+async def list_business_configs(limit: int = 1000) -> List[dict]:
+    """Effective config of every business that has overrides."""
+    global_config = (await get_global_config()).dict()
+    return [
+        {**global_config, **_fields(doc), "businessId": doc["businessId"]}
+        async for doc in business_config_collection.find({}, {"_id": 0}).limit(limit)
+    ]
+
+
+async def get_config_sources(business_id: str) -> dict:
+    """Every effective value with the layer it comes from: business, global or default."""
+    global_fields = _fields(await admin_config_collection.find_one({}, {"_id": 0}))
+    overrides = await get_business_overrides(business_id)
+    sources = {}
+    for field in FIELDS:
+        for source, layer in (("business", overrides), ("global", global_fields), ("default", DEFAULTS)):
+            if field in layer:
+                sources[field] = {"value": layer[field], "source": source}
+                break
+    return sources
+
+
+async def set_global_config(config: AdminConfigDB):
+    await admin_config_collection.update_one({}, {"$set": config.dict()}, upsert=True)
+    invalidate()
+
+
+async def set_business_overrides(business_id: str, changes: dict):
+    """Applies override changes; a None value removes the override (back to the global value)."""
+    to_set = {k: v for k, v in changes.items() if v is not None}
+    to_unset = {k: "" for k, v in changes.items() if v is None}
+    if to_set or to_unset:
+        update = {"$set": {**to_set, "sparse": True}}
+        if to_unset:
+            update["$unset"] = to_unset
+        await business_config_collection.update_one({"businessId": business_id}, update, upsert=True)
+    invalidate(business_id)
+
+
+async def compact_business_overrides():
+    """
+    One-shot migration: businesses used to get a full copy of the admin config
+    on first login. Removes copied fields that still equal the global value from
+    those legacy copies only, leaving real overrides (the effective config is
+    unchanged), and marks them sparse so later overrides are never touched.
+    """
+    try:
+        global_config = (await get_global_config()).dict()
+        compacted = 0
+        legacy = {"sparse": {"$ne": True}, **{field: {"$exists": True} for field in LEGACY_COPY_FIELDS}}
+        async for doc in business_config_collection.find(legacy):
+            copied = {field: "" for field in FIELDS if field in doc and doc[field] == global_config[field]}
+            update = {"$set": {"sparse": True}}
+            if copied:
+                update["$unset"] = copied
+            await business_config_collection.update_one({"_id": doc["_id"]}, update)
+            compacted += 1
+        if compacted:
+            logger.info(f"Compacted {compacted} business configs to sparse overrides")
+    except Exception as e:
+        logger.error(f"Business config compaction failed: {e}")
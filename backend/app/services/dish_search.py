@@ -0,0 +1,173 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pymongo import DeleteMany, ReplaceOne
+
+from app.database import dish_search_collection, outlet_profiles_collection
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# dish_search holds one flat document per published, live dish, rewritten from
+# the outlet's published menu after every menu change:
+#   {_id: dishId, storeUid, businessId, storeName, city, currency, isActive,
+#    categoryId, categoryName, name, description, price, minPrice, maxPrice,
+#    imageUrl, imageVariants, updatedAt}
+# minPrice/maxPrice span the base price and every variant price.
+
+# Lower bounds of the price facet buckets
+PRICE_BUCKETS = [0, 100, 200, 300, 500, 1000]
+FACET_LIMIT = 20
+
+
+def price_range(dish: dict):
+    prices = [dish.get("price")] + [v.get("price") for v in dish.get("variants") or []]
+    prices = [p for p in prices if isinstance(p, (int, float)) and p > 0]
+    return (min(prices), max(prices)) if prices else (None, None)
+
+
+def _search_docs(published: dict) -> List[dict]:
+    outlet = published["outlet"]
+    now = datetime.utcnow()
+    docs = []
+    for category in published["menu"]:
+        for dish in category["dishes"]:
+            min_price, max_price = price_range(dish)
+            docs.append({
+                "_id": dish["dishId"],
+                "storeUid": published["storeUid"],
+                "businessId": outlet.get("contactId"),
+                "storeName": outlet.get("storeName"),
+                "city": outlet.get("city"),
+                "currency": outlet.get("currency"),
+                "isActive": outlet.get("isActive", True),
+                "categoryId": category.get("categoryId"),
+                "categoryName": category.get("categoryName"),
+                "name": dish.get("name"),
+                "description": dish.get("description"),
+                "price": dish.get("price"),
+                "minPrice": min_price,
+                "maxPrice": max_price,
+                "imageUrl": dish.get("imageUrl"),
+                "imageVariants": dish.get("imageVariants"),
+                "updatedAt": now,
+            })
+    return docs
+
+
+async def sync_outlet_dish_search(store_uid: str):
+    """Rewrites an outlet's search documents from its published menu."""
+    from app.services.menu_service import get_published_menu
+
+    published = await get_published_menu(store_uid)
+    docs = _search_docs(published) if published else []
+    # Upserts first, then drop dishes that left the menu, so the outlet never
+    # disappears from results mid-refresh
+    writes = [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs]
+    writes.append(DeleteMany({"storeUid": store_uid, "_id": {"$nin": [doc["_id"] for doc in docs]}}))
+    await dish_search_collection.bulk_write(writes, ordered=True)
+
+
+async def rebuild_dish_search() -> int:
+    """Backfills the projection for every live outlet. Returns outlets processed."""
+    count = 0
+    async for outlet in outlet_profiles_collection.find({"isDeleted": False}, {"storeUid": 1}):
+        try:
+            await sync_outlet_dish_search(outlet["storeUid"])
+            count += 1
+        except Exception as e:
+            logger.error(f"Dish search sync failed for {outlet['storeUid']}: {e}")
+    logger.info(f"Rebuilt dish search for {count} outlets")
+    return count
+
+
+async def backfill_if_empty():
+    if await dish_search_collection.estimated_document_count() == 0:
+        await rebuild_dish_search()
+
+
+async def discover_dishes(
+    q: Optional[str] = None,
+    business_id: Optional[str] = None,
+    store_uids: Optional[List[str]] = None,
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    page: int = 1,
+    limit: int = 20,
+) -> dict:
+    """
+    Published dishes across outlets with category, price-range and outlet facets,
+    all computed in one $facet over the filtered set.
+    """
+    match = {"isActive": True}
+    if q:
+        match["$text"] = {"$search": q}
+    if business_id:
+        match["businessId"] = business_id
+    if store_uids:
+        match["storeUid"] = {"$in": store_uids}
+    if category:
+        match["categoryName"] = category
+    # A dish matches a price range if any of its prices (base or variant) falls in it
+    if max_price is not None:
+        match["minPrice"] = {"$lte": max_price}
+    if min_price is not None:
+        match["maxPrice"] = {"$gte": min_price}
+
+    sort = {"score": {"$meta": "textScore"}, "name": 1} if q else {"name": 1, "_id": 1}
+    pipeline = [
+        {"$match": match},
+        {"$facet": {
+            "results": [
+                {"$sort": sort},
+                {"$skip": (page - 1) * limit},
+                {"$limit": limit},
+                {"$project": {"updatedAt": 0, "isActive": 0}},
+            ],
+            "total": [{"$count": "count"}],
+            "categories": [
+                {"$group": {"_id": "$categoryName", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": FACET_LIMIT},
+            ],
+            "priceRanges": [
+                {"$match": {"minPrice": {"$ne": None}}},
+                {"$bucket": {
+                    "groupBy": "$minPrice",
+                    "boundaries": PRICE_BUCKETS + [float("inf")],
+                    "default": "other",
+                    "output": {"count": {"$sum": 1}},
+                }},
+            ],
+            "outlets": [
+                {"$group": {"_id": "$storeUid", "storeName": {"$first": "$storeName"}, "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": FACET_LIMIT},
+            ],
+        }},
+    ]
+    result = (await dish_search_collection.reads("public").aggregate(pipeline).to_list(length=1))[0]
+
+    results = result["results"]
+    for dish in results:
+        dish["dishId"] = dish.pop("_id")
+    total = result["total"][0]["count"] if result["total"] else 0
+
+    bounds = PRICE_BUCKETS + [None]
+    price_ranges = [
+        {"min": bucket["_id"], "max": bounds[bounds.index(bucket["_id"]) + 1], "count": bucket["count"]}
+        for bucket in result["priceRanges"] if bucket["_id"] in PRICE_BUCKETS
+    ]
+    return {
+        "dishes": results,
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "totalPages": (total + limit - 1) // limit,
+        "facets": {
+            "categories": [{"name": c["_id"], "count": c["count"]} for c in result["categories"]],
+            "priceRanges": price_ranges,
+            "outlets": [{"storeUid": o["_id"], "storeName": o["storeName"], "count": o["count"]} for o in result["outlets"]],
+        },
+    }
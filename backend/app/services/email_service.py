@@ -1,20 +1,21 @@
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import os
-from dotenv import load_dotenv
+from app.config import get_settings
 
-load_dotenv()
 
-SMTP_HOST = os.getenv("SMTP_HOST")
-SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
-SMTP_USER = os.getenv("EMAIL_USER")
-SMTP_PASS = os.getenv("EMAIL_PASS")
-SMTP_FROM_NAME = os.getenv("SMTP_FROM_NAME", "Menu Management")
+def get_smtp_class():
+    """smtplib.SMTP, or the local simulator when SIMULATE_PROVIDERS includes smtp."""
+    from app.services import simulators
+    if simulators.enabled("smtp"):
+        return simulators.SimulatedSMTP
+    return smtplib.SMTP
+
 
 def send_otp_email(receiver_email: str, otp: str):
+    settings = get_settings()
     message = MIMEMultipart()
-    message["From"] = f"{SMTP_FROM_NAME} <{SMTP_USER}>"
+    message["From"] = f"{settings.smtp_from_name} <{settings.smtp_user}>"
     message["To"] = receiver_email
     message["Subject"] = f"{otp} is your verification code"
 
@@ -33,10 +34,10 @@ def send_otp_email(receiver_email: str, otp: str):
     message.attach(MIMEText(body, "html"))
 
     try:
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
+        with get_smtp_class()(settings.smtp_host, settings.smtp_port) as server:
             server.starttls()
-            server.login(SMTP_USER, SMTP_PASS)
-            server.sendmail(SMTP_USER, receiver_email, message.as_string())
+            server.login(settings.smtp_user, settings.smtp_pass)
+            server.sendmail(settings.smtp_user, receiver_email, message.as_string())
         return True
     except Exception as e:
         print(f"Error sending email: {e}")
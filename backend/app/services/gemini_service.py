@@ -1,31 +1,65 @@
-import os
 import json
-from google import genai
-from google.genai.errors import ClientError
+from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from app import metrics
+from app.config import get_settings
 from app.logger import get_logger
-from dotenv import load_dotenv
+from app.services import outbound
+from app.services.outbound import ProviderUnavailable
 
 logger = get_logger(__name__)
 
-load_dotenv()
+MODEL_NAME = get_settings().gemini_model
 
-# Initialize Gemini Client
-client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-MODEL_NAME = "gemini-2.5-flash"
 
-async def generate_image_prompt(dish_name: str):
+@lru_cache(maxsize=None)
+def get_client():
     """
-    Generates a creative English visual description for the dish.
+    Builds the Gemini client on first use (google-genai is slow to import).
     """
-    try:
-        response = client.models.generate_content(
-            model=MODEL_NAME,
-            contents=f"Describe the food item '{dish_name}' in English for a text-to-image generator. Keep it under 20 words. Focus on visual appearance.",
-        )
-        return response.text.strip()
-    except Exception as e:
-        logger.error(f"Prompt Generation Error: {e}")
-        return dish_name # Fallback to original
+    from app.services import simulators
+    if simulators.enabled("gemini"):
+        return simulators.SimulatedGeminiClient()
+
+    from google import genai
+    return genai.Client(api_key=get_settings().gemini_api_key)
+
+IMAGE_PROMPTS_PROMPT = """
+You write prompts for a text-to-image model that photographs restaurant dishes.
+For every dish below, describe in English what the dish actually looks like when
+served: main ingredients, colours, texture, garnish and the typical vessel or
+plating (regional dishes included: e.g. a dosa is a thin golden crepe, not a pancake).
+Keep each prompt under 40 words, visual details only, no prices or brand names.
+
+Return JSON ONLY in this schema, one entry per dish, using the given ids:
+{"prompts": [{"id": string, "prompt": string}]}
+
+Dishes (JSON):
+"""
+
+
+async def generate_image_prompts(dishes: List[dict]) -> Dict[str, str]:
+    """
+    Visual descriptions for several dishes ({id, name, description, category})
+    in one Gemini call. Returns {id: prompt} for the dishes the model answered.
+    """
+    payload = json.dumps(dishes, ensure_ascii=False)
+    response = await outbound.call(
+        "gemini",
+        get_client().models.generate_content,
+        model=MODEL_NAME,
+        contents=IMAGE_PROMPTS_PROMPT + payload,
+    )
+    metrics.inc("gemini_prompt_calls")
+    metrics.inc("gemini_prompt_dishes", len(dishes))
+
+    ids = {dish["id"] for dish in dishes}
+    prompts = {}
+    for entry in (_parse_json(response) or {}).get("prompts", []):
+        prompt = (entry.get("prompt") or "").strip()
+        if entry.get("id") in ids and prompt:
+            prompts[entry["id"]] = prompt
+    return prompts
 
 MENU_PROMPT = """
 You are extracting a restaurant menu from an image. 
@@ -68,42 +102,163 @@ Rules:
 - Return ONLY valid JSON.
 """
 
-async def extract_menu_data(img_bytes: bytes):
+TILES_NOTE = """
+The images are consecutive top-to-bottom slices of ONE tall menu page. Slices overlap
+slightly: do not extract an item twice when it appears at the bottom of one slice and
+the top of the next.
+"""
+
+BATCH_NOTE = """
+This request contains SEVERAL menu pages. Each page starts with a text marker
+"Page N:" followed by its image(s). Extract every page separately and wrap the
+schema above per page, returning JSON ONLY in this form:
+
+{
+  "pages": [
+    { "pageIndex": N, "categories": [ ...same category schema as above... ] }
+  ]
+}
+
+Return one entry for every page, in order, even if a page has no items.
+"""
+
+Page = List[Tuple[bytes, str]]
+
+
+def _parse_json(response) -> dict:
+    raw = response.text.strip().strip("```json").strip("```")
+    logger.debug(f"Raw response: {raw[:100]}...") # Print first 100 chars
+    data = json.loads(raw)
+    # Normalize if list
+    if isinstance(data, list):
+        data = data[0] if data else None
+    return data
+
+
+async def extract_menu_data(images: Page):
     """
-    Sends image bytes to Gemini and returns extracted JSON.
+    Sends one menu page to Gemini and returns extracted JSON.
+    `images` holds (bytes, mime_type) parts: the page itself, or its tiles in order.
     """
     try:
-        logger.info(f"Image received for extraction, size: {len(img_bytes)} bytes")
+        total_size = sum(len(data) for data, _ in images)
+        logger.info(f"Image received for extraction, {len(images)} part(s), size: {total_size} bytes")
 
-        response = client.models.generate_content(
+        parts = [{"text": MENU_PROMPT if len(images) == 1 else MENU_PROMPT + TILES_NOTE}]
+        for data, mime_type in images:
+            parts.append({"inline_data": {"mime_type": mime_type, "data": data}})
+
+        response = await outbound.call(
+            "gemini",
+            get_client().models.generate_content,
             model=MODEL_NAME,
-            contents=[{
-                "role": "user",
-                "parts": [
-                    {"text": MENU_PROMPT},
-                    {
-                        "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": img_bytes
-                        }
-                    }
-                ]
-            }]
+            contents=[{"role": "user", "parts": parts}]
         )
-        
+        metrics.inc("gemini_extraction_calls", pages=1)
+
         logger.info("Gemini response received")
-        raw = response.text.strip().strip("```json").strip("```")
-        logger.debug(f"Raw response: {raw[:100]}...") # Print first 100 chars
-        
-        data = json.loads(raw)
-        
-        # Normalize if list
-        if isinstance(data, list):
-            data = data[0] if data else None
-            
+        data = _parse_json(response)
         logger.info("JSON parsed successfully")
         return data
 
+    except ProviderUnavailable:
+        raise
     except Exception as e:
         logger.error(f"Gemini Extraction Error: {e}")
         return None
+
+
+def _pack_batches(pages: List[Page], max_pages: int, max_bytes: int) -> List[List[int]]:
+    """
+    Greedily groups page indexes into batches of at most `max_pages` pages and
+    `max_bytes` of image data. A page bigger than the budget gets a batch of its own.
+    """
+    batches, current, current_bytes = [], [], 0
+    for index, page in enumerate(pages):
+        size = sum(len(data) for data, _ in page)
+        if current and (len(current) >= max_pages or current_bytes + size > max_bytes):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(index)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+async def _extract_batch(pages: List[Page], indexes: List[int]) -> dict:
+    """
+    One Gemini call for several pages. Returns {pageIndex: data} for the pages
+    the model answered; raises when the call or the JSON fails.
+    """
+    parts = [{"text": MENU_PROMPT + BATCH_NOTE}]
+    for index in indexes:
+        page = pages[index]
+        marker = f"Page {index}:"
+        if len(page) > 1:
+            marker += " (consecutive overlapping slices of one tall page; do not extract an item twice)"
+        parts.append({"text": marker})
+        for data, mime_type in page:
+            parts.append({"inline_data": {"mime_type": mime_type, "data": data}})
+
+    response = await outbound.call(
+        "gemini",
+        get_client().models.generate_content,
+        model=MODEL_NAME,
+        contents=[{"role": "user", "parts": parts}]
+    )
+    metrics.inc("gemini_extraction_calls", pages=len(indexes))
+
+    data = _parse_json(response)
+    results = {}
+    for entry in (data or {}).get("pages", []):
+        page_index = entry.get("pageIndex")
+        if isinstance(page_index, str) and page_index.isdigit():
+            page_index = int(page_index)
+        if page_index in indexes:
+            results[page_index] = {"categories": entry.get("categories") or []}
+    return results
+
+
+async def _extract_with_split(pages: List[Page], indexes: List[int], results: List[Optional[dict]]):
+    if len(indexes) == 1:
+        results[indexes[0]] = await extract_menu_data(pages[indexes[0]])
+        return
+
+    try:
+        found = await _extract_batch(pages, indexes)
+    except ProviderUnavailable:
+        raise  # splitting won't help while the provider is down
+    except Exception as e:
+        logger.warning(f"Batched extraction of pages {indexes} failed, splitting: {e}")
+        found = {}
+
+    for index, data in found.items():
+        results[index] = data
+
+    # Pages the model skipped (or the whole batch, on failure) are retried in halves
+    missing = [index for index in indexes if index not in found]
+    if not missing:
+        return
+    metrics.inc("gemini_extraction_batch_splits")
+    if len(missing) == len(indexes):
+        middle = len(missing) // 2
+        await _extract_with_split(pages, missing[:middle], results)
+        await _extract_with_split(pages, missing[middle:], results)
+    else:
+        await _extract_with_split(pages, missing, results)
+
+
+async def extract_menu_pages(pages: List[Page]) -> List[Optional[dict]]:
+    """
+    Extracts several menu pages, packing them into as few Gemini calls as the
+    MENU_EXTRACTION_BATCH_PAGES / MENU_EXTRACTION_BATCH_BYTES budget allows.
+    Returns one result per page, in input order (None where extraction failed).
+    Raises ProviderUnavailable when Gemini is down.
+    """
+    settings = get_settings()
+    results: List[Optional[dict]] = [None] * len(pages)
+    max_pages = max(1, settings.menu_extraction_batch_pages)
+    for indexes in _pack_batches(pages, max_pages, settings.menu_extraction_batch_bytes):
+        await _extract_with_split(pages, indexes, results)
+    return results
@@ -0,0 +1,66 @@
+from typing import Optional
+
+from app.database import outlet_profiles_collection
+
+EARTH_RADIUS_METERS = 6_378_100
+
+# Fields returned by discovery queries; the full outlet stays behind /outlets/{uid}/menu
+NEARBY_PROJECTION = {
+    "_id": 0, "storeUid": 1, "storeName": 1, "address": 1, "city": 1, "zipCode": 1,
+    "logoUrl": 1, "currency": 1, "isActive": 1, "location": 1, "distanceMeters": 1,
+}
+
+
+def geo_point(latitude: Optional[float], longitude: Optional[float]) -> Optional[dict]:
+    """
+    GeoJSON point for a latitude/longitude pair (note GeoJSON's [lng, lat] order),
+    or None unless both are set. Raises ValueError for out-of-range coordinates.
+    """
+    if latitude is None or longitude is None:
+        return None
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise ValueError("Latitude must be within ±90 and longitude within ±180")
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+async def nearby_outlets(latitude: float, longitude: float, radius_km: float,
+                         page: int, limit: int, active_only: bool = True) -> dict:
+    """
+    Live outlets within `radius_km`, nearest first, served by the
+    (location 2dsphere, isActive) partial index.
+    """
+    outlets = outlet_profiles_collection.reads("public")
+    center = geo_point(latitude, longitude)
+    query = {"isDeleted": False}
+    if active_only:
+        query["isActive"] = True
+
+    results = await outlets.aggregate([
+        {"$geoNear": {
+            "near": center,
+            "key": "location",
+            "distanceField": "distanceMeters",
+            "maxDistance": radius_km * 1000,
+            "query": query,
+            "spherical": True,
+        }},
+        {"$skip": (page - 1) * limit},
+        {"$limit": limit},
+        {"$project": NEARBY_PROJECTION},
+    ]).to_list(length=limit)
+
+    # $geoNear can't be counted directly; $geoWithin uses the same index
+    total = await outlets.count_documents({
+        **query,
+        "location": {"$geoWithin": {"$centerSphere": [center["coordinates"], radius_km * 1000 / EARTH_RADIUS_METERS]}},
+    })
+    for outlet in results:
+        outlet["distanceMeters"] = round(outlet["distanceMeters"])
+
+    return {
+        "outlets": results,
+        "total": total,
+        "page": page,
+        "limit": limit,
+        "totalPages": (total + limit - 1) // limit,
+    }
@@ -0,0 +1,172 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app import metrics
+from app.config import get_settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Gemini accepts these as inline data without conversion
+PASSTHROUGH_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+@dataclass
+class PreprocessedImage:
+    data: bytes  # whole page, downscaled and recompressed
+    mime_type: str
+    tiles: List[Tuple[bytes, str]] = field(default_factory=list)  # slices of a tall scan, top to bottom
+    source_format: Optional[str] = None
+    original_size: int = 0
+
+    @property
+    def parts(self) -> List[Tuple[bytes, str]]:
+        """What to send to the extractor: the tiles if the page was split, otherwise the page."""
+        return self.tiles or [(self.data, self.mime_type)]
+
+
+def sniff_mime_type(data: bytes) -> str:
+    if data.startswith(b"\x89PNG"):
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1"):
+        return "image/heic"
+    return "image/jpeg"
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=get_settings().image_workers)
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _encode_jpeg(img, quality: int) -> bytes:
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def _fit(img, max_width: int, max_height: int):
+    from PIL import Image
+
+    scale = min(max_width / img.width, max_height / img.height, 1.0)
+    if scale >= 1.0:
+        return img
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.LANCZOS)
+
+
+def _preprocess(data: bytes, max_edge: int, quality: int, tile_aspect: float) -> dict:
+    """
+    Runs in a worker process. Pillow work is CPU bound and would otherwise
+    block the event loop for hundreds of milliseconds on a 12 MP photo.
+    """
+    from PIL import Image, ImageOps
+
+    img = Image.open(io.BytesIO(data))
+    source_format = img.format
+    img = ImageOps.exif_transpose(img)
+
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+
+    page = _fit(img, max_edge, max_edge)
+    page_bytes = _encode_jpeg(page, quality)
+    page_mime = "image/jpeg"
+
+    # Small files that needed no resize can be larger after recompression
+    unchanged = page.size == img.size and source_format in PASSTHROUGH_MIME_TYPES
+    if unchanged and len(data) <= len(page_bytes):
+        page_bytes, page_mime = data, PASSTHROUGH_MIME_TYPES[source_format]
+
+    tiles = []
+    if tile_aspect and img.height / img.width > tile_aspect:
+        # Keep text legible: slice at full width, ~tile_aspect/2 high, with a small
+        # overlap so a line cut at a boundary appears whole in one of the tiles.
+        tile_height = int(img.width * tile_aspect / 2)
+        overlap = tile_height // 20
+        top = 0
+        while top < img.height:
+            bottom = min(top + tile_height, img.height)
+            tile = _fit(img.crop((0, top, img.width, bottom)), max_edge, max_edge)
+            tiles.append((_encode_jpeg(tile, quality), "image/jpeg"))
+            if bottom == img.height:
+                break
+            top = bottom - overlap
+
+    return {"data": page_bytes, "mime_type": page_mime, "tiles": tiles, "source_format": source_format}
+
+
+async def preprocess_menu_image(data: bytes) -> PreprocessedImage:
+    """
+    Normalizes a menu upload for extraction: detects the format, applies EXIF
+    orientation, downscales to MENU_IMAGE_MAX_EDGE, recompresses and splits very
+    tall scans into tiles. Falls back to the raw bytes if Pillow cannot read them.
+    """
+    settings = get_settings()
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(
+            get_pool(), _preprocess, data,
+            settings.menu_image_max_edge, settings.menu_image_quality, settings.menu_image_tile_aspect,
+        )
+    except Exception as e:
+        logger.error(f"Menu image preprocessing failed, sending original: {e}")
+        metrics.inc("menu_image_preprocess_failures")
+        return PreprocessedImage(data=data, mime_type=sniff_mime_type(data), original_size=len(data))
+
+    image = PreprocessedImage(original_size=len(data), **result)
+    saved = len(data) - len(image.data)
+    metrics.observe("menu_image_bytes_saved", saved)
+    metrics.inc("menu_image_bytes_in", len(data))
+    metrics.inc("menu_image_bytes_out", len(image.data))
+    logger.info(
+        f"Preprocessed {image.source_format} menu image: {len(data)} → {len(image.data)} bytes"
+        f" ({saved} saved), {len(image.tiles)} tiles"
+    )
+    return image
+
+
+def _resize_variants(data: bytes, widths: Dict[str, int], quality: int) -> Dict[str, bytes]:
+    """Runs in a worker process: one WebP per named width, never upscaled."""
+    from PIL import Image, ImageOps
+
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or img.mode == "P" else "RGB")
+
+    variants = {}
+    for name, width in widths.items():
+        resized = _fit(img, width, width * 4)
+        buf = io.BytesIO()
+        resized.save(buf, format="WEBP", quality=quality, method=4)
+        variants[name] = buf.getvalue()
+    return variants
+
+
+async def resize_variants(data: bytes, widths: Dict[str, int], quality: int = 80) -> Dict[str, bytes]:
+    """Display-size WebP renditions of an image, encoded off the event loop."""
+    loop = asyncio.get_running_loop()
+    variants = await loop.run_in_executor(get_pool(), _resize_variants, data, widths, quality)
+    metrics.inc("image_variant_bytes_in", len(data) * len(variants))
+    metrics.inc("image_variant_bytes_out", sum(len(v) for v in variants.values()))
+    return variants
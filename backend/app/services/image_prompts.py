@@ -0,0 +1,141 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from pymongo import UpdateOne
+
+from app.database import categories_collection, dishes_collection
+from app.logger import get_logger
+from app.services.gemini_service import generate_image_prompts
+from app.services.outbound import ProviderUnavailable
+
+logger = get_logger(__name__)
+
+# Dishes carry a cached `imagePrompt`: a visual description written by Gemini
+# for all pending dishes of a request in one call, right after extraction.
+# Image generation (and every regeneration) reuses it; editing the dish's name
+# or description clears it. `imagePromptAttemptedAt` marks dishes already sent
+# to Gemini, so generation never waits on it twice: dishes it skipped, edited
+# ones and failed runs use the generic template until re-enriched (background
+# run or POST /requests/{id}/image-prompts).
+PHOTO_STYLE = "professional food photography, restaurant style, 4k, delicious"
+FALLBACK_PROMPT = "Professional high quality food photography of {name}, restaurant style, 4k, delicious"
+
+# Dishes per Gemini call; keeps the JSON answer well inside the output limit
+PROMPT_BATCH_SIZE = 100
+
+_inflight: Dict[Tuple[str, str], asyncio.Task] = {}
+
+
+def image_prompt(dish: dict) -> str:
+    """Stability prompt for a dish: its cached description, or the generic template."""
+    if dish.get("imagePrompt"):
+        return f"{dish['imagePrompt']}, {PHOTO_STYLE}"
+    return FALLBACK_PROMPT.format(name=dish["name"])
+
+
+async def _enrich(request_id: str, store_uid: str) -> int:
+    # storeUid scopes it: manually added dishes of every outlet share requestId "manual"
+    pending = await dishes_collection.find(
+        {"requestId": request_id, "storeUid": store_uid, "isDeleted": False, "imagePrompt": None},
+        {"_id": 0, "dishId": 1, "name": 1, "description": 1, "categoryId": 1}
+    ).to_list(length=None)
+    if not pending:
+        return 0
+    await dishes_collection.update_many(
+        {"dishId": {"$in": [dish["dishId"] for dish in pending]}},
+        {"$set": {"imagePromptAttemptedAt": datetime.utcnow()}}
+    )
+
+    category_ids = list({dish["categoryId"] for dish in pending if dish.get("categoryId")})
+    category_names = {
+        cat["categoryId"]: cat["name"]
+        async for cat in categories_collection.find({"categoryId": {"$in": category_ids}}, {"categoryId": 1, "name": 1})
+    }
+    sent = {dish["dishId"]: dish for dish in pending}
+    items: List[dict] = [
+        {
+            "id": dish["dishId"],
+            "name": dish["name"],
+            "description": dish.get("description"),
+            "category": category_names.get(dish.get("categoryId")),
+        }
+        for dish in pending
+    ]
+
+    enriched = 0
+    for start in range(0, len(items), PROMPT_BATCH_SIZE):
+        prompts = await generate_image_prompts(items[start:start + PROMPT_BATCH_SIZE])
+        if not prompts:
+            continue
+        # Only fill prompts of dishes still as they were sent: a rename or new
+        # description meanwhile needs a prompt written for the new text
+        result = await dishes_collection.bulk_write(
+            [
+                UpdateOne(
+                    {
+                        "dishId": dish_id,
+                        "imagePrompt": None,
+                        "name": sent[dish_id]["name"],
+                        "description": sent[dish_id].get("description"),
+                    },
+                    {"$set": {"imagePrompt": prompt}}
+                )
+                for dish_id, prompt in prompts.items()
+            ],
+            ordered=False
+        )
+        enriched += result.modified_count
+    logger.info(f"Image prompts written for {enriched}/{len(items)} dishes of {request_id}")
+    return enriched
+
+
+async def enrich_request(request_id: str, store_uid: str) -> int:
+    """
+    Writes image prompts for every dish of the request that has none. Concurrent
+    callers for the same request share one run. Returns dishes enriched.
+    """
+    key = (request_id, store_uid)
+    task = _inflight.get(key)
+    if task is None or task.done():
+        task = _inflight[key] = asyncio.create_task(_enrich(request_id, store_uid))
+
+        def forget(done: asyncio.Task):
+            if _inflight.get(key) is done:
+                del _inflight[key]
+
+        task.add_done_callback(forget)
+    # Shielded: a caller going away (client disconnect) doesn't cancel the shared run
+    return await asyncio.shield(task)
+
+
+async def enrich_request_quietly(request_id: str, store_uid: str):
+    """Background variant: failures only leave dishes on the generic prompt."""
+    try:
+        await enrich_request(request_id, store_uid)
+    except ProviderUnavailable as e:
+        logger.warning(f"Image prompt enrichment skipped for {request_id}: {e.reason}")
+    except Exception as e:
+        logger.error(f"Image prompt enrichment failed for {request_id}: {e}")
+
+
+async def prompt_for_dish(dish: dict) -> str:
+    """
+    Prompt for generating the dish's image. A dish never sent to Gemini
+    triggers its request's enrichment once, and a dish whose enrichment is
+    running joins it; otherwise (or on failure) the generic template is used
+    right away.
+    """
+    if not dish.get("imagePrompt") and dish.get("requestId"):
+        task = _inflight.get((dish["requestId"], dish.get("storeUid")))
+        if task is not None and not task.done():
+            # Join the run in progress (no new Gemini call); its errors are logged there
+            await asyncio.wait([task])
+        elif not dish.get("imagePromptAttemptedAt"):
+            await enrich_request_quietly(dish["requestId"], dish.get("storeUid"))
+        else:
+            return image_prompt(dish)
+        cached = await dishes_collection.find_one({"dishId": dish["dishId"]}, {"imagePrompt": 1})
+        if cached and cached.get("imagePrompt"):
+            dish = {**dish, "imagePrompt": cached["imagePrompt"]}
+    return image_prompt(dish)
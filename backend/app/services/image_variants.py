@@ -0,0 +1,52 @@
+from typing import Optional
+
+from app.config import get_settings
+
+# Display sizes (px wide) served to menu clients instead of the original upload:
+#   thumb → menu list rows, card → dish cards / detail sheet, full → zoomed view
+VARIANT_WIDTHS = {"thumb": 160, "card": 480, "full": 1024}
+
+CLOUDINARY_HOST = "res.cloudinary.com/"
+CLOUDINARY_UPLOAD = "/image/upload/"
+
+
+def local_variant_key(key: str, name: str) -> str:
+    """Where the local resize pipeline writes a variant of a stored asset."""
+    return f"{key}.{name}.webp"
+
+
+def _variant_url(url: str, name: str, width: int) -> Optional[str]:
+    if CLOUDINARY_HOST in url and CLOUDINARY_UPLOAD in url:
+        # Derived on the fly and cached by Cloudinary's CDN: limit width, best format/quality per browser
+        head, tail = url.split(CLOUDINARY_UPLOAD, 1)
+        return f"{head}{CLOUDINARY_UPLOAD}c_limit,w_{width},f_auto,q_auto/{tail}"
+
+    settings = get_settings()
+    local_assets = f"{settings.image_storage_base_url.rstrip('/')}/assets/"
+    if settings.image_storage_backend == "local" and url.startswith(local_assets):
+        return local_variant_key(url, name)
+    return None
+
+
+def image_variants(url: Optional[str]) -> Optional[dict]:
+    """
+    srcset-ready renditions of an image URL:
+    {"thumb": url, "card": url, "full": url, "srcset": "url 160w, ..."},
+    or None when the URL's host can't serve resized variants.
+    """
+    if not url:
+        return None
+    variants = {}
+    for name, width in VARIANT_WIDTHS.items():
+        variant = _variant_url(url, name, width)
+        if variant is None:
+            return None
+        variants[name] = variant
+    variants["srcset"] = ", ".join(f"{variants[name]} {width}w" for name, width in VARIANT_WIDTHS.items())
+    return variants
+
+
+def with_variants(dish: dict) -> dict:
+    """Adds imageVariants to a dish document (in place) and returns it."""
+    dish["imageVariants"] = image_variants(dish.get("imageUrl"))
+    return dish
@@ -0,0 +1,136 @@
+import asyncio
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+from app.database import categories_collection, dishes_collection, outlet_profiles_collection, requests_collection
+from app.logger import get_logger
+from app.services.asset_storage import delete_with_images, retain
+from app.services.config_service import get_business_config
+from app.services.menu_service import menu_changed
+
+logger = get_logger(__name__)
+
+INSERT_BATCH_SIZE = 1000
+REBUILD_CONCURRENCY = 10
+
+
+async def _insert_batched(collection, docs: List[dict]):
+    for start in range(0, len(docs), INSERT_BATCH_SIZE):
+        await collection.insert_many(docs[start:start + INSERT_BATCH_SIZE], ordered=False)
+
+
+async def clone_menu(source_uid: str, target_uids: List[str]) -> Dict[str, dict]:
+    """
+    Copies the source outlet's live published categories and dishes (image URLs
+    included) into each target outlet as a completed request, replacing the
+    target's current published menu. No AI calls are made.
+    Returns a per-target result: {"status": "cloned", ...} or {"status": "skipped", "reason": ...}.
+    """
+    source = await outlet_profiles_collection.find_one({"storeUid": source_uid, "isDeleted": False})
+    if not source:
+        raise LookupError("Source outlet not found")
+    business_id = source["contactId"]
+    config = await get_business_config(business_id)
+
+    live = {"storeUid": source_uid, "isPublished": True, "isDeleted": False}
+    categories = await categories_collection.find(live, {"_id": 0}).to_list(length=None)
+    # Draft previews stay with the source dish; clones take the published image only
+    dishes = await dishes_collection.find(live, {"_id": 0, "draftImageUrl": 0}).to_list(length=None)
+    # Dishes of an unpublished category are hidden on the source menu: leave them
+    # out rather than surfacing them under "General" (uncategorized ones are copied)
+    published_ids = {cat["categoryId"] for cat in categories}
+    dishes = [dish for dish in dishes if not dish.get("categoryId") or dish["categoryId"] in published_ids]
+
+    results: Dict[str, dict] = {}
+    new_categories, new_dishes, new_requests, cloned_uids = [], [], [], []
+    now = datetime.utcnow()
+
+    targets = {
+        t["storeUid"]: t async for t in outlet_profiles_collection.find(
+            {"storeUid": {"$in": target_uids}, "isDeleted": False}, {"storeUid": 1, "contactId": 1}
+        )
+    }
+
+    for target_uid in dict.fromkeys(target_uids):
+        target = targets.get(target_uid)
+        if target_uid == source_uid:
+            results[target_uid] = {"status": "skipped", "reason": "Target is the source outlet"}
+            continue
+        if not target or target.get("contactId") != business_id:
+            results[target_uid] = {"status": "skipped", "reason": "Outlet not found in this business"}
+            continue
+
+        active = await requests_collection.count_documents({"storeUid": target_uid, "status": "in_progress"})
+        if active >= config.processCreationLimit:
+            results[target_uid] = {
+                "status": "skipped",
+                "reason": f"Maximum limit of {config.processCreationLimit} active menu generation processes reached for this outlet."
+            }
+            continue
+
+        request_id = f"req_{uuid.uuid4().hex[:8]}"
+        new_requests.append({
+            "requestId": request_id,
+            "storeUid": target_uid,
+            "currentStep": 4,
+            "status": "completed",
+            "clonedFrom": source_uid,
+            "createdAt": now,
+            "updatedAt": now,
+        })
+
+        category_ids = {}
+        for cat in categories:
+            category_ids[cat["categoryId"]] = f"cat_{uuid.uuid4().hex[:8]}"
+            new_categories.append({
+                **cat,
+                "categoryId": category_ids[cat["categoryId"]],
+                "storeUid": target_uid,
+                "requestId": request_id,
+                "createdAt": now,
+                "updatedAt": now,
+            })
+        for dish in dishes:
+            new_dishes.append({
+                **dish,
+                "dishId": f"dish_{uuid.uuid4().hex[:8]}",
+                "storeUid": target_uid,
+                "requestId": request_id,
+                "categoryId": category_ids[dish["categoryId"]] if dish.get("categoryId") else dish.get("categoryId"),
+                "createdAt": now,
+                "updatedAt": now,
+            })
+
+        cloned_uids.append(target_uid)
+        results[target_uid] = {
+            "status": "cloned",
+            "requestId": request_id,
+            "categories": len(categories),
+            "dishes": len(dishes),
+        }
+
+    if not cloned_uids:
+        return results
+
+    # Same clean-slate replacement as publish_request, for every target at once
+    await categories_collection.delete_many({"storeUid": {"$in": cloned_uids}, "isPublished": True})
+    await delete_with_images(dishes_collection, {"storeUid": {"$in": cloned_uids}, "isPublished": True})
+
+    await requests_collection.insert_many(new_requests)
+    if new_categories:
+        await _insert_batched(categories_collection, new_categories)
+    if new_dishes:
+        await _insert_batched(dishes_collection, new_dishes)
+        # Cloned dishes share the source's stored images
+        await retain(dish.get("imageUrl") for dish in new_dishes)
+
+    semaphore = asyncio.Semaphore(REBUILD_CONCURRENCY)
+
+    async def rebuild(uid: str):
+        async with semaphore:
+            await menu_changed(uid)
+
+    await asyncio.gather(*(rebuild(uid) for uid in cloned_uids))
+    logger.info(f"Cloned menu of {source_uid} into {len(cloned_uids)} outlets ({len(new_dishes)} dishes)")
+    return results
@@ -0,0 +1,214 @@
+import asyncio
+import json
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import CursorType
+
+from app import metrics
+from app.config import get_settings
+from app.database import menu_events_collection
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Live menu push. Write paths append compact diffs to the capped menu_events
+# collection; every worker tails it with one cursor and fans events out to its
+# own SSE viewers, so an idle viewer costs a queue and a heartbeat timer.
+#   {_id, storeUid, ops: [...], createdAt}
+# Ops, applied in order by the viewer:
+#   {"op": "dish", "dish": {...}}                              added or changed (public fields)
+#   {"op": "removeDish", "dishId"}                             unpublished or deleted
+#   {"op": "category", "categoryId", "categoryName"}           added or renamed
+#   {"op": "removeCategory", "categoryId"}
+#   {"op": "order", "categories": [{"categoryId", "dishIds"}]} layout after adds, removals or moves
+#   {"op": "outlet", "outlet": {...}}
+#   {"op": "reload"}                                           too much changed: refetch the menu
+MAX_OPS = 50
+RELOAD = [{"op": "reload"}]
+
+# Tailer resumes slightly before the last event it saw (ObjectIds from different
+# workers are only ordered to the second) and skips the ones already delivered
+RESUME_OVERLAP_SECONDS = 2
+SEEN_IDS = 1000
+
+_subscribers: Dict[str, Set[asyncio.Queue]] = {}
+_tailer: Optional[asyncio.Task] = None
+
+
+def _layout(menu: List[dict]) -> List[dict]:
+    return [
+        {"categoryId": cat.get("categoryId"), "dishIds": [d["dishId"] for d in cat["dishes"]]}
+        for cat in menu
+    ]
+
+
+def menu_diff(old_menu: List[dict], new_menu: List[dict]) -> List[dict]:
+    """Ops turning one published menu into the other (RELOAD when that's shorter)."""
+    old_dishes = {d["dishId"]: d for cat in old_menu for d in cat["dishes"]}
+    new_dishes = {d["dishId"]: d for cat in new_menu for d in cat["dishes"]}
+    old_categories = {cat.get("categoryId"): cat.get("categoryName") for cat in old_menu}
+    new_categories = {cat.get("categoryId"): cat.get("categoryName") for cat in new_menu}
+
+    ops = [
+        {"op": "category", "categoryId": category_id, "categoryName": name}
+        for category_id, name in new_categories.items()
+        if category_id not in old_categories or old_categories[category_id] != name
+    ]
+    ops += [{"op": "dish", "dish": dish} for dish_id, dish in new_dishes.items() if old_dishes.get(dish_id) != dish]
+    ops += [{"op": "removeDish", "dishId": dish_id} for dish_id in old_dishes if dish_id not in new_dishes]
+    ops += [
+        {"op": "removeCategory", "categoryId": category_id}
+        for category_id in old_categories if category_id not in new_categories
+    ]
+    layout = _layout(new_menu)
+    if layout != _layout(old_menu):
+        ops.append({"op": "order", "categories": layout})
+    return RELOAD if len(ops) > MAX_OPS else ops
+
+
+async def publish(store_uid: str, ops: List[dict]):
+    """Appends an event for the outlet's viewers. Never fails the write path."""
+    if not ops:
+        return
+    try:
+        await menu_events_collection.insert_one({"storeUid": store_uid, "ops": ops, "createdAt": datetime.utcnow()})
+        metrics.inc("menu_events_published")
+    except Exception as e:
+        logger.error(f"Failed to publish menu event for {store_uid}: {e}")
+
+
+def _deliver(event: dict):
+    for queue in _subscribers.get(event["storeUid"], ()):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow viewer: whatever it missed is covered by a full refetch
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"_id": event["_id"], "storeUid": event["storeUid"], "ops": RELOAD})
+            metrics.inc("menu_events_overflows")
+
+
+async def _tail():
+    seen_order = deque(maxlen=SEEN_IDS)
+    seen = set()
+    latest = await menu_events_collection.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+    resume_from = latest["_id"].generation_time if latest else None
+    if latest:
+        seen_order.append(latest["_id"])
+        seen.add(latest["_id"])
+
+    while True:
+        query = {}
+        if resume_from:
+            query = {"_id": {"$gte": ObjectId.from_datetime(resume_from - timedelta(seconds=RESUME_OVERLAP_SECONDS))}}
+        cursor = menu_events_collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+        try:
+            while cursor.alive:
+                async for event in cursor:
+                    if event["_id"] in seen:
+                        continue
+                    if len(seen_order) == seen_order.maxlen:
+                        seen.discard(seen_order[0])
+                    seen_order.append(event["_id"])
+                    seen.add(event["_id"])
+                    resume_from = event["_id"].generation_time
+                    _deliver(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Menu event tailer failed, restarting: {e}")
+        finally:
+            cursor.close()
+        # A tailable cursor on an empty capped collection dies immediately
+        await asyncio.sleep(1)
+
+
+def _ensure_tailer():
+    global _tailer
+    if _tailer is None or _tailer.done():
+        _tailer = asyncio.create_task(_tail())
+
+
+async def stop_hub():
+    global _tailer
+    if _tailer is not None:
+        _tailer.cancel()
+        try:
+            await _tailer
+        except (asyncio.CancelledError, Exception):
+            pass
+        _tailer = None
+
+
+def subscribe(store_uid: str) -> asyncio.Queue:
+    _ensure_tailer()
+    queue = asyncio.Queue(maxsize=get_settings().menu_events_queue_size)
+    _subscribers.setdefault(store_uid, set()).add(queue)
+    metrics.inc("menu_event_viewers")
+    return queue
+
+
+def unsubscribe(store_uid: str, queue: asyncio.Queue):
+    queues = _subscribers.get(store_uid)
+    if queues is not None:
+        queues.discard(queue)
+        if not queues:
+            del _subscribers[store_uid]
+    metrics.inc("menu_event_viewers", -1)
+
+
+async def events_since(store_uid: str, last_event_id: str) -> Optional[List[dict]]:
+    """
+    Events after `last_event_id`, or None when it has already left the capped
+    log or more than MAX_OPS events were missed (a refetch is cheaper then).
+    """
+    try:
+        last_id = ObjectId(last_event_id)
+    except (InvalidId, TypeError):
+        return None
+    if not await menu_events_collection.find_one({"_id": last_id}, {"_id": 1}):
+        return None
+    missed = await menu_events_collection.find(
+        {"storeUid": store_uid, "_id": {"$gt": last_id}}
+    ).sort("_id", 1).to_list(length=MAX_OPS + 1)
+    return None if len(missed) > MAX_OPS else missed
+
+
+def _sse(event: dict) -> str:
+    return f"id: {event['_id']}\nevent: menu\ndata: {json.dumps({'ops': event['ops']}, default=str)}\n\n"
+
+
+async def stream(store_uid: str, last_event_id: Optional[str] = None):
+    """Server-sent events for one viewer: replay after Last-Event-ID, then live events and heartbeats."""
+    queue = subscribe(store_uid)
+    heartbeat = get_settings().menu_events_heartbeat_seconds
+    try:
+        yield "retry: 3000\n\n"
+        replayed = set()
+        if last_event_id:
+            missed = await events_since(store_uid, last_event_id)
+            if missed is None:
+                # Resume after the reload from the newest event, not the stale ID
+                latest = await menu_events_collection.find_one({"storeUid": store_uid}, {"_id": 1}, sort=[("_id", -1)])
+                if latest:
+                    replayed.add(latest["_id"])
+                yield _sse({"_id": latest["_id"] if latest else last_event_id, "ops": RELOAD})
+            else:
+                for event in missed:
+                    replayed.add(event["_id"])
+                    yield _sse(event)
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"  # keeps proxies from closing idle streams
+                continue
+            if event["_id"] not in replayed:
+                yield _sse(event)
+    finally:
+        unsubscribe(store_uid, queue)
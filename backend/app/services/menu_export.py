@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import html
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+from app.config import get_settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Layout written for every outlet (paths relative to the export root):
+#   menus/{storeUid}/menu.{hash}.json   immutable, cache forever
+#   menus/{storeUid}/menu.{hash}.html   immutable, cache forever (MENU_EXPORT_HTML)
+#   menus/{storeUid}/latest.json        manifest pointing at the current hash, short TTL
+MANIFEST_NAME = "latest.json"
+
+
+class LocalExportStorage:
+    """Writes artifacts under a directory that nginx (or any static server) serves."""
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip("/")
+
+    def _write(self, path: str, content: bytes):
+        full_path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        tmp_path = f"{full_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, full_path)  # atomic: readers never see a partial file
+
+    async def exists(self, path: str) -> bool:
+        return os.path.exists(os.path.join(self.root, path))
+
+    async def put(self, path: str, content: bytes, content_type: str, immutable: bool) -> str:
+        await asyncio.to_thread(self._write, path, content)
+        return f"{self.base_url}/{path}"
+
+
+class CloudinaryExportStorage:
+    """Uploads artifacts as Cloudinary raw assets, served from its CDN."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+
+    async def exists(self, path: str) -> bool:
+        # Uploads of immutable assets use overwrite=False, so re-puts are cheap no-ops
+        return False
+
+    async def put(self, path: str, content: bytes, content_type: str, immutable: bool) -> str:
+        from app.services import outbound
+        from app.services.cloudinary_service import get_uploader
+
+        response = await outbound.call(
+            "cloudinary",
+            get_uploader().upload,
+            content,
+            public_id=path,
+            resource_type="raw",
+            overwrite=not immutable,
+            invalidate=not immutable,
+            timeout=get_settings().cloudinary_timeout_seconds,
+        )
+        return response.get("secure_url")
+
+
+@lru_cache(maxsize=None)
+def get_export_storage():
+    """
+    Returns the configured export backend, or None when MENU_EXPORT_BACKEND=none.
+    """
+    settings = get_settings()
+    if settings.menu_export_backend == "local":
+        return LocalExportStorage(settings.menu_export_dir, settings.menu_export_base_url)
+    if settings.menu_export_backend == "cloudinary":
+        return CloudinaryExportStorage(settings.menu_export_base_url)
+    return None
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def serialize_menu(payload: dict) -> bytes:
+    # Stable key order so identical menus hash identically
+    return json.dumps(payload, default=_json_default, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def render_menu_html(payload: dict, menu_json: bytes) -> bytes:
+    """
+    Minimal pre-rendered page: readable without JavaScript and crawlable, with the
+    full payload embedded for the SPA to hydrate from.
+    """
+    outlet = payload["outlet"]
+    esc = html.escape
+    currency = esc(outlet.get("currency") or "")
+    sections = []
+    for category in payload["menu"]:
+        items = []
+        for dish in category["dishes"]:
+            price = f"{currency}{dish['price']:g}" if dish.get("price") else ""
+            description = f"<p>{esc(dish['description'])}</p>" if dish.get("description") else ""
+            items.append(f"<li><h3>{esc(dish.get('name') or '')}</h3><span>{price}</span>{description}</li>")
+        sections.append(f"<section><h2>{esc(category['categoryName'])}</h2><ul>{''.join(items)}</ul></section>")
+
+    embedded = menu_json.decode("utf-8").replace("</", "<\\/")
+    page = (
+        "<!doctype html><html><head><meta charset=\"utf-8\">"
+        "<meta name=\"viewport\" content=\"width=device-width, initial-scale=1\">"
+        f"<title>{esc(outlet.get('storeName') or 'Menu')}</title></head><body>"
+        f"<header><h1>{esc(outlet.get('storeName') or '')}</h1><p>{esc(outlet.get('address') or '')}, {esc(outlet.get('city') or '')}</p></header>"
+        f"<main>{''.join(sections)}</main>"
+        f"<script id=\"menu-data\" type=\"application/json\">{embedded}</script>"
+        "</body></html>"
+    )
+    return page.encode("utf-8")
+
+
+async def export_outlet_menu(store_uid: str) -> Optional[dict]:
+    """
+    Renders the outlet's published menu to content-hashed static artifacts and
+    repoints its manifest. Returns the manifest, or None when export is disabled.
+    """
+    storage = get_export_storage()
+    if storage is None:
+        return None
+
+    from app.services.menu_service import get_published_menu
+
+    published = await get_published_menu(store_uid)
+    if published is None:
+        payload = {"outlet": {"storeUid": store_uid, "isDeleted": True}, "menu": []}
+    else:
+        payload = {"outlet": published["outlet"], "menu": published["menu"]}
+
+    menu_json = serialize_menu(payload)
+    content_hash = hashlib.sha256(menu_json).hexdigest()[:16]
+    prefix = f"menus/{store_uid}"
+
+    manifest = {
+        "storeUid": store_uid,
+        "hash": content_hash,
+        "generatedAt": datetime.utcnow().isoformat(),
+    }
+
+    # Artifacts are immutable: a hash seen before (e.g. an edit that was undone)
+    # only needs the manifest repointed
+    json_path = f"{prefix}/menu.{content_hash}.json"
+    html_path = f"{prefix}/menu.{content_hash}.html"
+    manifest["menuUrl"] = f"{storage.base_url}/{json_path}"
+    if not await storage.exists(json_path):
+        manifest["menuUrl"] = await storage.put(json_path, menu_json, "application/json", immutable=True)
+
+    if get_settings().menu_export_html:
+        manifest["htmlUrl"] = f"{storage.base_url}/{html_path}"
+        if not await storage.exists(html_path):
+            manifest["htmlUrl"] = await storage.put(html_path, render_menu_html(payload, menu_json), "text/html", immutable=True)
+
+    await storage.put(f"{prefix}/{MANIFEST_NAME}", json.dumps(manifest).encode("utf-8"), "application/json", immutable=False)
+    logger.info(f"Exported menu for {store_uid}: {content_hash}")
+    return manifest
@@ -0,0 +1,184 @@
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+# Dishes in the same category merge when their names match exactly or as a set
+# of words. Across pages (overlapping photos) OCR noise is tolerated too: names
+# at least this similar whose only differing words are misspellings of each other
+DISH_SIMILARITY = 0.92
+WORD_SIMILARITY = 0.8
+# Shorter words are never treated as misspellings ("egg" vs "veg")
+MIN_FUZZY_WORD = 4
+
+DEFAULT_CATEGORY = "General"
+
+_CURRENCY = re.compile(r"(?i)/-|\b(?:rs|inr|usd|eur|gbp|aed|sar|mrp|price)\b\.?|[₹$€£¥]")
+_NUMBER = re.compile(r"\d+(?:[.,'\u00a0 ]\d+)*")
+_CONTINUED = re.compile(r"\b(?:contd|cont|continued)\b\.?$")
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Comparison key: case, accents, punctuation and "(contd.)" suffixes ignored."""
+    text = unicodedata.normalize("NFKD", name or "")
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower().replace("&", " and ")
+    text = re.sub(r"[^\w\s]", " ", text)
+    text = " ".join(text.split())
+    return _CONTINUED.sub("", text).strip()
+
+
+def parse_price(value) -> Optional[float]:
+    """
+    Reads a price in any common notation: numbers, "₹ 1,200", "Rs.250/-",
+    "1.200,50 €", "12,50", "AED 25", "1 200". Ranges like "120/150" and
+    two-column prices like "120 150" give the first price. Returns None when
+    there is no price.
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value >= 0 else None
+
+    match = _NUMBER.search(_CURRENCY.sub(" ", str(value)))
+    if not match:
+        return None
+    number = match.group()
+
+    # A space or apostrophe is a thousands separator only before exactly three digits
+    parts = re.split(r"['\u00a0 ]", number)
+    kept = [parts[0]]
+    for part in parts[1:]:
+        if not re.fullmatch(r"\d{3}(?:[.,]\d+)?", part):
+            break
+        kept.append(part)
+    # A plain space is also how OCR separates Half/Full columns ("120 150"): it
+    # only groups thousands after a single digit ("1 200") or in longer runs ("1 200 000")
+    if len(kept) == 2 and " " in number and len(parts[0]) > 1:
+        kept = kept[:1]
+    number = "".join(kept)
+
+    if "," in number and "." in number:
+        # Whichever separator comes last is the decimal point
+        if number.rfind(",") > number.rfind("."):
+            number = number.replace(".", "").replace(",", ".")
+        else:
+            number = number.replace(",", "")
+    elif "," in number:
+        head, _, tail = number.rpartition(",")
+        decimal_comma = len(tail) in (1, 2) and "," not in head
+        number = number.replace(",", ".") if decimal_comma else number.replace(",", "")
+    elif number.count(".") > 1:
+        number = number.replace(".", "")
+    try:
+        return float(number)
+    except ValueError:
+        return None
+
+
+def _ocr_variant(a: str, b: str) -> bool:
+    """Same words in the same order, each differing pair a small misspelling."""
+    words_a, words_b = a.split(), b.split()
+    if len(words_a) != len(words_b):
+        return False
+    for word_a, word_b in zip(words_a, words_b):
+        if word_a == word_b:
+            continue
+        if min(len(word_a), len(word_b)) < MIN_FUZZY_WORD:
+            return False
+        if SequenceMatcher(None, word_a, word_b).ratio() < WORD_SIMILARITY:
+            return False
+    return SequenceMatcher(None, a, b).ratio() >= DISH_SIMILARITY
+
+
+def _same_dish(a: dict, b: dict) -> bool:
+    if a["_key"] != b["_key"] and sorted(a["_key"].split()) != sorted(b["_key"].split()):
+        # Fuzzy matching only for a dish seen again on another page
+        if a["imageIndex"] == b["imageIndex"] or not _ocr_variant(a["_key"], b["_key"]):
+            return False
+    # Same name, clearly different price: a genuinely different item (e.g. per size)
+    pa, pb = a.get("price"), b.get("price")
+    return not (pa and pb and abs(pa - pb) > 0.01 * max(pa, pb))
+
+
+def _merge_options(existing: List[dict], incoming: List[dict], field: str):
+    # Same label at a different price is a different option: keep both
+    seen = {(normalize_name(option.get(field)), option.get("price")) for option in existing}
+    for option in incoming:
+        key = (normalize_name(option.get(field)), option.get("price"))
+        if key not in seen:
+            existing.append(option)
+            seen.add(key)
+
+
+def _merge_dish(target: dict, duplicate: dict):
+    for field in ("price", "description", "weight"):
+        if not target.get(field) and duplicate.get(field):
+            target[field] = duplicate[field]
+    _merge_options(target["variants"], duplicate["variants"], "label")
+    _merge_options(target["addons"], duplicate["addons"], "name")
+
+
+def _clean_item(item: dict, image_index: int) -> dict:
+    name = (item.get("name") or "").strip() or "Unknown Dish"
+    return {
+        "name": name,
+        "_key": normalize_name(name),
+        "price": parse_price(item.get("price")),
+        "description": item.get("description"),
+        "weight": item.get("weight"),
+        "imageIndex": image_index,
+        "variants": [
+            {
+                "variantType": var.get("variantType"),
+                "label": var.get("label") or "Variant",
+                "price": parse_price(var.get("price")) or 0.0,
+            }
+            for var in item.get("variants") or []
+        ],
+        "addons": [
+            {"name": ad.get("name") or "Extra", "price": parse_price(ad.get("price")) or 0.0}
+            for ad in item.get("addons") or []
+        ],
+    }
+
+
+def normalize_extraction(results: List[Optional[dict]]) -> dict:
+    """
+    Folds per-page extraction results into one menu: categories merged by
+    normalized name (first spelling wins, page order kept), duplicate dishes
+    within a category merged, prices parsed.
+    Returns {"categories": [{"name", "key", "dishes": [...]}], "mergedCategories", "mergedDishes"}.
+    """
+    categories: Dict[str, dict] = {}
+    merged_categories = merged_dishes = 0
+
+    for image_index, data in enumerate(results):
+        for cat in (data or {}).get("categories") or []:
+            name = (cat.get("name") or "").strip() or DEFAULT_CATEGORY
+            key = normalize_name(name) or normalize_name(DEFAULT_CATEGORY)
+            category = categories.get(key)
+            if category is None:
+                category = categories[key] = {"name": name, "key": key, "dishes": []}
+            else:
+                merged_categories += 1
+
+            for item in cat.get("items") or []:
+                dish = _clean_item(item, image_index)
+                duplicate = next((d for d in category["dishes"] if _same_dish(d, dish)), None)
+                if duplicate:
+                    _merge_dish(duplicate, dish)
+                    merged_dishes += 1
+                else:
+                    category["dishes"].append(dish)
+
+    for category in categories.values():
+        for dish in category["dishes"]:
+            dish.pop("_key")
+            if dish["price"] is None:
+                dish["price"] = 0.0
+
+    return {
+        "categories": list(categories.values()),
+        "mergedCategories": merged_categories,
+        "mergedDishes": merged_dishes,
+    }
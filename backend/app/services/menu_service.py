@@ -0,0 +1,235 @@
+import asyncio
+from datetime import datetime
+from typing import Dict
+
+from app.database import outlet_profiles_collection, categories_collection, dishes_collection, published_menus_collection
+from app.logger import get_logger
+from app.services import menu_events
+from app.services.image_variants import with_variants
+from app.services.ranking import RANK_SORT
+
+logger = get_logger(__name__)
+
+# Rapid edits (e.g. a drag-and-drop session) are coalesced into one refresh per outlet
+MENU_CHANGE_DEBOUNCE_SECONDS = 0.5
+
+_pending: Dict[str, asyncio.Task] = {}
+
+
+# Dish fields copied into published_menus; everything else stays in the dishes collection
+PUBLIC_DISH_FIELDS = [
+    "dishId", "categoryId", "categoryName", "name", "description", "price", "weight",
+    "imageUrl", "variants", "addons", "rank",
+]
+
+
+def _public_dish(dish: dict) -> dict:
+    return with_variants({field: dish.get(field) for field in PUBLIC_DISH_FIELDS if field in dish})
+
+
+async def build_outlet_menu(outlet_uid: str, read_class: str = "primary"):
+    """
+    Assembles the published menu for an outlet from the source collections,
+    or None if the outlet doesn't exist. Exports and rebuilds read from the
+    primary so they never materialize a lagging snapshot.
+    """
+    outlets = outlet_profiles_collection.reads(read_class)
+    categories_coll = categories_collection.reads(read_class)
+    dishes_coll = dishes_collection.reads(read_class)
+
+    outlet = await outlets.find_one({"storeUid": outlet_uid}, {"_id": 0})
+    if not outlet:
+        return None
+
+    # Get Categories
+    categories = await categories_coll.find(
+        {"storeUid": outlet_uid, "isPublished": True, "isDeleted": False},
+        {"_id": 0, "categoryId": 1, "name": 1}
+    ).sort(RANK_SORT).to_list(length=100)
+
+    # Get Dishes
+    projection = {"_id": 0, **{field: 1 for field in PUBLIC_DISH_FIELDS}}
+    dishes = await dishes_coll.find(
+        {"storeUid": outlet_uid, "isPublished": True, "isDeleted": False},
+        projection
+    ).sort(RANK_SORT).to_list(length=1000)
+    for d in dishes:
+        with_variants(d)
+
+    # Group dishes by category
+    menu_data = []
+    category_names = {cat["categoryId"]: cat["name"] for cat in categories}
+
+    # 1. Process defined categories
+    for cat in categories:
+        cat_dishes = []
+        for d in dishes:
+            if d.get("categoryId") == cat["categoryId"]:
+                d["categoryName"] = category_names[cat["categoryId"]]
+                cat_dishes.append(d)
+        menu_data.append({
+            "categoryId": cat["categoryId"],
+            "categoryName": cat["name"],
+            "dishes": cat_dishes
+        })
+
+    # 2. Process uncategorized dishes
+    uncategorized = [d for d in dishes if not d.get("categoryId")]
+    if uncategorized:
+        menu_data.append({
+            "categoryName": "General",
+            "dishes": uncategorized
+        })
+
+    return {
+        "outlet": outlet,
+        "menu": menu_data
+    }
+
+
+async def rebuild_published_menu(store_uid: str):
+    """
+    Re-materializes an outlet's published_menus document from the source collections.
+    """
+    menu = await build_outlet_menu(store_uid)
+    if menu is None or menu["outlet"].get("isDeleted"):
+        removed = await published_menus_collection.delete_one({"storeUid": store_uid})
+        if removed.deleted_count:
+            await menu_events.publish(store_uid, menu_events.RELOAD)
+        return None
+
+    doc = {"storeUid": store_uid, **menu, "updatedAt": datetime.utcnow()}
+    # The replaced document comes back in the same round trip and is diffed for live viewers
+    previous = await published_menus_collection.find_one_and_replace(
+        {"storeUid": store_uid}, doc, upsert=True, projection={"_id": 0, "outlet": 1, "menu": 1}
+    )
+    if previous:
+        ops = menu_events.menu_diff(previous.get("menu", []), menu["menu"])
+        if previous.get("outlet") != menu["outlet"] and ops != menu_events.RELOAD:
+            ops.insert(0, {"op": "outlet", "outlet": menu["outlet"]})
+        await menu_events.publish(store_uid, ops)
+    return doc
+
+
+async def get_published_menu(store_uid: str, read_class: str = "primary"):
+    """
+    Serves the menu with a single indexed find_one, materializing it on first
+    access for outlets published before the collection existed.
+    """
+    doc = await published_menus_collection.reads(read_class).find_one({"storeUid": store_uid}, {"_id": 0})
+    if doc is None:
+        doc = await rebuild_published_menu(store_uid)
+    else:
+        # Documents materialized before variants existed get them until the next rebuild
+        for category in doc["menu"]:
+            for d in category["dishes"]:
+                if "imageVariants" not in d:
+                    with_variants(d)
+    return doc
+
+
+async def sync_published_dish(dish: dict):
+    """
+    Applies an in-place dish edit (name, price, image...) to the published document.
+    Falls back to a rebuild when the dish moved category or its visibility changed.
+    """
+    store_uid = dish.get("storeUid")
+    visible = dish.get("isPublished") and not dish.get("isDeleted")
+    if visible:
+        public_dish = _public_dish(dish)
+        result = await published_menus_collection.update_one(
+            {
+                "storeUid": store_uid,
+                "menu": {"$elemMatch": {"categoryId": dish.get("categoryId"), "dishes.dishId": dish["dishId"]}},
+            },
+            {"$set": {"menu.$[].dishes.$[d]": public_dish, "updatedAt": datetime.utcnow()}},
+            array_filters=[{"d.dishId": dish["dishId"]}]
+        )
+        if result.matched_count:
+            await menu_events.publish(store_uid, [{"op": "dish", "dish": public_dish}])
+            return
+    await rebuild_published_menu(store_uid)
+
+
+async def rename_published_category(store_uid: str, category_id: str, name: str):
+    await published_menus_collection.update_one(
+        {"storeUid": store_uid},
+        {"$set": {
+            "menu.$[c].categoryName": name,
+            "menu.$[c].dishes.$[].categoryName": name,
+            "updatedAt": datetime.utcnow()
+        }},
+        array_filters=[{"c.categoryId": category_id}]
+    )
+    await menu_events.publish(store_uid, [{"op": "category", "categoryId": category_id, "categoryName": name}])
+
+
+async def sync_published_outlet(store_uid: str):
+    outlet = await outlet_profiles_collection.find_one({"storeUid": store_uid}, {"_id": 0})
+    if not outlet or outlet.get("isDeleted"):
+        await published_menus_collection.delete_one({"storeUid": store_uid})
+        return
+    result = await published_menus_collection.update_one(
+        {"storeUid": store_uid},
+        {"$set": {"outlet": outlet, "updatedAt": datetime.utcnow()}}
+    )
+    if result.modified_count:
+        await menu_events.publish(store_uid, [{"op": "outlet", "outlet": outlet}])
+
+
+async def refresh_outlet_menu(store_uid: str):
+    """
+    Runs the slow derived-menu stages (static export, dish search projection)
+    after the published document changed.
+    """
+    from app.services.dish_search import sync_outlet_dish_search
+    from app.services.menu_export import export_outlet_menu
+
+    for stage in (export_outlet_menu, sync_outlet_dish_search):
+        try:
+            await stage(store_uid)
+        except Exception as e:
+            logger.error(f"Menu refresh stage {stage.__name__} failed for {store_uid}: {e}")
+
+
+async def _debounced_refresh(store_uid: str):
+    try:
+        await asyncio.sleep(MENU_CHANGE_DEBOUNCE_SECONDS)
+    except asyncio.CancelledError:
+        return
+    _pending.pop(store_uid, None)
+    await refresh_outlet_menu(store_uid)
+
+
+async def menu_changed(store_uid: str, rebuild: bool = True):
+    """
+    Notifies that an outlet's published menu may have changed.
+    Called from write paths: the published document is rebuilt right away
+    (skip with rebuild=False when the caller already applied an incremental
+    update), while the export runs debounced in the background.
+    """
+    if not store_uid:
+        return
+    if rebuild:
+        await rebuild_published_menu(store_uid)
+    pending = _pending.get(store_uid)
+    if pending and not pending.done():
+        pending.cancel()
+    _pending[store_uid] = asyncio.create_task(_debounced_refresh(store_uid))
+
+
+async def dish_changed(dish: dict):
+    """In-place dish edit: patch the published document, then re-export."""
+    await sync_published_dish(dish)
+    await menu_changed(dish.get("storeUid"), rebuild=False)
+
+
+async def outlet_changed(store_uid: str):
+    """Outlet profile edit: refresh the embedded outlet, then re-export."""
+    await sync_published_outlet(store_uid)
+    await menu_changed(store_uid, rebuild=False)
+
+
+async def category_renamed(store_uid: str, category_id: str, name: str):
+    await rename_published_category(store_uid, category_id, name)
+    await menu_changed(store_uid, rebuild=False)
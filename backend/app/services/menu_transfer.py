@@ -0,0 +1,440 @@
+import codecs
+import csv
+import io
+import json
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from app.database import categories_collection, dishes_collection, outlet_profiles_collection, requests_collection
+from app.logger import get_logger
+from app.services.asset_storage import delete_with_images, retain
+from app.services.menu_normalizer import normalize_name, parse_price
+from app.services.menu_service import menu_changed
+from app.services.ranking import RANK_SORT, next_ranks
+
+logger = get_logger(__name__)
+
+# Spreadsheet layout shared by import and export. variants/addons cells hold
+# "label:price" pairs separated by "|", e.g. "Half:120|Full:200". NDJSON lines
+# use the same keys, with variants/addons as lists of {label|name, price} objects.
+COLUMNS = ["category", "name", "price", "description", "weight", "variants", "addons", "imageUrl", "published"]
+FORMATS = ("csv", "ndjson")
+
+# Rows written per bulk_write; memory stays bounded by this, not by the file
+IMPORT_CHUNK_SIZE = 1000
+# A single CSV record (or NDJSON line) larger than this aborts the import:
+# usually an unbalanced quote swallowing the rest of the file
+MAX_RECORD_CHARS = 64 * 1024
+MAX_REPORTED_ERRORS = 100
+EXPORT_FLUSH_ROWS = 500
+
+_TRUE = {"1", "true", "yes", "y"}
+_FALSE = {"0", "false", "no", "n"}
+
+
+class _Feed:
+    """Iterator csv.reader pulls complete records from; refilled between upload chunks."""
+
+    def __init__(self):
+        self.records = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.records:
+            raise StopIteration
+        return self.records.popleft()
+
+
+async def _lines(chunks: AsyncIterator[bytes]):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    tail = ""
+    async for chunk in chunks:
+        *lines, tail = (tail + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line + "\n"
+        if len(tail) > MAX_RECORD_CHARS:
+            raise ValueError("Line too long")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class _QuoteScanner:
+    """
+    Tracks whether a CSV record is still inside a quoted cell across lines, the
+    way csv.reader does: a quote opens a cell only at its start, "" is an escape.
+    """
+
+    def __init__(self):
+        self.in_quotes = False
+        self.field_start = True
+        self.closed = False
+
+    def feed(self, line: str) -> bool:
+        for ch in line:
+            if self.in_quotes:
+                if ch == '"':
+                    self.in_quotes, self.closed = False, True
+                continue
+            if ch == '"' and (self.field_start or self.closed):
+                self.in_quotes = True
+            self.field_start = ch in ",\r\n"
+            self.closed = False
+        return self.in_quotes
+
+
+async def _csv_rows(chunks: AsyncIterator[bytes]):
+    feed = _Feed()
+    reader = csv.reader(feed)
+    scanner = _QuoteScanner()
+    header = None
+    pending = ""
+    row_number = 0
+    async for line in _lines(chunks):
+        # Hand the reader whole records only: a quoted cell may span lines
+        pending += line
+        if scanner.feed(line):
+            if len(pending) > MAX_RECORD_CHARS:
+                raise ValueError(f"Row {row_number + 1} never closes its quotes")
+            continue
+        feed.records.append(pending)
+        pending = ""
+        for cells in reader:
+            if header is None:
+                header = [cell.strip() for cell in cells]
+                if "name" not in header:
+                    raise ValueError("CSV header must include a 'name' column")
+                continue
+            row_number += 1
+            if any(cell.strip() for cell in cells):
+                yield row_number, dict(zip(header, cells))
+    if pending:
+        raise ValueError(f"Row {row_number + 1} never closes its quotes")
+
+
+async def _ndjson_rows(chunks: AsyncIterator[bytes]):
+    row_number = 0
+    async for line in _lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, ValueError(f"Invalid JSON: {e}")
+            continue
+        yield row_number, row if isinstance(row, dict) else ValueError("Line is not a JSON object")
+
+
+def _price(value, what: str) -> float:
+    if value is None or value == "":
+        return 0.0
+    price = parse_price(value)
+    if price is None:
+        raise ValueError(f"Invalid {what} price {value!r}")
+    return price
+
+
+def _options(value, label_field: str) -> List[dict]:
+    """Variants/addons from a "label:price|label:price" cell or a list of objects."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        items = []
+        for part in value.split("|"):
+            if not part.strip():
+                continue
+            label, sep, price = part.rpartition(":")
+            if not sep:
+                label, price = price, ""
+            items.append({label_field: label.strip(), "price": price.strip()})
+        value = items
+    if not isinstance(value, list):
+        raise ValueError(f"Invalid {label_field} list")
+
+    options = []
+    for item in value:
+        if not isinstance(item, dict):
+            raise ValueError(f"Invalid {label_field} entry {item!r}")
+        label = str(item.get(label_field) or item.get("label") or item.get("name") or "").strip()
+        if not label:
+            raise ValueError(f"{label_field.capitalize()} without a name")
+        option = {label_field: label, "price": _price(item.get("price"), label)}
+        if label_field == "label":
+            option["variantType"] = item.get("variantType")
+        options.append(option)
+    return options
+
+
+def _flag(value, default: bool = True) -> bool:
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f"Invalid published flag {value!r}")
+
+
+def _text(value) -> Optional[str]:
+    text = str(value).strip() if value is not None else ""
+    return text or None
+
+
+def _parse_row(row: dict) -> dict:
+    name = _text(row.get("name"))
+    if not name:
+        raise ValueError("Missing dish name")
+    return {
+        "category": _text(row.get("category")) or "General",
+        "name": name,
+        "price": _price(row.get("price"), "dish"),
+        "description": _text(row.get("description")),
+        "weight": _text(row.get("weight")),
+        "variants": _options(row.get("variants"), "label"),
+        "addons": _options(row.get("addons"), "name"),
+        "imageUrl": _text(row.get("imageUrl")),
+        "isPublished": _flag(row.get("published")),
+    }
+
+
+async def _chunks(upload, size: int = 64 * 1024):
+    while True:
+        chunk = await upload.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def import_menu(store_uid: str, upload, fmt: str, mode: str = "append") -> dict:
+    """
+    Streams a CSV/NDJSON menu file into the outlet, IMPORT_CHUNK_SIZE rows per
+    bulk write. Bad rows are skipped and reported; good rows are kept. Categories
+    are matched by name against the live menu ("append") or created fresh
+    ("replace": the new menu is staged unpublished and swapped in for the old one
+    only when every row imported; otherwise the partial import is discarded).
+    """
+    outlet = await outlet_profiles_collection.find_one({"storeUid": store_uid, "isDeleted": False}, {"_id": 1})
+    if not outlet:
+        raise LookupError("Outlet not found")
+
+    now = datetime.utcnow()
+    request_id = f"req_{uuid.uuid4().hex[:8]}"
+    await requests_collection.insert_one({
+        "requestId": request_id,
+        "storeUid": store_uid,
+        "currentStep": 4,
+        "status": "completed",
+        "importedFrom": getattr(upload, "filename", None),
+        "createdAt": now,
+        "updatedAt": now,
+    })
+
+    # Replace mode stages rows unpublished; `importPublished` holds each row's own flag until the swap
+    staged = mode == "replace"
+    category_ids: Dict[str, str] = {}
+    if mode == "append":
+        async for cat in categories_collection.find(
+            {"storeUid": store_uid, "isPublished": True, "isDeleted": False}, {"categoryId": 1, "name": 1}
+        ):
+            category_ids.setdefault(normalize_name(cat["name"]), cat["categoryId"])
+
+    errors: List[dict] = []
+    stats = {"rows": 0, "imported": 0, "failed": 0, "categoriesCreated": 0}
+    new_categories: List[dict] = []
+    batch: List[tuple] = []  # (row number, dish)
+
+    def fail(row_number: int, message: str):
+        stats["failed"] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_number, "error": message})
+
+    async def flush():
+        if new_categories:
+            for cat, rank in zip(new_categories, await next_ranks("categories", store_uid, len(new_categories))):
+                cat["rank"] = rank
+            await categories_collection.insert_many(new_categories, ordered=False)
+            stats["categoriesCreated"] += len(new_categories)
+            new_categories.clear()
+        if not batch:
+            return
+        for (_, dish), rank in zip(batch, await next_ranks("dishes", store_uid, len(batch))):
+            dish["rank"] = rank
+        failed = set()
+        try:
+            await dishes_collection.bulk_write([InsertOne(dish) for _, dish in batch], ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                failed.add(write_error["index"])
+                fail(batch[write_error["index"]][0], write_error.get("errmsg", "Write failed"))
+        stats["imported"] += len(batch) - len(failed)
+        await retain(dish.get("imageUrl") for i, (_, dish) in enumerate(batch) if i not in failed)
+        batch.clear()
+
+    async def discard_staged():
+        # The live menu is untouched; drop what was staged
+        await delete_with_images(dishes_collection, {"requestId": request_id})
+        await categories_collection.delete_many({"requestId": request_id})
+        await requests_collection.update_one(
+            {"requestId": request_id}, {"$set": {"status": "cancelled", "currentStep": 0}}
+        )
+
+    rows = _csv_rows(_chunks(upload)) if fmt == "csv" else _ndjson_rows(_chunks(upload))
+    aborted = None
+    try:
+        try:
+            async for row_number, row in rows:
+                stats["rows"] += 1
+                try:
+                    if isinstance(row, Exception):
+                        raise row
+                    item = _parse_row(row)
+                except ValueError as e:
+                    fail(row_number, str(e))
+                    continue
+
+                key = normalize_name(item["category"])
+                category_id = category_ids.get(key)
+                if category_id is None:
+                    category_id = category_ids[key] = f"cat_{uuid.uuid4().hex[:8]}"
+                    new_categories.append({
+                        "categoryId": category_id,
+                        "storeUid": store_uid,
+                        "requestId": request_id,
+                        "name": item["category"],
+                        "isPublished": not staged,
+                        "isDeleted": False,
+                        "createdAt": now,
+                        "updatedAt": now,
+                    })
+
+                batch.append((row_number, {
+                    "dishId": f"dish_{uuid.uuid4().hex[:8]}",
+                    "storeUid": store_uid,
+                    "requestId": request_id,
+                    "categoryId": category_id,
+                    "name": item["name"],
+                    "price": item["price"],
+                    "weight": item["weight"],
+                    "description": item["description"],
+                    "imageUrl": item["imageUrl"],
+                    "imageStatus": "ready" if item["imageUrl"] else "pending",
+                    "imageIndex": 0,
+                    "isPublished": item["isPublished"] and not staged,
+                    "isDeleted": False,
+                    "variants": item["variants"],
+                    "addons": item["addons"],
+                    "generationCount": 0,
+                    "createdAt": now,
+                    "updatedAt": now,
+                    **({"importPublished": item["isPublished"]} if staged else {}),
+                }))
+                if len(batch) >= IMPORT_CHUNK_SIZE:
+                    await flush()
+        except ValueError as e:
+            # The file can't be read past this point; rows before it are kept (append mode)
+            aborted = str(e)
+        await flush()
+    except BaseException:
+        if staged:
+            await discard_staged()
+        raise
+
+    replaced = rolled_back = False
+    if staged and stats["imported"] and not stats["failed"] and not aborted:
+        # Switch the new menu on, then the same clean-slate removal as publish_request
+        await categories_collection.update_many({"requestId": request_id}, {"$set": {"isPublished": True}})
+        await dishes_collection.update_many(
+            {"requestId": request_id},
+            [{"$set": {"isPublished": "$importPublished"}}, {"$unset": "importPublished"}]
+        )
+        old = {"storeUid": store_uid, "isPublished": True, "requestId": {"$ne": request_id}}
+        await categories_collection.delete_many(old)
+        await delete_with_images(dishes_collection, old)
+        replaced = True
+    elif staged:
+        await discard_staged()
+        rolled_back = True
+
+    if (stats["imported"] and not staged) or replaced:
+        await menu_changed(store_uid)
+    logger.info(
+        f"Imported {stats['imported']}/{stats['rows']} rows into {store_uid} "
+        f"({stats['failed']} failed{', aborted: ' + aborted if aborted else ''})"
+    )
+    return {
+        "requestId": request_id,
+        **stats,
+        "replaced": replaced,
+        "rolledBack": rolled_back,
+        "aborted": aborted,
+        "errors": errors,
+        "errorsTruncated": stats["failed"] > len(errors),
+    }
+
+
+def _export_row(dish: dict, category_name: str) -> dict:
+    return {
+        "category": category_name,
+        "name": dish.get("name"),
+        "price": dish.get("price"),
+        "description": dish.get("description"),
+        "weight": dish.get("weight"),
+        "variants": [
+            {"label": v.get("label"), "price": v.get("price"), "variantType": v.get("variantType")}
+            for v in dish.get("variants") or []
+        ],
+        "addons": [{"name": a.get("name"), "price": a.get("price")} for a in dish.get("addons") or []],
+        "imageUrl": dish.get("imageUrl"),
+        "published": True,
+    }
+
+
+def _csv_cell(value) -> str:
+    if isinstance(value, list):
+        return "|".join(f"{item.get('label') or item.get('name')}:{item.get('price')}" for item in value)
+    if value is None:
+        return ""
+    return str(value).lower() if isinstance(value, bool) else str(value)
+
+
+async def _published_dishes(store_uid: str):
+    """(dish, category name) for the published menu, in menu order, one cursor per category."""
+    projection = {"_id": 0, "name": 1, "price": 1, "description": 1, "weight": 1,
+                  "variants": 1, "addons": 1, "imageUrl": 1}
+    live = {"storeUid": store_uid, "isPublished": True, "isDeleted": False}
+    categories = await categories_collection.find(live, {"_id": 0, "categoryId": 1, "name": 1}).sort(RANK_SORT).to_list(length=None)
+    for cat in categories + [{"categoryId": None, "name": "General"}]:
+        async for dish in dishes_collection.find({**live, "categoryId": cat["categoryId"]}, projection).sort(RANK_SORT):
+            yield dish, cat["name"]
+
+
+async def export_menu(store_uid: str, fmt: str):
+    """Streams the outlet's published menu in the import format."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer:
+        writer.writerow(COLUMNS)
+    rows = 0
+    async for dish, category_name in _published_dishes(store_uid):
+        row = _export_row(dish, category_name)
+        if writer:
+            writer.writerow([_csv_cell(row[column]) for column in COLUMNS])
+        else:
+            buffer.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+        rows += 1
+        if rows % EXPORT_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,205 @@
+import asyncio
+import random
+import time
+from typing import Callable, Dict
+
+from app import metrics
+from app.config import get_settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# HTTP statuses worth another attempt; anything else (bad prompt, auth, 4xx) fails at once
+RETRYABLE_STATUSES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8
+
+
+class ProviderUnavailable(Exception):
+    """Raised without calling the provider: circuit open, or no free slot before the deadline."""
+
+    def __init__(self, provider: str, reason: str):
+        super().__init__(f"{provider} unavailable: {reason}")
+        self.provider = provider
+        self.reason = reason
+
+
+class RetryableError(Exception):
+    """Raised by call sites for responses that should be retried (e.g. HTTP 429/5xx)."""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (RetryableError, asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    # google-genai APIError has .code, requests/httpx errors carry .response.status_code
+    status = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    response = getattr(exc, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUSES
+    # Transport failures from requests / httpx / urllib3 without a status
+    name = type(exc).__name__
+    return any(word in name for word in ("Timeout", "Connection", "Protocol", "RemoteDisconnected"))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive retryable failures, rejects calls for
+    `reset_seconds`, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, provider: str, failures: int, reset_seconds: float):
+        self.provider = provider
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.provider} closed")
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._publish()
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failures:
+            if self.state != "open":
+                logger.warning(f"Circuit for {self.provider} opened after {self.consecutive_failures} failures")
+                metrics.inc("outbound_circuit_opened", provider=self.provider)
+            self.opened_at = time.monotonic()
+        self._publish()
+
+    def _publish(self):
+        metrics.set_value("outbound_circuit_open", 0 if self.opened_at is None else 1, provider=self.provider)
+
+
+class Provider:
+    def __init__(self, name: str, concurrency: int, timeout: float, retries: int, breaker: CircuitBreaker):
+        self.name = name
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.breaker = breaker
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.in_flight = 0
+
+    def stats(self) -> dict:
+        return {
+            "provider": self.name,
+            "concurrency": self.concurrency,
+            "inFlight": self.in_flight,
+            "timeoutSeconds": self.timeout,
+            "maxRetries": self.retries,
+            "circuit": self.breaker.state,
+            "consecutiveFailures": self.breaker.consecutive_failures,
+        }
+
+
+_providers: Dict[str, Provider] = {}
+
+
+def get_provider(name: str) -> Provider:
+    provider = _providers.get(name)
+    if provider is None:
+        settings = get_settings()
+        concurrency, timeout = {
+            "gemini": (settings.gemini_concurrency, settings.gemini_timeout_seconds),
+            "stability": (settings.stability_concurrency, settings.stability_timeout_seconds),
+            "cloudinary": (settings.cloudinary_concurrency, settings.cloudinary_timeout_seconds),
+        }[name]
+        breaker = CircuitBreaker(name, settings.outbound_breaker_failures, settings.outbound_breaker_reset_seconds)
+        provider = _providers[name] = Provider(name, concurrency, timeout, settings.outbound_max_retries, breaker)
+    return provider
+
+
+def provider_stats() -> list:
+    return [provider.stats() for provider in _providers.values()]
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: spreads retries from many workers instead of synchronizing them
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+async def call(provider_name: str, fn: Callable, *args, **kwargs):
+    """
+    Runs a blocking provider SDK call in a worker thread under the provider's
+    concurrency limit, per-attempt deadline, retry policy and circuit breaker.
+    Raises ProviderUnavailable when the call was never attempted, otherwise the
+    last error.
+    """
+    provider = get_provider(provider_name)
+    attempt = 0
+    while True:
+        if not provider.breaker.allow():
+            metrics.inc("outbound_calls", provider=provider_name, outcome="circuit_open")
+            raise ProviderUnavailable(provider_name, "circuit open")
+
+        try:
+            await asyncio.wait_for(provider.semaphore.acquire(), timeout=provider.timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("outbound_calls", provider=provider_name, outcome="saturated")
+            provider.breaker.trial_in_flight = False
+            raise ProviderUnavailable(provider_name, "no free slot before deadline")
+
+        provider.in_flight += 1
+        metrics.set_value("outbound_in_flight", provider.in_flight, provider=provider_name)
+        started = time.perf_counter()
+        try:
+            # The thread keeps running past the deadline; SDK-level timeouts
+            # passed by the call sites bound it
+            result = await asyncio.wait_for(asyncio.to_thread(fn, *args, **kwargs), timeout=provider.timeout)
+        except Exception as e:
+            retryable = is_retryable(e)
+            metrics.inc("outbound_calls", provider=provider_name, outcome="retryable_error" if retryable else "error")
+            if not retryable:
+                # The provider answered; a bad request says nothing about its health
+                provider.breaker.record_success()
+                raise
+            provider.breaker.record_failure()
+            if attempt >= provider.retries or provider.breaker.state == "open":
+                logger.error(f"{provider_name} call failed after {attempt + 1} attempt(s): {e!r}")
+                raise
+            delay = _backoff(attempt)
+            logger.warning(f"{provider_name} call failed ({e!r}), retry {attempt + 1}/{provider.retries} in {delay:.2f}s")
+            metrics.inc("outbound_retries", provider=provider_name)
+        else:
+            provider.breaker.record_success()
+            metrics.inc("outbound_calls", provider=provider_name, outcome="ok")
+            return result
+        finally:
+            metrics.observe("outbound_latency_ms", (time.perf_counter() - started) * 1000, provider=provider_name)
+            provider.in_flight -= 1
+            metrics.set_value("outbound_in_flight", provider.in_flight, provider=provider_name)
+            provider.semaphore.release()
+
+        await asyncio.sleep(delay)
+        attempt += 1
@@ -0,0 +1,120 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app import metrics
+from app.database import ai_usage_collection, dishes_collection
+from app.logger import get_logger
+from app.models import AdminConfigDB
+
+logger = get_logger(__name__)
+
+# AI credits are counted per business and calendar month (UTC) in ai_usage:
+#   {businessId, kind, period: "YYYY-MM", used, updatedAt}, unique on (businessId, kind, period).
+# A reservation is one conditional upsert: it matches only while the credits
+# still fit; otherwise the upsert collides with the existing window and fails.
+IMAGE_GENERATION = "image_generation"
+MENU_EXTRACTION = "menu_extraction"
+IMAGE_DRAFT = "image_draft"
+
+# kind → AdminConfigDB field holding its monthly limit
+LIMIT_FIELDS = {
+    IMAGE_GENERATION: "imageGenerationLimit",
+    MENU_EXTRACTION: "menuExtractionLimit",
+    IMAGE_DRAFT: "imageDraftLimit",
+}
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+@dataclass
+class Reservation:
+    business_id: str
+    kind: str
+    period: str
+    amount: int
+
+    async def refund(self, amount: Optional[int] = None):
+        """Returns credits (all of them by default) to the window they were taken from."""
+        amount = self.amount if amount is None else min(amount, self.amount)
+        if amount <= 0:
+            return
+        self.amount -= amount
+        await ai_usage_collection.update_one(
+            {"businessId": self.business_id, "kind": self.kind, "period": self.period},
+            {"$inc": {"used": -amount}, "$set": {"updatedAt": datetime.utcnow()}}
+        )
+        metrics.inc("quota_refunded", amount, kind=self.kind)
+
+
+def current_period(now: Optional[datetime] = None) -> str:
+    return (now or datetime.utcnow()).strftime("%Y-%m")
+
+
+async def reserve(business_id: str, kind: str, amount: int, config: AdminConfigDB) -> Reservation:
+    """Takes `amount` credits from the business's current window, or raises QuotaExceeded."""
+    limit = getattr(config, LIMIT_FIELDS[kind])
+    period = current_period()
+    if amount > limit:
+        raise QuotaExceeded(f"This request needs {amount} credits but the monthly limit is {limit}.")
+    query = {"businessId": business_id, "kind": kind, "period": period, "used": {"$lte": limit - amount}}
+    update = {"$inc": {"used": amount}, "$set": {"updatedAt": datetime.utcnow()}}
+    try:
+        await ai_usage_collection.find_one_and_update(query, update, upsert=True, projection={"_id": 1})
+    except DuplicateKeyError:
+        # The window exists and is full, or a concurrent first reservation just
+        # created it: only the plain conditional update can tell
+        if not await ai_usage_collection.find_one_and_update(query, update, projection={"_id": 1}):
+            metrics.inc("quota_rejected", kind=kind)
+            raise QuotaExceeded(f"Monthly limit of {limit} reached for {kind.replace('_', ' ')}.")
+    metrics.inc("quota_reserved", amount, kind=kind)
+    return Reservation(business_id, kind, period, amount)
+
+
+async def reserve_dish_generation(dish_id: str, request_id: str, per_dish_limit: int) -> Optional[dict]:
+    """
+    Counts one generation against the dish and marks it generating, in one
+    conditional update. Returns the dish as it was before, or None when it is
+    missing or already at its limit.
+    """
+    return await dishes_collection.find_one_and_update(
+        {
+            "dishId": dish_id,
+            "requestId": request_id,
+            "$or": [{"generationCount": {"$lt": per_dish_limit}}, {"generationCount": {"$exists": False}}],
+        },
+        {"$inc": {"generationCount": 1}, "$set": {"imageStatus": "generating"}},
+        return_document=ReturnDocument.BEFORE
+    )
+
+
+async def refund_dish_generation(dish_id: str, image_status: str = "failed"):
+    await dishes_collection.update_one(
+        {"dishId": dish_id, "generationCount": {"$gt": 0}},
+        {"$inc": {"generationCount": -1}, "$set": {"imageStatus": image_status}}
+    )
+
+
+async def get_usage(business_id: str, config: AdminConfigDB) -> dict:
+    period = current_period()
+    used = {
+        doc["kind"]: doc["used"]
+        async for doc in ai_usage_collection.find({"businessId": business_id, "period": period})
+    }
+    usage = {}
+    for kind, field in LIMIT_FIELDS.items():
+        limit = getattr(config, field)
+        usage[kind] = {"used": used.get(kind, 0), "limit": limit, "remaining": max(limit - used.get(kind, 0), 0)}
+    return {
+        "businessId": business_id,
+        "period": period,
+        "usage": usage,
+        "imageGenerationLimitPerDish": config.imageGenerationLimitPerDish,
+    }
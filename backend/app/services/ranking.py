@@ -0,0 +1,181 @@
+import asyncio
+from typing import List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Rank keys are base-62 fractions (digits in ASCII order, so plain string
+# comparison is numeric comparison). "V" sits halfway, "VV" a bit above it...
+# Keys never end in "0", which keeps every fraction uniquely spelled.
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+# Keys past this length trigger a background rebalance of their outlet
+MAX_RANK_LENGTH = 12
+
+# kind → (collection attribute in app.database, id field)
+SCOPES = {
+    "dishes": ("dishes_collection", "dishId"),
+    "categories": ("categories_collection", "categoryId"),
+}
+
+# Sort order for every ordered read; "order" is the legacy integer position
+RANK_SORT = [("rank", 1), ("order", 1), ("createdAt", -1)]
+
+_rebalance_queue: Set[Tuple[str, str]] = set()
+_backfilled = False
+
+
+def _to_int(key: str, length: int) -> int:
+    value = 0
+    for ch in key.ljust(length, "0"):
+        value = value * BASE + DIGITS.index(ch)
+    return value
+
+
+def _to_key(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, BASE)
+        chars.append(DIGITS[digit])
+    return "".join(reversed(chars)).rstrip("0")
+
+
+def ranks_between(before: Optional[str], after: Optional[str], count: int = 1) -> List[str]:
+    """
+    Returns `count` evenly spaced keys strictly between `before` and `after`
+    (None means the start / end of the list).
+    """
+    if before is not None and after is not None and before >= after:
+        raise ValueError(f"Rank {before!r} is not below {after!r}")
+
+    length = max(len(before or ""), len(after or ""), 1)
+    while True:
+        low = _to_int(before, length) if before else 0
+        high = _to_int(after, length) if after else BASE ** length
+        if high - low > count:
+            break
+        length += 1
+
+    return [_to_key(low + (high - low) * (i + 1) // (count + 1), length) for i in range(count)]
+
+
+def rank_between(before: Optional[str], after: Optional[str]) -> str:
+    return ranks_between(before, after, 1)[0]
+
+
+def _collection(kind: str):
+    from app import database
+    return getattr(database, SCOPES[kind][0])
+
+
+async def last_rank(kind: str, store_uid: str) -> Optional[str]:
+    last = await _collection(kind).find_one(
+        {"storeUid": store_uid, "rank": {"$type": "string"}},
+        {"rank": 1},
+        sort=[("rank", -1)]
+    )
+    return last["rank"] if last else None
+
+
+async def next_ranks(kind: str, store_uid: str, count: int = 1) -> List[str]:
+    """Keys for `count` new items appended to the end of an outlet's list."""
+    keys = ranks_between(await last_rank(kind, store_uid), None, count)
+    if keys and len(keys[-1]) > MAX_RANK_LENGTH:
+        request_rebalance(kind, store_uid)
+    return keys
+
+
+async def rebalance(kind: str, store_uid: str) -> int:
+    """
+    Respaces every key of an outlet's list evenly, keeping the current order.
+    Also backfills items created before ranks existed. Returns items rewritten.
+    """
+    collection = _collection(kind)
+    id_field = SCOPES[kind][1]
+    items = await collection.find(
+        {"storeUid": store_uid}, {"_id": 0, id_field: 1, "rank": 1}
+    ).sort(RANK_SORT).to_list(length=None)
+    if not items:
+        return 0
+
+    keys = ranks_between(None, None, len(items))
+    writes = [
+        UpdateOne({id_field: item[id_field]}, {"$set": {"rank": key}})
+        for item, key in zip(items, keys)
+        if item.get("rank") != key
+    ]
+    if writes:
+        await collection.bulk_write(writes, ordered=False)
+    logger.info(f"Rebalanced {kind} ranks for {store_uid}: {len(writes)}/{len(items)} rewritten")
+    return len(writes)
+
+
+async def move(kind: str, store_uid: str, item_id: str, prev_id: Optional[str], next_id: Optional[str]) -> Optional[str]:
+    """
+    Places one item between its new neighbours by writing only that item's key.
+    Returns the new key, or None if the item doesn't exist.
+    """
+    collection = _collection(kind)
+    id_field = SCOPES[kind][1]
+
+    async def neighbour_ranks():
+        ranks = []
+        for neighbour_id in (prev_id, next_id):
+            if neighbour_id is None:
+                ranks.append(None)
+                continue
+            doc = await collection.find_one({id_field: neighbour_id, "storeUid": store_uid}, {"rank": 1})
+            if not doc:
+                raise ValueError(f"Neighbour {neighbour_id} not found")
+            ranks.append(doc.get("rank", ""))
+        return ranks
+
+    before, after = await neighbour_ranks()
+    # Legacy neighbours without a key, or a client working off a stale order:
+    # respace the list once and retry
+    if "" in (before, after) or (before and after and before >= after):
+        await rebalance(kind, store_uid)
+        before, after = await neighbour_ranks()
+        if before and after and before >= after:
+            raise ValueError("Neighbours are out of order")
+
+    key = rank_between(before or None, after or None)
+    result = await collection.update_one(
+        {id_field: item_id, "storeUid": store_uid},
+        {"$set": {"rank": key}}
+    )
+    if result.matched_count == 0:
+        return None
+    if len(key) > MAX_RANK_LENGTH:
+        request_rebalance(kind, store_uid)
+    return key
+
+
+def request_rebalance(kind: str, store_uid: str):
+    _rebalance_queue.add((kind, store_uid))
+
+
+async def run_rebalance_job():
+    """
+    Background job: respaces queued lists. The first run also backfills ranks
+    for outlets whose items predate rank keys.
+    """
+    global _backfilled
+    if not _backfilled:
+        for kind in SCOPES:
+            unranked = await _collection(kind).distinct("storeUid", {"rank": {"$exists": False}})
+            for store_uid in unranked:
+                _rebalance_queue.add((kind, store_uid))
+        _backfilled = True
+
+    while _rebalance_queue:
+        kind, store_uid = _rebalance_queue.pop()
+        try:
+            await rebalance(kind, store_uid)
+        except Exception as e:
+            logger.error(f"Rank rebalance failed for {kind}/{store_uid}: {e}")
+        await asyncio.sleep(0)  # yield between outlets
@@ -0,0 +1,223 @@
+"""
+Local stand-ins for the paid providers, for load tests and offline benchmarks.
+
+Enable per provider with SIMULATE_PROVIDERS=gemini,stability,cloudinary,smtp
+(or "all"). Each stand-in mimics the SDK surface the services use, sleeps for a
+log-normal latency (SIMULATOR_LATENCY_MEDIAN_MS / _P95_MS), fails with HTTP
+429/503 at SIMULATOR_ERROR_RATE, and returns realistic fixture payloads.
+Calls are blocking, like the real SDKs, so they exercise the outbound layer's
+threads, limits and retries the same way.
+"""
+import base64
+import json
+import math
+import os
+import random
+import re
+import struct
+import time
+import zlib
+from types import SimpleNamespace
+
+from app import metrics
+from app.config import get_settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+PROVIDERS = ("gemini", "stability", "cloudinary", "smtp")
+
+CATEGORY_NAMES = ["Starters", "Soups", "Salads", "Mains", "Breads", "Rice & Biryani", "Desserts", "Beverages"]
+DISH_WORDS = [
+    "Paneer", "Chicken", "Masala", "Tikka", "Butter", "Garlic", "Dosa", "Idli", "Vada", "Biryani",
+    "Mushroom", "Veg", "Spicy", "Crispy", "Tandoori", "Lemon", "Mango", "Chocolate", "Cheese", "Naan",
+]
+
+
+def enabled(provider: str) -> bool:
+    selected = get_settings().simulate_providers
+    return "all" in selected or provider in selected
+
+
+class SimulatedProviderError(Exception):
+    def __init__(self, provider: str, status_code: int):
+        super().__init__(f"Simulated {provider} failure ({status_code})")
+        self.status_code = status_code
+
+
+def _latency_seconds() -> float:
+    """Log-normal sample matching the configured median and p95."""
+    settings = get_settings()
+    median = max(settings.simulator_latency_median_ms, 0.001)
+    p95 = max(settings.simulator_latency_p95_ms, median)
+    sigma = math.log(p95 / median) / 1.645
+    return random.lognormvariate(math.log(median), sigma) / 1000
+
+
+def _simulate_call(provider: str):
+    delay = _latency_seconds()
+    metrics.observe("simulator_latency_ms", delay * 1000, provider=provider)
+    time.sleep(delay)
+    if random.random() < get_settings().simulator_error_rate:
+        metrics.inc("simulator_errors", provider=provider)
+        raise SimulatedProviderError(provider, random.choice((429, 503)))
+
+
+# --- Gemini -----------------------------------------------------------------
+
+def _fake_price() -> float:
+    return float(random.randrange(60, 600, 10))
+
+
+def _fake_item() -> dict:
+    item = {
+        "name": " ".join(random.sample(DISH_WORDS, random.randint(2, 3))),
+        "price": _fake_price(),
+        "currency": "₹",
+        "description": random.choice([None, "House special, served hot.", "Chef's recommendation."]),
+        "weight": random.choice([None, "250g", "500ml"]),
+        "variants": [],
+        "addons": [],
+    }
+    if random.random() < 0.2:
+        item["price"] = None
+        item["variants"] = [
+            {"variantType": "Size", "label": label, "price": _fake_price()} for label in ("Half", "Full")
+        ]
+    if random.random() < 0.1:
+        item["addons"] = [{"name": "Extra Cheese", "price": 40}]
+    return item
+
+
+def _fake_page() -> list:
+    dishes = get_settings().simulator_dishes_per_page
+    names = random.sample(CATEGORY_NAMES, min(len(CATEGORY_NAMES), max(1, dishes // 6)))
+    categories = [{"name": name, "items": []} for name in names]
+    for _ in range(dishes):
+        random.choice(categories)["items"].append(_fake_item())
+    return categories
+
+
+class _SimulatedModels:
+    def generate_content(self, model: str, contents, **kwargs):
+        _simulate_call("gemini")
+        if isinstance(contents, str):
+            # Batched image prompts: echo each dish back as a short visual description
+            dishes = json.loads(contents[contents.index("Dishes (JSON):") + len("Dishes (JSON):"):])
+            prompts = [
+                {"id": dish["id"], "prompt": f"{dish['name']}, plated on a white ceramic dish, garnished, soft natural light"}
+                for dish in dishes
+            ]
+            return SimpleNamespace(text=json.dumps({"prompts": prompts}, ensure_ascii=False))
+
+        texts = [part["text"] for part in contents[0]["parts"] if "text" in part]
+        page_markers = [int(m) for text in texts for m in re.findall(r"^Page (\d+):", text)]
+        if page_markers:
+            payload = {"pages": [{"pageIndex": index, "categories": _fake_page()} for index in page_markers]}
+        else:
+            payload = {"categories": _fake_page()}
+        return SimpleNamespace(text=json.dumps(payload, ensure_ascii=False))
+
+
+class SimulatedGeminiClient:
+    """Mimics google.genai.Client: client.models.generate_content(...).text"""
+
+    def __init__(self):
+        self.models = _SimulatedModels()
+
+
+# --- Stability --------------------------------------------------------------
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def fake_png(size_bytes: int, edge: int = 64) -> bytes:
+    """
+    A valid solid-colour PNG padded to roughly `size_bytes` with a private
+    ancillary chunk (decoders skip it), so payload size is realistic without
+    spending CPU on encoding.
+    """
+    colour = bytes(random.randrange(256) for _ in range(3))
+    raw = b"".join(b"\x00" + colour * edge for _ in range(edge))
+    head = (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", edge, edge, 8, 2, 0, 0, 0))
+        + _png_chunk(b"IDAT", zlib.compress(raw))
+    )
+    padding = max(0, size_bytes - len(head) - 24)
+    return head + (_png_chunk(b"siMu", os.urandom(padding)) if padding else b"") + _png_chunk(b"IEND", b"")
+
+
+class _SimulatedResponse:
+    def __init__(self, status_code: int, body: bytes, content_type: str):
+        self.status_code = status_code
+        self.content = body
+        self.headers = {"Content-Type": content_type}
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def simulated_post(url: str, headers: dict = None, timeout: float = None, **kwargs):
+    """Mimics requests.post against the Stability text-to-image endpoint (body ignored)."""
+    try:
+        _simulate_call("stability")
+    except SimulatedProviderError as e:
+        return _SimulatedResponse(e.status_code, b'{"message": "simulated failure"}', "application/json")
+
+    image = fake_png(get_settings().simulator_image_bytes)
+    if (headers or {}).get("Accept") == "image/png":
+        return _SimulatedResponse(200, image, "image/png")
+    body = {"artifacts": [{"base64": base64.b64encode(image).decode("ascii"), "finishReason": "SUCCESS"}]}
+    return _SimulatedResponse(200, json.dumps(body).encode("utf-8"), "application/json")
+
+
+# --- Cloudinary -------------------------------------------------------------
+
+class SimulatedUploader:
+    """Mimics cloudinary.uploader.upload; nothing is stored."""
+
+    def upload(self, file, folder: str = None, public_id: str = None, resource_type: str = "image", **kwargs):
+        _simulate_call("cloudinary")
+        size = len(file) if isinstance(file, (bytes, bytearray)) else 0
+        path = "/".join(part for part in (folder, public_id) if part)
+        return {
+            "public_id": path,
+            "bytes": size,
+            "resource_type": resource_type,
+            "secure_url": f"https://res.cloudinary.com/simulated/{resource_type}/upload/{path}",
+        }
+
+    def destroy(self, public_id: str, **kwargs):
+        _simulate_call("cloudinary")
+        return {"result": "ok"}
+
+
+# --- SMTP -------------------------------------------------------------------
+
+class SimulatedSMTP:
+    """Mimics smtplib.SMTP as a context manager; messages are only logged."""
+
+    def __init__(self, host: str = None, port: int = None, **kwargs):
+        _simulate_call("smtp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def sendmail(self, sender, recipient, message):
+        metrics.inc("simulator_emails_sent")
+        logger.info(f"Simulated email to {recipient} ({len(message)} bytes)")
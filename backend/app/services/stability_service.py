@@ -1,60 +1,90 @@
 import requests
-import os
-import base64
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict
+from app.config import get_settings
 from app.logger import get_logger
-from dotenv import load_dotenv
+from app.services import outbound
+from app.services.outbound import RETRYABLE_STATUSES, RetryableError
 
 logger = get_logger(__name__)
 
-load_dotenv()
 
-STABILITY_API_KEY = os.getenv("STABILITY_API_KEY")
-API_HOST = "https://api.stability.ai"
-ENGINE_ID = "stable-diffusion-xl-1024-v1-0"
+@dataclass(frozen=True)
+class GenerationProfile:
+    engine: str
+    width: int
+    height: int
+    steps: int
+    cfg_scale: float = 7
+    samples: int = 1  # a binary (image/png) response carries a single image
 
-def generate_image_stability(prompt: str):
+
+# "draft" is a cheap preview for reviewing a whole menu (SD 1.6 at 512px and
+# few steps, a fraction of the SDXL cost); "final" is the full-quality render
+DRAFT = "draft"
+FINAL = "final"
+GENERATION_PROFILES: Dict[str, GenerationProfile] = {
+    DRAFT: GenerationProfile(engine="stable-diffusion-v1-6", width=512, height=512, steps=15),
+    FINAL: GenerationProfile(engine="stable-diffusion-xl-1024-v1-0", width=1024, height=1024, steps=30),
+}
+
+@lru_cache(maxsize=None)
+def get_http_post():
+    """requests.post, or the local simulator when SIMULATE_PROVIDERS includes stability."""
+    from app.services import simulators
+    if simulators.enabled("stability"):
+        return simulators.simulated_post
+    return requests.post
+
+
+def _post(url: str, headers: dict, payload: dict, timeout: float):
+    response = get_http_post()(url, headers=headers, json=payload, timeout=timeout)
+    logger.info(f"Stability AI Status Code: {response.status_code}")
+    if response.status_code in RETRYABLE_STATUSES:
+        raise RetryableError(f"Stability AI returned {response.status_code}", response.status_code)
+    return response
+
+
+async def generate_image_stability(prompt: str, profile: str = FINAL):
     """
-    Generates an image using Stability AI SDXL.
-    Returns image bytes.
+    Generates an image using Stability AI with the given generation profile.
+    Returns the PNG bytes as received (no base64 round trip).
     """
-    api_key = os.getenv("STABILITY_API_KEY")
-    if not api_key:
+    settings = get_settings()
+    api_key = settings.stability_api_key
+    if not api_key and get_http_post() is requests.post:
         raise Exception("Missing STABILITY_API_KEY")
 
-    api_host = os.getenv('API_HOST', 'https://api.stability.ai')
-    engine_id = "stable-diffusion-xl-beta-v2-2-2" # Or stable-diffusion-v1-6
+    api_host = settings.stability_api_host
+    params = GENERATION_PROFILES[profile]
 
-    logger.info(f"Generating image with Stability AI for prompt: {prompt}")
+    logger.info(f"Generating {profile} image with Stability AI for prompt: {prompt}")
 
-    response = requests.post(
-        f"{api_host}/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image",
-        headers={
+    response = await outbound.call(
+        "stability",
+        _post,
+        f"{api_host}/v1/generation/{params.engine}/text-to-image",
+        {
             "Content-Type": "application/json",
-            "Accept": "application/json",
+            "Accept": "image/png",
             "Authorization": f"Bearer {api_key}"
         },
-        json={
+        {
             "text_prompts": [
                 {"text": prompt}
             ],
-            "cfg_scale": 7,
-            "height": 1024,
-            "width": 1024,
-            "samples": 1,
-            "steps": 30,
+            "cfg_scale": params.cfg_scale,
+            "height": params.height,
+            "width": params.width,
+            "samples": params.samples,
+            "steps": params.steps,
         },
+        settings.stability_timeout_seconds,
     )
-    
-    logger.info(f"Stability AI Status Code: {response.status_code}")
 
     if response.status_code != 200:
         logger.error(f"Stability AI Error Body: {response.text}")
         raise Exception(f"Non-200 response: {str(response.content)}")
 
-    data = response.json()
-
-    # Decode the first image
-    for image in data["artifacts"]:
-        return base64.b64decode(image["base64"])
-    
-    return None
+    return response.content or None
@@ -0,0 +1,162 @@
+import hashlib
+import math
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+
+from app import metrics
+from app.config import get_settings
+from app.database import visitor_sketches_collection
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Unique visitors per outlet and UTC day, estimated with HyperLogLog. Only a keyed
+# hash of the visitor's fingerprint ever reaches a sketch, and a sketch has a
+# fixed size however many scans it absorbs:
+#   {_id: "storeUid:YYYY-MM-DD", storeUid, day, registers: Binary(4096), version, updatedAt}
+# Weekly/monthly uniques are the union (register-wise max) of the daily sketches.
+HLL_PRECISION = 12  # 4096 registers, ~1.6% standard error
+REGISTERS = 1 << HLL_PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+FLUSH_RETRIES = 5
+
+# Sketches updated in this worker since the last flush
+_pending: Dict[Tuple[str, str], "HyperLogLog"] = {}
+
+
+class HyperLogLog:
+    def __init__(self, registers: Optional[bytes] = None):
+        self.registers = bytearray(registers) if registers else bytearray(REGISTERS)
+
+    def add(self, hashed: int):
+        """Adds a uniformly distributed 64-bit hash."""
+        index = hashed >> (64 - HLL_PRECISION)
+        rest = hashed & ((1 << (64 - HLL_PRECISION)) - 1)
+        rank = 64 - HLL_PRECISION - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        estimate = _ALPHA * REGISTERS * REGISTERS / sum(_INVERSE_POWERS[r] for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Small-range correction (linear counting)
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return round(estimate)
+
+
+def fingerprint_hash(visitor_id: Optional[str], client_ip: Optional[str], user_agent: Optional[str]) -> int:
+    """
+    64-bit keyed hash of the visitor: the client's own random ID when it sends one,
+    else IP + user agent. The raw values are never stored.
+    """
+    key = hashlib.sha256(get_settings().visitor_hash_key.encode()).digest()
+    source = f"id:{visitor_id}" if visitor_id else f"ip:{client_ip}|ua:{user_agent}"
+    digest = hashlib.blake2b(source.encode(), digest_size=8, key=key).digest()
+    return int.from_bytes(digest, "big")
+
+
+def _day(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d")
+
+
+def record_visit(store_uid: str, hashed: int, now: Optional[datetime] = None):
+    """Adds a visit to this worker's sketch for today; flush_sketches() persists it."""
+    key = (store_uid, _day(now or datetime.utcnow()))
+    sketch = _pending.get(key)
+    if sketch is None:
+        sketch = _pending[key] = HyperLogLog()
+    sketch.add(hashed)
+
+
+async def _merge_into_db(store_uid: str, day: str, sketch: HyperLogLog) -> bool:
+    # Optimistic concurrency: other workers flush the same day's sketch
+    _id = f"{store_uid}:{day}"
+    for _ in range(FLUSH_RETRIES):
+        doc = await visitor_sketches_collection.find_one({"_id": _id}, {"registers": 1, "version": 1})
+        now = datetime.utcnow()
+        if doc is None:
+            try:
+                await visitor_sketches_collection.insert_one({
+                    "_id": _id, "storeUid": store_uid, "day": day,
+                    "registers": Binary(bytes(sketch.registers)), "version": 1, "updatedAt": now,
+                })
+                return True
+            except DuplicateKeyError:
+                continue
+        merged = HyperLogLog(doc["registers"]).merge(sketch)
+        result = await visitor_sketches_collection.update_one(
+            {"_id": _id, "version": doc["version"]},
+            {"$set": {"registers": Binary(bytes(merged.registers)), "updatedAt": now}, "$inc": {"version": 1}}
+        )
+        if result.matched_count:
+            return True
+    return False
+
+
+async def flush_sketches():
+    """Merges this worker's sketches into the persisted ones (periodic job and shutdown)."""
+    pending = list(_pending.items())
+    _pending.clear()
+    for (store_uid, day), sketch in pending:
+        try:
+            merged = await _merge_into_db(store_uid, day, sketch)
+        except Exception as e:
+            logger.error(f"Visitor sketch flush failed for {store_uid} {day}: {e}")
+            merged = False
+        if not merged:
+            # Keep it for the next flush, folding in visits recorded meanwhile
+            key = (store_uid, day)
+            _pending[key] = sketch.merge(_pending[key]) if key in _pending else sketch
+            metrics.inc("visitor_sketch_flush_retries")
+
+
+async def _sketches(store_uid: str, start_day: str, end_day: str) -> Dict[str, HyperLogLog]:
+    sketches = {
+        doc["day"]: HyperLogLog(doc["registers"])
+        async for doc in visitor_sketches_collection.reads("analytics").find(
+            {"storeUid": store_uid, "day": {"$gte": start_day, "$lte": end_day}}, {"day": 1, "registers": 1}
+        )
+    }
+    # Include this worker's visits that haven't been flushed yet
+    for (uid, day), sketch in _pending.items():
+        if uid == store_uid and start_day <= day <= end_day:
+            sketches[day] = HyperLogLog(sketch.registers).merge(sketches[day]) if day in sketches else HyperLogLog(sketch.registers)
+    return sketches
+
+
+def _union(sketches: List[HyperLogLog]) -> int:
+    total = HyperLogLog()
+    for sketch in sketches:
+        total.merge(sketch)
+    return total.count()
+
+
+async def unique_visitors(store_uid: str, days: int = 8, now: Optional[datetime] = None) -> dict:
+    """
+    Estimated uniques per day for the last `days` days, plus the de-duplicated
+    totals over the last 7 and 30 days.
+    """
+    today = now or datetime.utcnow()
+    window = max(days, 30)
+    sketches = await _sketches(store_uid, _day(today - timedelta(days=window - 1)), _day(today))
+
+    daily = {}
+    for offset in range(days - 1, -1, -1):
+        day = _day(today - timedelta(days=offset))
+        daily[day] = sketches[day].count() if day in sketches else 0
+
+    def last(n: int) -> int:
+        start = _day(today - timedelta(days=n - 1))
+        return _union([sketch for day, sketch in sketches.items() if day >= start])
+
+    return {"daily": daily, "week": last(7), "month": last(30)}
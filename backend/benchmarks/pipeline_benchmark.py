@@ -0,0 +1,125 @@
+"""
+Load-tests the menu pipeline offline against the provider simulators.
+
+    python benchmarks/pipeline_benchmark.py --pipelines 20 --pages 3 --images 5
+
+Each pipeline creates a request on its own throwaway outlet, uploads `--pages`
+synthetic menu photos (upload_menu_images) and then generates `--images` dish
+images concurrently (generate_dish_image_route). Everything runs in-process
+through the ASGI app; Gemini, Stability, Cloudinary and SMTP are simulated
+unless SIMULATE_PROVIDERS is already set. Needs a reachable MongoDB
+(MONGO_URI); fixture documents are removed afterwards.
+
+Tune the simulators with SIMULATOR_LATENCY_MEDIAN_MS, SIMULATOR_LATENCY_P95_MS,
+SIMULATOR_ERROR_RATE, SIMULATOR_DISHES_PER_PAGE and SIMULATOR_IMAGE_BYTES.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+os.environ.setdefault("SIMULATE_PROVIDERS", "all")
+
+FIXTURE_PREFIX = "bench_"
+
+
+def menu_photo(index: int) -> bytes:
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (1200, 1600), "white")
+    draw = ImageDraw.Draw(image)
+    for line in range(40):
+        draw.text((80, 60 + line * 36), f"Dish {index}-{line} .......... {100 + line * 10}", fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_pipeline(client, store_uid: str, photos, images: int, timings: dict):
+    started = time.perf_counter()
+    response = await client.post(f"/outlets/{store_uid}/requests")
+    response.raise_for_status()
+    request_id = response.json()["requestId"]
+
+    files = [("images", (f"page{i}.jpg", photo, "image/jpeg")) for i, photo in enumerate(photos)]
+    t0 = time.perf_counter()
+    response = await client.post(f"/requests/{request_id}/menu-images", files=files)
+    timings["upload_menu_images"].append((time.perf_counter() - t0) * 1000)
+    timings["status"][response.status_code] = timings["status"].get(response.status_code, 0) + 1
+    if response.status_code != 200:
+        return
+
+    from app.database import dishes_collection
+    dishes = await dishes_collection.find({"requestId": request_id}, {"dishId": 1}).to_list(length=images)
+
+    async def generate(dish_id: str):
+        t = time.perf_counter()
+        r = await client.post(f"/requests/{request_id}/generate-image/{dish_id}")
+        timings["generate_dish_image"].append((time.perf_counter() - t) * 1000)
+        timings["status"][r.status_code] = timings["status"].get(r.status_code, 0) + 1
+
+    await asyncio.gather(*(generate(dish["dishId"]) for dish in dishes))
+    timings["pipeline"].append((time.perf_counter() - started) * 1000)
+
+
+async def main_async(args):
+    import httpx
+    import main
+    from app import metrics
+    from app.database import outlet_profiles_collection, requests_collection, categories_collection, dishes_collection
+
+    await main.app.router.startup()
+    photos = [menu_photo(i) for i in range(args.pages)]
+    store_uids = [f"{FIXTURE_PREFIX}{uuid.uuid4().hex[:8]}" for _ in range(args.pipelines)]
+    await outlet_profiles_collection.insert_many([
+        {"storeUid": uid, "contactId": f"{FIXTURE_PREFIX}biz", "storeName": "Benchmark Outlet", "isDeleted": False}
+        for uid in store_uids
+    ])
+
+    timings = {"upload_menu_images": [], "generate_dish_image": [], "pipeline": [], "status": {}}
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(run_pipeline(client, uid, photos, args.images, timings) for uid in store_uids))
+            wall = time.perf_counter() - started
+    finally:
+        fixture = {"storeUid": {"$in": store_uids}}
+        for collection in (dishes_collection, categories_collection, requests_collection, outlet_profiles_collection):
+            await collection.delete_many(fixture)
+        await main.app.router.shutdown()
+
+    print(f"{args.pipelines} pipelines in {wall:.1f}s, status codes: {timings['status']}")
+    print(f"{'step':<22}{'count':>7}{'p50':>10}{'p95':>10}{'max':>10}  (ms)")
+    for step in ("upload_menu_images", "generate_dish_image", "pipeline"):
+        values = timings[step]
+        if values:
+            print(f"{step:<22}{len(values):>7}{statistics.median(values):>10.0f}{percentile(values, 95):>10.0f}{max(values):>10.0f}")
+
+    snapshot = metrics.snapshot()
+    outbound = {k: v for k, v in snapshot["counters"].items() if k.startswith(("outbound_", "gemini_", "simulator_"))}
+    print(json.dumps(outbound, indent=2, sort_keys=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pipelines", type=int, default=10, help="concurrent request pipelines")
+    parser.add_argument("--pages", type=int, default=3, help="menu photos per request")
+    parser.add_argument("--images", type=int, default=5, help="dish images generated per request")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
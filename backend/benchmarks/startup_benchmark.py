@@ -0,0 +1,75 @@
+"""
+Measures cold-start latency of the API in fresh interpreters.
+
+    python benchmarks/startup_benchmark.py --runs 10
+
+Each run spawns a new process that imports `main`, runs the startup handlers and
+serves `GET /` in-process, then reports import / startup / first-request timings.
+Pass --skip-startup when no MongoDB is reachable.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+
+async def run(skip_startup):
+    if not skip_startup:
+        await main.app.router.startup()
+    t2 = time.perf_counter()
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "raw_path": b"/",
+             "query_string": b"", "headers": [], "http_version": "1.1",
+             "scheme": "http", "server": ("bench", 80), "client": ("bench", 1),
+             "root_path": "", "app": main.app}
+    await main.app(scope, receive, send)
+    t3 = time.perf_counter()
+    if not skip_startup:
+        await main.app.router.shutdown()
+    return t2, t3
+
+t2, t3 = asyncio.run(run(sys.argv[1] == "1"))
+print(json.dumps({"importMs": (t1 - t0) * 1000, "startupMs": (t2 - t1) * 1000,
+                  "firstRequestMs": (t3 - t2) * 1000, "readyMs": (t3 - t0) * 1000}))
+"""
+
+
+def run_once(skip_startup: bool) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, "1" if skip_startup else "0"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-startup", action="store_true")
+    args = parser.parse_args()
+
+    results = [run_once(args.skip_startup) for _ in range(args.runs)]
+    print(f"{'metric':<16}{'median':>10}{'min':>10}{'max':>10}  (ms, {args.runs} runs)")
+    for key in ("importMs", "startupMs", "firstRequestMs", "readyMs"):
+        values = [r[key] for r in results]
+        print(f"{key:<16}{statistics.median(values):>10.1f}{min(values):>10.1f}{max(values):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
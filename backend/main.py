@@ -1,11 +1,19 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import contacts, outlets, requests, dishes, auth, admin, categories
-from app.database import rename_legacy_collections
-from dotenv import load_dotenv
+from fastapi.staticfiles import StaticFiles
+from app.routers import contacts, outlets, requests, dishes, auth, admin, categories, discovery
+from app.database import rename_legacy_collections, ensure_indexes, ensure_capped_collections, backfill_soft_delete_flags, backfill_outlet_locations
+from app.services.menu_events import stop_hub
+from app.services.visitors import flush_sketches
+from app.services.config_service import compact_business_overrides
+from app.profiling import ProfilingMiddleware
+from app.logger import RequestIdMiddleware, stop_logging
+from app.services.image_preprocess import shutdown_pool
+from app.jobs import start_background_jobs, stop_background_jobs
+from app.config import get_settings
 import asyncio
 
-load_dotenv()
+settings = get_settings()
 
 app = FastAPI(title="Menu Management System")
 
@@ -19,6 +27,12 @@ app.add_middleware(
     max_age=600,
 )
 
+# On-demand request profiling (X-Profile-Token header or PROFILING_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
+
+# Request IDs on every log line (added last so it wraps everything else)
+app.add_middleware(RequestIdMiddleware)
+
 # Include Routers
 app.include_router(contacts.router)
 app.include_router(outlets.router)
@@ -27,10 +41,33 @@ app.include_router(dishes.router)
 app.include_router(auth.router)
 app.include_router(admin.router)
 app.include_router(categories.router)
+app.include_router(discovery.router)
+
+# Serve exported static menus locally (production should point nginx/CDN at MENU_EXPORT_DIR)
+if settings.menu_export_backend == "local" and settings.menu_export_base_url.startswith("/"):
+    app.mount(settings.menu_export_base_url, StaticFiles(directory=settings.menu_export_dir, check_dir=False), name="static_menus")
+
+# Serve stored images when IMAGE_STORAGE_BACKEND=local
+if settings.image_storage_backend == "local" and settings.image_storage_base_url.startswith("/"):
+    app.mount(settings.image_storage_base_url, StaticFiles(directory=settings.image_storage_dir, check_dir=False), name="static_images")
 
 @app.on_event("startup")
 async def startup_event():
     await rename_legacy_collections()
+    await backfill_soft_delete_flags()
+    await backfill_outlet_locations()
+    await compact_business_overrides()
+    await ensure_capped_collections()
+    await ensure_indexes()
+    start_background_jobs()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await stop_background_jobs()
+    await stop_hub()
+    await flush_sketches()
+    shutdown_pool()
+    stop_logging()
 
 @app.get("/")
 async def root():
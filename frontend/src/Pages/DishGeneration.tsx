@@ -21,6 +21,7 @@ interface Dish {
     imageUrl: string | null;
     imageStatus: "pending" | "generating" | "ready" | "failed";
     generationCount?: number;
+    draftImageUrl?: string | null;
     categoryName?: string;
     variants: Variant[];
 }
@@ -94,17 +95,29 @@ export default function DishGeneration() {
         }
     };
 
-    const generateImage = async () => {
+    // Drafts are cheap low-res previews kept apart from the published image; the
+    // main button always asks for a final render (the business default only
+    // applies to API callers that leave the profile open)
+    const generateImage = async (profile: "draft" | "final") => {
         if (!dish || !requestId) return;
         setGenerating(true);
-        setDish({ ...dish, imageStatus: "generating" });
+        if (profile !== "draft") setDish({ ...dish, imageStatus: "generating" });
 
         try {
-            const res = await api.post(`/requests/${requestId}/generate-image/${dish.dishId}`);
-            setDish({ ...dish, imageUrl: res.data.imageUrl, imageStatus: "ready", generationCount: (dish.generationCount || 0) + 1 });
-            toast.success("Image Generated! 🎨");
+            const res = await api.post(`/requests/${requestId}/generate-image/${dish.dishId}`, null, { params: { profile } });
+            const draft = res.data.imageProfile === "draft";
+            setDish(draft
+                ? { ...dish, draftImageUrl: res.data.draftImageUrl }
+                : {
+                    ...dish,
+                    imageUrl: res.data.imageUrl,
+                    imageStatus: "ready",
+                    draftImageUrl: null,
+                    generationCount: (dish.generationCount || 0) + 1
+                });
+            toast.success(draft ? "Draft Preview Ready 👀" : "Image Generated! 🎨");
         } catch (e) {
-            setDish({ ...dish, imageStatus: "failed" });
+            setDish(profile === "draft" ? dish : { ...dish, imageStatus: "failed" });
             toast.error("Generation Failed");
         } finally {
             setGenerating(false);
@@ -276,6 +289,11 @@ export default function DishGeneration() {
                                             <FiLoader className="text-5xl animate-spin text-blue-500" />
                                             <span className="text-white/20 font-black text-[10px] uppercase tracking-widest">Loading Dish</span>
                                         </div>
+                                    ) : dish?.draftImageUrl ? (
+                                        <>
+                                            <img src={dish.draftImageUrl} className="w-full h-full object-cover" alt="" />
+                                            <span className="absolute bottom-8 left-8 px-4 py-2 rounded-full bg-black/60 text-white text-[10px] font-black uppercase tracking-widest">Draft Preview</span>
+                                        </>
                                     ) : dish?.imageUrl ? (
                                         <img src={dish.imageUrl} className="w-full h-full object-cover" alt="" />
                                     ) : (
@@ -493,7 +511,7 @@ export default function DishGeneration() {
                                     <div className="pt-6">
                                         {(dish?.generationCount || 0) < generationLimit ? (
                                             <button
-                                                onClick={generateImage}
+                                                onClick={() => generateImage("final")}
                                                 disabled={generating}
                                                 className={`w-full py-6 rounded-[2rem] font-[1000] text-xl transition-all shadow-xl active:scale-[0.98] flex items-center justify-center gap-4 ${dish?.imageStatus === 'ready'
                                                     ? 'bg-white border-2 border-blue-600 text-blue-600 hover:bg-blue-50'
@@ -512,6 +530,13 @@ export default function DishGeneration() {
                                                 Daily Limit Reached
                                             </div>
                                         )}
+                                        <button
+                                            onClick={() => generateImage("draft")}
+                                            disabled={generating}
+                                            className="w-full mt-3 py-3 rounded-[2rem] font-black text-sm text-gray-500 hover:text-blue-600 uppercase tracking-widest transition-all disabled:opacity-40"
+                                        >
+                                            {dish?.draftImageUrl ? "New Draft Preview" : "Quick Draft Preview"}
+                                        </button>
                                     </div>
                                 </div>
                             </div>
@@ -1,4 +1,4 @@
-import { useEffect, useState, useCallback } from "react";
+import { useEffect, useState, useCallback, useRef } from "react";
 import { useParams, useSearchParams, useNavigate } from "react-router-dom";
 import api from "../api/client";
 import toast from "react-hot-toast";
@@ -112,6 +112,11 @@ export default function ManageMenu() {
 
     const [isReorderingCats, setIsReorderingCats] = useState(false);
     const [isReorderingDishes, setIsReorderingDishes] = useState(false);
+
+    // Drag moves recorded while reordering; saving sends only these, not the whole list
+    type Move = { id: string; prevId: string | null; nextId: string | null };
+    const categoryMoves = useRef<Move[]>([]);
+    const dishMoves = useRef<Move[]>([]);
     
     const sensors = useSensors(
         useSensor(PointerSensor, { activationConstraint: { distance: 5 } }),
@@ -139,8 +144,10 @@ export default function ManageMenu() {
         if (isReorderingCats) {
             try {
                 setIsSaving(true);
-                const items = categories.map((c, i) => ({ id: c.categoryId, order: i }));
-                await api.put(`/outlets/${outletUid}/categories/reorder`, items);
+                if (categoryMoves.current.length) {
+                    await api.put(`/outlets/${outletUid}/categories/moves`, categoryMoves.current);
+                }
+                categoryMoves.current = [];
                 toast.success("Category order saved!");
             } catch (e) {
                 toast.error("Failed to save order");
@@ -161,6 +168,7 @@ export default function ManageMenu() {
                     isPublished: c.isPublished !== false,
                     dishCount: c.dishCount || 0
                 })));
+                categoryMoves.current = [];
                 setIsReorderingCats(true);
             } catch (e) {
                 toast.error("Failed to enter reorder mode");
@@ -173,11 +181,15 @@ export default function ManageMenu() {
     const handleDragEndCategories = (event: DragEndEvent) => {
         const { active, over } = event;
         if (over && active.id !== over.id) {
-            setCategories((items) => {
-                const oldIndex = items.findIndex((i) => i.categoryId === active.id);
-                const newIndex = items.findIndex((i) => i.categoryId === over.id);
-                return arrayMove(items, oldIndex, newIndex);
+            const oldIndex = categories.findIndex((i) => i.categoryId === active.id);
+            const newIndex = categories.findIndex((i) => i.categoryId === over.id);
+            const moved = arrayMove(categories, oldIndex, newIndex);
+            categoryMoves.current.push({
+                id: moved[newIndex].categoryId,
+                prevId: moved[newIndex - 1]?.categoryId ?? null,
+                nextId: moved[newIndex + 1]?.categoryId ?? null,
             });
+            setCategories(moved);
         }
     };
 
@@ -185,8 +197,10 @@ export default function ManageMenu() {
         if (isReorderingDishes) {
             try {
                 setIsSaving(true);
-                const items = dishes.map((d, i) => ({ id: d.dishId, order: i }));
-                await api.put(`/outlets/${outletUid}/dishes/reorder`, items);
+                if (dishMoves.current.length) {
+                    await api.put(`/outlets/${outletUid}/dishes/moves`, dishMoves.current);
+                }
+                dishMoves.current = [];
                 toast.success("Dish order saved!");
             } catch (e) {
                 toast.error("Failed to save order");
@@ -202,6 +216,7 @@ export default function ManageMenu() {
                     params: { categoryId: selectedCategoryId, search: dishSearch, page: 1, limit: -1 }
                 });
                 setDishes(res.data.dishes.map((d: any) => ({ ...d, addons: d.addons || [] })));
+                dishMoves.current = [];
                 setIsReorderingDishes(true);
             } catch (e) {
                 toast.error("Failed to enter reorder mode");
@@ -214,11 +229,15 @@ export default function ManageMenu() {
     const handleDragEndDishes = (event: DragEndEvent) => {
         const { active, over } = event;
         if (over && active.id !== over.id) {
-            setDishes((items) => {
-                const oldIndex = items.findIndex((i) => i.dishId === active.id);
-                const newIndex = items.findIndex((i) => i.dishId === over.id);
-                return arrayMove(items, oldIndex, newIndex);
+            const oldIndex = dishes.findIndex((i) => i.dishId === active.id);
+            const newIndex = dishes.findIndex((i) => i.dishId === over.id);
+            const moved = arrayMove(dishes, oldIndex, newIndex);
+            dishMoves.current.push({
+                id: moved[newIndex].dishId,
+                prevId: moved[newIndex - 1]?.dishId ?? null,
+                nextId: moved[newIndex + 1]?.dishId ?? null,
             });
+            setDishes(moved);
         }
     };
 
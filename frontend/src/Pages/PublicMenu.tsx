@@ -60,11 +60,20 @@ interface Dish {
     weight: string | null;
     description: string | null;
     imageUrl: string | null;
+    imageVariants?: ImageVariants | null;
     variants?: Variant[];
     addons?: Addon[];
 }
 
+interface ImageVariants {
+    thumb: string;
+    card: string;
+    full: string;
+    srcset: string;
+}
+
 interface Category {
+    categoryId?: string | null;
     categoryName: string;
     dishes: Dish[];
 }
@@ -79,6 +88,47 @@ interface OutletData {
     longitude?: number | null;
 }
 
+// Live diffs pushed by GET /outlets/{uid}/menu/events
+type MenuOp =
+    | { op: "dish"; dish: Dish }
+    | { op: "removeDish"; dishId: string }
+    | { op: "category"; categoryId: string | null; categoryName: string }
+    | { op: "removeCategory"; categoryId: string | null }
+    | { op: "order"; categories: { categoryId: string | null; dishIds: string[] }[] }
+    | { op: "outlet"; outlet: OutletData }
+    | { op: "reload" };
+
+function applyMenuOps(menu: Category[], ops: MenuOp[]): Category[] {
+    const dishes = new Map<string, Dish>();
+    const names = new Map<string | null, string>();
+    menu.forEach((category) => {
+        names.set(category.categoryId ?? null, category.categoryName);
+        category.dishes.forEach((dish) => dishes.set(dish.dishId, dish));
+    });
+    let layout = menu.map((category) => ({
+        categoryId: category.categoryId ?? null,
+        dishIds: category.dishes.map((dish) => dish.dishId),
+    }));
+
+    for (const op of ops) {
+        if (op.op === "dish") dishes.set(op.dish.dishId, op.dish);
+        else if (op.op === "removeDish") dishes.delete(op.dishId);
+        else if (op.op === "category") names.set(op.categoryId, op.categoryName);
+        else if (op.op === "removeCategory") names.delete(op.categoryId);
+        else if (op.op === "order") layout = op.categories;
+    }
+
+    return layout
+        .filter((category) => names.has(category.categoryId))
+        .map((category) => ({
+            categoryId: category.categoryId,
+            categoryName: names.get(category.categoryId) as string,
+            dishes: category.dishIds
+                .map((id) => dishes.get(id))
+                .filter((dish): dish is Dish => dish !== undefined),
+        }));
+}
+
 export default function PublicMenu() {
     const { isLoaded } = useJsApiLoader({
         id: "google-map-script",
@@ -117,9 +167,39 @@ export default function PublicMenu() {
         }
     }, [outletUid, source]);
 
+    // Apply live menu changes instead of polling; EventSource reconnects by itself
+    useEffect(() => {
+        if (!outletUid) return;
+        const events = new EventSource(`${api.defaults.baseURL}/outlets/${outletUid}/menu/events`);
+        events.addEventListener("menu", (event) => {
+            const { ops } = JSON.parse((event as MessageEvent).data) as { ops: MenuOp[] };
+            if (ops.some((op) => op.op === "reload")) {
+                fetchMenu();
+                return;
+            }
+            for (const op of ops) {
+                if (op.op === "outlet") setOutlet(op.outlet);
+                if (op.op === "dish") {
+                    setSelectedDish((current) => (current?.dishId === op.dish.dishId ? op.dish : current));
+                }
+                if (op.op === "removeDish") {
+                    setSelectedDish((current) => (current?.dishId === op.dishId ? null : current));
+                }
+            }
+            setMenu((current) => applyMenuOps(current, ops));
+        });
+        return () => events.close();
+    }, [outletUid]);
+
     const recordScan = async () => {
         try {
-            await api.post(`/outlets/${outletUid}/scan`);
+            // Random per-browser ID so unique visitors can be estimated; nothing personal is sent
+            let visitorId = localStorage.getItem("visitorId");
+            if (!visitorId) {
+                visitorId = crypto.randomUUID();
+                localStorage.setItem("visitorId", visitorId);
+            }
+            await api.post(`/outlets/${outletUid}/scan`, { visitorId });
             console.log("Scan recorded successfully for", outletUid);
         } catch (error) {
             console.error("Failed to record scan", error);
@@ -223,7 +303,10 @@ export default function PublicMenu() {
                                     <div className="w-20 h-20 sm:w-28 sm:h-28 rounded-xl overflow-hidden shrink-0">
                                         {dish.imageUrl ? (
                                             <img
-                                                src={dish.imageUrl}
+                                                src={dish.imageVariants?.thumb || dish.imageUrl}
+                                                srcSet={dish.imageVariants?.srcset}
+                                                sizes="(min-width: 640px) 112px, 80px"
+                                                loading="lazy"
                                                 alt={dish.name}
                                                 className="w-full h-full object-cover hover:scale-105 transition duration-500"
                                             />
@@ -380,7 +463,9 @@ export default function PublicMenu() {
                         {selectedDish.imageUrl && (
                             <div className="w-full h-48 relative">
                                 <img 
-                                    src={selectedDish.imageUrl} 
+                                    src={selectedDish.imageVariants?.card || selectedDish.imageUrl} 
+                                    srcSet={selectedDish.imageVariants?.srcset}
+                                    sizes="(min-width: 448px) 448px, 100vw"
                                     alt={selectedDish.name} 
                                     className="w-full h-full object-cover"
                                 />